@@ -0,0 +1,95 @@
+# Prefix-trie autocomplete
+#
+# Every node of the trie stores its top-ranked entries, so a lookup walks the
+# prefix and returns a precomputed list: O(len(prefix)) regardless of
+# vocabulary size. Keys are Chinese names plus the romanized Jiazi keys
+# (jia_zi, jiazi, "jia zi").
+from typing import List
+
+from app.import_data import JIAZI_KEYS
+
+
+# Ranking order of entry kinds
+KIND_ORDER = {"ganzhi": 0, "nayin": 1, "shensha": 2}
+
+# Top entries kept per node; the largest k a lookup can ask for
+MAX_SUGGESTIONS = 20
+
+
+def normalize(text: str) -> str:
+    """Lower-case and trim a key or query"""
+    return (text or "").strip().lower()
+
+
+class PrefixTrie:
+    """Prefix trie over (key, entry) pairs with precomputed top-k per node"""
+
+    def __init__(self, entries):
+        """
+        entries: iterable of (text, kind, keys) in rank order within each kind,
+        e.g. ("甲子", "ganzhi", ["甲子", "jia_zi", "jiazi"]).
+        """
+        self.entries = []
+        self._root = {}
+        rank = {}
+        # node -> {entry index: matched key}, and node -> entries whose key ends here
+        candidates = {}
+        terminals = {}
+
+        for text, kind, keys in entries:
+            index = len(self.entries)
+            self.entries.append({"text": text, "kind": kind})
+            rank[index] = (KIND_ORDER.get(kind, len(KIND_ORDER)), index)
+            for key in dict.fromkeys(normalize(k) for k in keys):
+                if not key:
+                    continue
+                node = self._root
+                for char in key:
+                    node = node.setdefault(char, {})
+                    candidates.setdefault(id(node), (node, {}))[1].setdefault(index, key)
+                terminals.setdefault(id(node), (node, {}))[1].setdefault(index, key)
+
+        # Freeze each node's ranking by kind, then source order
+        for node, matched in candidates.values():
+            ranked = sorted(matched, key=rank.__getitem__)
+            node[None] = tuple((i, matched[i]) for i in ranked[:MAX_SUGGESTIONS])
+        for node, matched in terminals.values():
+            node[""] = tuple(sorted(matched, key=rank.__getitem__))
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Top suggestions for a prefix; entries whose key equals it come first"""
+        prefix = normalize(prefix)
+        node = self._root
+        for char in prefix:
+            node = node.get(char)
+            if node is None:
+                return []
+        if node is self._root:
+            return []
+
+        exact = node.get("", ())
+        results = [{**self.entries[i], "matched": prefix} for i in exact]
+        for index, key in node[None]:
+            if len(results) >= limit:
+                break
+            if index not in exact:
+                results.append({**self.entries[index], "matched": key})
+        return results[:limit]
+
+
+def ganzhi_keys(name: str, pinyin: dict) -> List[str]:
+    """Chinese name plus its romanized forms"""
+    keys = [name]
+    key = pinyin.get(name)
+    if key:
+        keys += [key, key.replace("_", ""), key.replace("_", " ")]
+    return keys
+
+
+def build_autocomplete(ganzhi_names, nayin_names, shensha_names) -> PrefixTrie:
+    """Build the trie over Ganzhi, Nayin and Shensha names"""
+    pinyin = {name: key for key, name in JIAZI_KEYS.items()}
+    entries = [(name, "ganzhi", ganzhi_keys(name, pinyin)) for name in ganzhi_names]
+    entries += [(name, "nayin", [name]) for name in nayin_names]
+    entries += [(name, "shensha", [name]) for name in shensha_names]
+    return PrefixTrie(entries)
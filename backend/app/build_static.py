@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Static API snapshot builder.
+Renders every public read endpoint to disk as identity, gzip and brotli files
+plus a manifest.json, for serving with STATIC_API_DIR or directly from an edge.
+
+Brotli files are written only when the optional brotli package is installed.
+
+Usage: python app/build_static.py [--output static_api] [--skip-between]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.caching import make_etag
+from app.main import app
+from app.static_api import MANIFEST_NAME
+from app.store import knowledge_store
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static_api")
+
+
+def iter_read_paths(snapshot, include_between=True):
+    """Every read endpoint path (without query string) for the loaded data"""
+    yield "/api/ganzhi"
+    yield "/api/ganzhi/names"
+    for name in snapshot.ganzhi_names:
+        yield f"/api/ganzhi/{name}"
+
+    yield "/api/nayin"
+    yield "/api/nayin/status"
+    for status in snapshot.status_list:
+        yield f"/api/nayin/status/{status}"
+    for category in ("shengda", "xiaoruo"):
+        yield f"/api/nayin/category/{category}"
+    for nayin_name in snapshot.nayin_groups:
+        yield f"/api/nayin/{nayin_name}/ganzhi"
+    for name in snapshot.ganzhi_names:
+        yield f"/api/nayin/by-ganzhi/{name}"
+        yield f"/api/nayin/calc/{name}"
+
+    yield "/api/shensha"
+    yield "/api/shensha/types"
+    yield "/api/shensha/zixing"
+    for shensha_type in snapshot.shensha_types:
+        yield f"/api/shensha/type/{shensha_type}"
+    for shensha_name in snapshot.shensha_by_name:
+        yield f"/api/shensha/{shensha_name}"
+        yield f"/api/shensha/{shensha_name}/ganzhi"
+    for name in snapshot.ganzhi_names:
+        yield f"/api/shensha/ganzhi/{name}"
+
+    yield "/api/guanxi"
+    yield "/api/guanxi/types"
+    for relation_type in snapshot.relation_matrix.by_type:
+        yield f"/api/guanxi/type/{relation_type}"
+    for name in snapshot.ganzhi_names:
+        yield f"/api/guanxi/ganzhi/{name}"
+    if include_between:
+        for name1 in snapshot.ganzhi_names:
+            for name2 in snapshot.ganzhi_names:
+                yield f"/api/guanxi/between/{name1}/{name2}"
+
+
+def file_for(path: str) -> str:
+    """Relative identity file for a path: /api/ganzhi/甲子 -> api/ganzhi/甲子/index.json"""
+    return path.strip("/") + "/index.json"
+
+
+def write_encodings(target: str, body: bytes) -> dict:
+    """Write the identity, gzip and brotli files; returns {encoding: size}"""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    encoded = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body, quality=11)
+
+    suffixes = {"identity": "", "gzip": ".gz", "br": ".br"}
+    for encoding, data in encoded.items():
+        with open(target + suffixes[encoding], "wb") as f:
+            f.write(data)
+    return {encoding: len(data) for encoding, data in encoded.items()}
+
+
+def build_static(output_dir: str, client: TestClient, paths) -> dict:
+    """Render paths into output_dir and write the manifest; returns it"""
+    version = knowledge_store.data_version
+    routes = {}
+    skipped = []
+    for path in paths:
+        r = client.get(path)
+        if r.status_code != 200:
+            skipped.append(path)
+            continue
+        rel = file_for(path)
+        routes[path] = {
+            "file": rel,
+            "etag": make_etag(version, path, b""),
+            "sha1": hashlib.sha1(r.content).hexdigest(),
+            "sizes": write_encodings(os.path.join(output_dir, rel), r.content),
+        }
+
+    manifest = {
+        "data_version": version,
+        "generated_at": int(time.time()),
+        "encodings": ["identity", "gzip"] + (["br"] if brotli is not None else []),
+        "routes": routes,
+        "skipped": skipped,
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return manifest
+
+
+def swap_directory(new: str, target: str):
+    """
+    Move the directory new into place at target. The old directory is renamed
+    aside first and deleted only after the new one is in place, so target is
+    missing for just the instant between the two renames instead of for a
+    whole recursive delete.
+    """
+    old = target.rstrip("/") + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(target):
+        os.replace(target, old)
+    os.replace(new, target)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Output directory (replaced)")
+    parser.add_argument("--skip-between", action="store_true", help="Skip the 3600 /api/guanxi/between pairs")
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("Static API Snapshot Build")
+    print("=" * 50)
+    if brotli is None:
+        print("  brotli not installed: writing identity and gzip only")
+
+    # Build into a temporary directory and swap, so a serving process never
+    # sees a half-written snapshot
+    building = args.output.rstrip("/") + ".building"
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    start = time.perf_counter()
+    with TestClient(app) as client:
+        paths = list(iter_read_paths(knowledge_store.snapshot, include_between=not args.skip_between))
+        manifest = build_static(building, client, paths)
+
+    swap_directory(building, args.output)
+
+    totals = {encoding: 0 for encoding in manifest["encodings"]}
+    for route in manifest["routes"].values():
+        for encoding, size in route["sizes"].items():
+            totals[encoding] += size
+    print(f"  Rendered {len(manifest['routes'])} routes at data version {manifest['data_version']} "
+          f"({len(manifest['skipped'])} skipped) in {time.perf_counter() - start:.1f}s")
+    for encoding, size in totals.items():
+        print(f"  {encoding}: {size / 1024:.0f} KiB")
+    print(f"  Output: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# Conditional GET for the read API
+#
+# Read responses depend only on the request and the global data version, so a
+# strong ETag is derived from the two without rendering the body. A matching
+# If-None-Match is answered with 304 before the request reaches a router (no
+# DB work); other responses get the ETag and Cache-Control headers. The data
+# version is only read from memory, never from the database, on this path.
+import hashlib
+import os
+from typing import Optional
+
+from app.store import knowledge_store
+
+
+# Path prefixes whose GET responses are versioned by the data
+CACHEABLE_PREFIXES = ("/api/ganzhi", "/api/nayin", "/api/shensha", "/api/guanxi", "/api/search", "/api/graph")
+
+# Seconds a client/CDN may reuse a response before revalidating
+CACHE_MAX_AGE = int(os.getenv("API_CACHE_MAX_AGE", "0"))
+CACHE_CONTROL = f"public, max-age={CACHE_MAX_AGE}, must-revalidate"
+
+
+def current_data_version() -> Optional[int]:
+    """
+    Version of the data being served, from memory only: the lifespan records
+    it when the snapshot is loaded at startup, and reloads keep it current.
+    None before startup; such requests are not given an ETag.
+    """
+    return knowledge_store.data_version
+
+
+def is_cacheable(path: str) -> bool:
+    """Whether a path is one of CACHEABLE_PREFIXES or below one of them"""
+    return any(path == prefix or path.startswith(prefix + "/") for prefix in CACHEABLE_PREFIXES)
+
+
+def make_etag(version: int, path: str, query_string: bytes) -> str:
+    """Strong ETag for a request at a data version"""
+    digest = hashlib.sha1(path.encode("utf-8") + b"?" + query_string).hexdigest()[:16]
+    return f'"v{version}-{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ConditionalGetMiddleware:
+    """ASGI middleware adding ETag / Cache-Control and answering 304s"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not is_cacheable(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        version = current_data_version()
+        if version is None:
+            await self.app(scope, receive, send)
+            return
+
+        etag = make_etag(version, scope["path"], scope["query_string"])
+        headers = [(b"etag", etag.encode("latin-1")), (b"cache-control", CACHE_CONTROL.encode("latin-1"))]
+
+        request_headers = dict(scope["headers"])
+        if_none_match = request_headers.get(b"if-none-match", b"").decode("latin-1")
+        if etag_matches(if_none_match, etag):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message = {**message, "headers": list(message.get("headers", [])) + headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
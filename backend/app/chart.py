@@ -0,0 +1,191 @@
+# Four-pillar chart analysis
+#
+# A chart is four Ganzhi (year, month, day, hour pillars). Everything needed to
+# analyse one is precomputed per sixty-cycle position (app.relations CYCLE
+# order): the nayin and shensha of each position, the relation bitmask of each
+# pair (the RelationMatrix), and for each ordered pair (i, j) the xiji entries
+# of i whose target j satisfies. Analysing a chart is then a few lookups in
+# flat integer-indexed tables, with no queries; the tables are built once per
+# snapshot.
+from itertools import combinations, permutations
+from types import MappingProxyType
+from typing import List, Optional, Sequence
+
+from app.import_data import TIAN_GAN, DI_ZHI
+from app.relations import CYCLE, CYCLE_INDEX, RelationMatrix
+
+
+PILLARS = ("year", "month", "day", "hour")
+# Pillar index pairs, in the order of the per-chart guanxi masks
+PILLAR_PAIRS = tuple(combinations(range(len(PILLARS)), 2))
+# Ordered pillar pairs (pillar, other pillar), the order xiji hits are listed in
+ORDERED_PILLAR_PAIRS = tuple(permutations(range(len(PILLARS)), 2))
+
+WUXING = ("金", "木", "水", "火", "土")
+SEASONS = ("春", "夏", "秋", "冬")
+DI_ZHI_SEASON = {
+    '寅': '春', '卯': '春', '辰': '春',
+    '巳': '夏', '午': '夏', '未': '夏',
+    '申': '秋', '酉': '秋', '戌': '秋',
+    '亥': '冬', '子': '冬', '丑': '冬'
+}
+# Trigram names used for directions in xiji targets (巽地 = 东南)
+TRIGRAM_FANGWEI = {
+    '坎': '北', '艮': '东北', '震': '东', '巽': '东南',
+    '离': '南', '坤': '西南', '兑': '西', '乾': '西北'
+}
+
+
+def pillar_tags(g: dict) -> frozenset:
+    """What a Ganzhi offers a xiji target: name, tiangan, dizhi, wuxing, season and direction"""
+    return frozenset({
+        ("ganzhi", g["ganzhi"]),
+        ("tiangan", g["tiangan"]),
+        ("dizhi", g["dizhi"]),
+        ("wuxing", g["tiangan_wuxing"]),
+        ("wuxing", g["dizhi_wuxing"]),
+        ("season", DI_ZHI_SEASON.get(g["dizhi"])),
+        ("fangwei", g["fangwei"]),
+    })
+
+
+def target_tags(value: Optional[str], directions: Sequence[str]) -> frozenset:
+    """
+    What a xiji target asks for; a pillar satisfies it when they share a tag.
+    A target is a Ganzhi (甲寅), a direction (南方, 西北, 巽地) or characters
+    naming stems, branches, wuxing or seasons (申酉, 丙丁火, 金旺, 春夏);
+    other characters (旺, 微, ...) qualify rather than select and are ignored,
+    and targets with nothing to select (夜, 雷电) never match.
+    """
+    value = (value or "").strip()
+    if value in CYCLE_INDEX:
+        return frozenset({("ganzhi", value)})
+    direction = value.removesuffix("方").removesuffix("地")
+    direction = TRIGRAM_FANGWEI.get(direction, direction)
+    if direction in directions:
+        return frozenset({("fangwei", direction)})
+
+    tags = set()
+    for char in value:
+        if char in TIAN_GAN:
+            tags.add(("tiangan", char))
+        elif char in DI_ZHI:
+            tags.add(("dizhi", char))
+        elif char in WUXING:
+            tags.add(("wuxing", char))
+        elif char in SEASONS:
+            tags.add(("season", char))
+    return frozenset(tags)
+
+
+class ChartTables:
+    """Per-position and per-pair lookup tables for chart analysis"""
+
+    def __init__(self, ganzhi, nayin, shensha, ganzhi_shensha, xiji, relation_matrix: RelationMatrix):
+        position_by_id = {g["id"]: CYCLE_INDEX[g["ganzhi"]] for g in ganzhi if g["ganzhi"] in CYCLE_INDEX}
+        rows = [None] * 60
+        for g in ganzhi:
+            if g["id"] in position_by_id:
+                rows[position_by_id[g["id"]]] = g
+
+        # Nayin and shensha (id order) of each position
+        self.nayin = [None] * 60
+        for n in nayin:
+            if n["ganzhi_id"] in position_by_id:
+                self.nayin[position_by_id[n["ganzhi_id"]]] = n
+        shensha_by_id = {s["id"]: s for s in shensha}
+        shensha_ids = [set() for _ in range(60)]
+        for link in ganzhi_shensha:
+            if link["ganzhi_id"] in position_by_id and link["shensha_id"] in shensha_by_id:
+                shensha_ids[position_by_id[link["ganzhi_id"]]].add(link["shensha_id"])
+        self.shensha = [tuple(shensha_by_id[sid] for sid in sorted(ids)) for ids in shensha_ids]
+
+        # Xiji entries by id, and hits[i * 60 + j]: ids of i's entries that j satisfies
+        self.xiji = MappingProxyType({x["id"]: x for x in xiji if x["ganzhi_id"] in position_by_id})
+        directions = {g["fangwei"] for g in ganzhi if g["fangwei"]}
+        offers = [pillar_tags(g) if g else frozenset() for g in rows]
+        wants = [[] for _ in range(60)]
+        for x in self.xiji.values():
+            wants[position_by_id[x["ganzhi_id"]]].append((x["id"], target_tags(x["target_value"], directions)))
+        self.xiji_hits = [
+            tuple(xid for xid, tags in wants[i] if tags & offers[j])
+            for i in range(60) for j in range(60)
+        ]
+
+        self.relation_matrix = relation_matrix
+        self.relation_masks = relation_matrix.masks
+
+    @staticmethod
+    def positions(names: Sequence[str]) -> Optional[List[int]]:
+        """Cycle positions of a chart's Ganzhi, or None if any name is unknown"""
+        positions = [CYCLE_INDEX.get(name) for name in names]
+        return None if None in positions else positions
+
+    def evaluate(self, positions: Sequence[int]) -> dict:
+        """
+        Integer form of a chart analysis: the relation mask of each pillar pair
+        (PILLAR_PAIRS order) and each xiji hit as [pillar, xiji id, matched by
+        pillar]
+        """
+        masks, hits = self.relation_masks, self.xiji_hits
+        rows = [i * 60 for i in positions]
+        return {
+            "pillars": list(positions),
+            "guanxi": [masks[rows[a] + positions[b]] for a, b in PILLAR_PAIRS],
+            "xiji": [[a, xid, b] for a, b in ORDERED_PILLAR_PAIRS for xid in hits[rows[a] + positions[b]]],
+        }
+
+    def analyze(self, positions: Sequence[int]) -> dict:
+        """Readable analysis of one chart: pillars, pairwise guanxi and xiji hits"""
+        evaluated = self.evaluate(positions)
+        matrix = self.relation_matrix
+
+        guanxi = []
+        for (a, b), mask in zip(PILLAR_PAIRS, evaluated["guanxi"]):
+            if mask:
+                guanxi.append({
+                    "pillars": [PILLARS[a], PILLARS[b]],
+                    "ganzhi1": CYCLE[positions[a]],
+                    "ganzhi2": CYCLE[positions[b]],
+                    "relation_types": matrix.decode(mask),
+                    "relation_mask": mask,
+                })
+
+        matched_by = {}
+        for a, xid, b in evaluated["xiji"]:
+            matched_by.setdefault((a, xid), []).append(PILLARS[b])
+        xiji = [
+            {
+                **self.xiji[xid],
+                "pillar": PILLARS[a],
+                "ganzhi": CYCLE[positions[a]],
+                "matched_by": pillars,
+            }
+            for (a, xid), pillars in sorted(matched_by.items())
+        ]
+
+        return {
+            "pillars": [
+                {
+                    "pillar": PILLARS[a],
+                    "ganzhi": CYCLE[i],
+                    "nayin": self.nayin[i],
+                    "shensha": list(self.shensha[i]),
+                }
+                for a, i in enumerate(positions)
+            ],
+            "guanxi": guanxi,
+            "xiji": xiji,
+        }
+
+    def legend(self) -> dict:
+        """What the integers of evaluate() refer to"""
+        return {
+            "pillar_names": list(PILLARS),
+            "pairs": [list(pair) for pair in PILLAR_PAIRS],
+            "relation_bits": dict(self.relation_matrix.bits),
+            "ganzhi": list(CYCLE),
+            "nayin": [n["nayin_name"] if n else None for n in self.nayin],
+            "shensha": [[s["name"] for s in rows] for rows in self.shensha],
+            "xiji": list(self.xiji.values()),
+        }
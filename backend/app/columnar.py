@@ -0,0 +1,147 @@
+# Columnar table exports
+#
+# Every table can be downloaded as gzip-compressed CSV and, when the optional
+# pyarrow package is installed, as an Arrow IPC file or Parquet, so analytics
+# clients load it with one vectorized read (pandas.read_csv / read_parquet,
+# pyarrow.ipc.open_file) instead of decoding JSON. Files are written from
+# batched column fetches and cached on disk under the data version, so each is
+# built once per import and then served as a plain file.
+import contextlib
+import csv
+import glob
+import gzip
+import io
+import os
+import tempfile
+from typing import Optional, Tuple
+
+from sqlalchemy import Boolean, Float, Integer, select
+
+from app.data_version import get_data_version
+from app.database import SessionLocal
+from app.export import EXPORT_TABLES, table_columns
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+COLUMNAR_CACHE_DIR = os.getenv(
+    "COLUMNAR_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "columnar_cache")
+)
+COLUMNAR_BATCH_SIZE = int(os.getenv("COLUMNAR_BATCH_SIZE", "5000"))
+
+MEDIA_TYPES = {
+    "csv.gz": "application/gzip",
+    "arrow": "application/vnd.apache.arrow.file",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def available_formats() -> Tuple[str, ...]:
+    """Formats that can be generated here (Arrow and Parquet need pyarrow)"""
+    return ("csv.gz",) + (("arrow", "parquet") if pyarrow is not None else ())
+
+
+def parse_filename(filename: str) -> Optional[Tuple[str, str]]:
+    """'xiangyi.csv.gz' -> ('xiangyi', 'csv.gz'); None for an unknown extension"""
+    for fmt in MEDIA_TYPES:
+        if filename.endswith("." + fmt):
+            return filename[:-len(fmt) - 1], fmt
+    return None
+
+
+def row_batches(db, model, batch_size: int = COLUMNAR_BATCH_SIZE):
+    """Rows of a table as lists of tuples (columns in table order, by id), batch_size at a time"""
+    table = model.__table__
+    result = db.execute(select(table).order_by(table.c.id).execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+
+def write_csv_gz(path: str, names, batches):
+    with open(path, "wb") as raw, gzip.GzipFile(filename="", fileobj=raw, mode="wb", compresslevel=6, mtime=0) as gz:
+        with io.TextIOWrapper(gz, encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(names)
+            for rows in batches:
+                writer.writerows(rows)
+
+
+def arrow_schema(model):
+    """Arrow schema of a table from its column types"""
+    def arrow_type(column):
+        if isinstance(column.type, Boolean):
+            return pyarrow.bool_()
+        if isinstance(column.type, Integer):
+            return pyarrow.int64()
+        if isinstance(column.type, Float):
+            return pyarrow.float64()
+        return pyarrow.string()
+    return pyarrow.schema([(column.name, arrow_type(column)) for column in model.__table__.columns])
+
+
+def arrow_batches(schema, batches):
+    """Record batches built column by column from row batches"""
+    for rows in batches:
+        columns = list(zip(*rows))
+        yield pyarrow.RecordBatch.from_arrays(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        )
+
+
+def write_arrow(path: str, model, batches):
+    schema = arrow_schema(model)
+    with pyarrow.ipc.new_file(path, schema) as writer:
+        for batch in arrow_batches(schema, batches):
+            writer.write_batch(batch)
+
+
+def write_parquet(path: str, model, batches):
+    schema = arrow_schema(model)
+    with pyarrow.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in arrow_batches(schema, batches):
+            writer.write_batch(batch)
+
+
+def cached_export(table_name: str, fmt: str) -> str:
+    """
+    Path of the export of a table in a format at the current data version,
+    generating it (and dropping older versions) when it is not cached yet.
+    """
+    model = EXPORT_TABLES[table_name]
+    db = SessionLocal()
+    try:
+        version = get_data_version(db)
+        os.makedirs(COLUMNAR_CACHE_DIR, exist_ok=True)
+        path = os.path.join(COLUMNAR_CACHE_DIR, f"{table_name}-v{version}.{fmt}")
+        if os.path.exists(path):
+            return path
+
+        # Write to a temporary file and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=COLUMNAR_CACHE_DIR, suffix=".tmp")
+        os.close(fd)
+        try:
+            batches = row_batches(db, model)
+            if fmt == "csv.gz":
+                write_csv_gz(tmp_path, table_columns(model), batches)
+            elif fmt == "arrow":
+                write_arrow(tmp_path, model, batches)
+            else:
+                write_parquet(tmp_path, model, batches)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    finally:
+        db.close()
+
+    for stale in glob.glob(os.path.join(COLUMNAR_CACHE_DIR, f"{table_name}-v*.{fmt}")):
+        if stale != path:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(stale)
+    return path
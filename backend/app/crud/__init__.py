@@ -1,2 +1,3 @@
 # CRUD operations
-from app.crud import ganzhi, nayin, shensha, guanxi
+from app.crud import ganzhi, nayin, shensha, guanxi, search, chart, graph
+from app.crud import aio
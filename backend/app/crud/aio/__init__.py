@@ -0,0 +1,9 @@
+# Async CRUD operations
+#
+# Awaitable versions of the crud modules for AsyncSession. Each function runs
+# its sync implementation through AsyncSession.run_sync: snapshot-served reads
+# never touch a connection, and database fallbacks drive aiosqlite from the
+# event loop instead of holding a threadpool worker for the whole request.
+# run_sync is for query I/O only: CPU-heavy work such as rebuilding the graph
+# or the chart tables from whole tables goes through run_in_threadpool.
+from app.crud.aio import ganzhi, nayin, shensha, guanxi, search, chart, graph
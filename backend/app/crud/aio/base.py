@@ -0,0 +1,12 @@
+# Helpers for the async CRUD modules
+import functools
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def awaitable(fn):
+    """Wrap a sync crud function taking a Session as an async one taking an AsyncSession"""
+    @functools.wraps(fn)
+    async def wrapper(db: AsyncSession, *args, **kwargs):
+        return await db.run_sync(fn, *args, **kwargs)
+    return wrapper
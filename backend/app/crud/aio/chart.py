@@ -0,0 +1,33 @@
+# Async CRUD operations for four-pillar chart analysis
+from typing import List
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.chart import ChartTables
+from app.crud import chart as _sync
+from app.store import knowledge_store
+
+
+async def get_chart_tables(db: AsyncSession) -> ChartTables:
+    """The snapshot's chart tables, or tables built from the database (in the threadpool)"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.chart_tables
+    tables = await db.run_sync(_sync.read_chart_tables)
+    return await run_in_threadpool(_sync.build_chart_tables, *tables)
+
+
+async def analyze_chart(db: AsyncSession, pillars: List[str]) -> dict:
+    """Async analyze_chart; see app.crud.chart"""
+    return _sync.analyze_chart(db, pillars, await get_chart_tables(db))
+
+
+async def analyze_charts(db: AsyncSession, charts: List[List[str]]) -> dict:
+    """
+    Async analyze_charts; see app.crud.chart. The session is only used to
+    load the tables; evaluating the charts (about 14 µs each) runs in the
+    threadpool.
+    """
+    tables = await get_chart_tables(db)
+    return await run_in_threadpool(_sync.analyze_charts, None, charts, tables)
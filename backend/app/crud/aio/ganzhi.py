@@ -0,0 +1,14 @@
+# Async CRUD operations for Ganzhi
+from app.crud import ganzhi as _sync
+from app.crud.aio.base import awaitable
+
+
+get_ganzhi_list = awaitable(_sync.get_ganzhi_list)
+get_ganzhi_by_id = awaitable(_sync.get_ganzhi_by_id)
+get_ganzhi_by_name = awaitable(_sync.get_ganzhi_by_name)
+search_ganzhi = awaitable(_sync.search_ganzhi)
+get_ganzhi_details_bulk = awaitable(_sync.get_ganzhi_details_bulk)
+get_ganzhi_with_details = awaitable(_sync.get_ganzhi_with_details)
+compare_ganzhi = awaitable(_sync.compare_ganzhi)
+get_ganzhi_batch = awaitable(_sync.get_ganzhi_batch)
+get_all_ganzhi_names = awaitable(_sync.get_all_ganzhi_names)
@@ -0,0 +1,16 @@
+# Async CRUD operations for the knowledge graph
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import graph as _sync
+from app.graph import KnowledgeGraph
+from app.store import knowledge_store
+
+
+async def get_graph(db: AsyncSession) -> KnowledgeGraph:
+    """The snapshot's knowledge graph, or one built from the database (compiled in the threadpool)"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.graph
+    tables = await db.run_sync(_sync.read_graph_tables)
+    return await run_in_threadpool(_sync.build_graph_tables, *tables)
@@ -0,0 +1,55 @@
+# Async CRUD operations for Guanxi
+#
+# Without a snapshot, the relation matrix is built from the whole guanxi
+# table: the rows are read through run_sync and the matrix is built in the
+# threadpool, then handed to the sync functions. get_guanxi_between is the
+# exception: it answers from the pair's own rows.
+from typing import List
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.crud import guanxi as _sync
+from app.crud.aio.base import awaitable
+from app.relations import RelationMatrix
+from app.store import knowledge_store
+
+
+get_all_guanxi = awaitable(_sync.get_all_guanxi)
+get_guanxi_by_id = awaitable(_sync.get_guanxi_by_id)
+# Without a snapshot this reads only the pair's rows; no matrix is needed
+get_guanxi_between = awaitable(_sync.get_guanxi_between)
+
+
+async def get_relation_matrix(db: AsyncSession) -> RelationMatrix:
+    """The snapshot's relation matrix, or one built from the database (in the threadpool)"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.relation_matrix
+    rows = await db.run_sync(_sync.read_guanxi_rows)
+    return await run_in_threadpool(RelationMatrix, rows)
+
+
+async def get_guanxi_by_type(db: AsyncSession, relation_type: str) -> List[dict]:
+    """Async get_guanxi_by_type; see app.crud.guanxi"""
+    return _sync.get_guanxi_by_type(db, relation_type, await get_relation_matrix(db))
+
+
+async def get_guanxi_by_ganzhi(db: AsyncSession, ganzhi_name: str) -> List[dict]:
+    """Async get_guanxi_by_ganzhi; see app.crud.guanxi"""
+    return _sync.get_guanxi_by_ganzhi(db, ganzhi_name, await get_relation_matrix(db))
+
+
+async def get_relation_masks(db: AsyncSession, pairs: List[tuple]) -> dict:
+    """Async get_relation_masks; see app.crud.guanxi"""
+    return _sync.get_relation_masks(db, pairs, await get_relation_matrix(db))
+
+
+async def get_relation_types(db: AsyncSession) -> List[str]:
+    """Async get_relation_types; see app.crud.guanxi"""
+    return _sync.get_relation_types(db, await get_relation_matrix(db))
+
+
+async def get_ganzhi_pairs_by_type(db: AsyncSession, relation_type: str) -> List[dict]:
+    """Async get_ganzhi_pairs_by_type; see app.crud.guanxi"""
+    return _sync.get_ganzhi_pairs_by_type(db, relation_type, await get_relation_matrix(db))
@@ -0,0 +1,12 @@
+# Async CRUD operations for Nayin
+from app.crud import nayin as _sync
+from app.crud.aio.base import awaitable
+
+
+get_nayin_by_ganzhi = awaitable(_sync.get_nayin_by_ganzhi)
+get_ganzhi_by_nayin = awaitable(_sync.get_ganzhi_by_nayin)
+get_all_nayin_categories = awaitable(_sync.get_all_nayin_categories)
+get_nayin_by_category = awaitable(_sync.get_nayin_by_category)
+get_status_list = awaitable(_sync.get_status_list)
+get_nayin_by_status = awaitable(_sync.get_nayin_by_status)
+check_calc_consistency = awaitable(_sync.check_calc_consistency)
@@ -0,0 +1,10 @@
+# Async CRUD operations for full-text search and autocomplete
+from app.crud import search as _sync
+from app.crud.aio.base import awaitable
+
+
+search_index_exists = awaitable(_sync.search_index_exists)
+ensure_search_index = awaitable(_sync.ensure_search_index)
+rebuild_search_index = awaitable(_sync.rebuild_search_index)
+search_text = awaitable(_sync.search_text)
+suggest = awaitable(_sync.suggest)
@@ -0,0 +1,14 @@
+# Async CRUD operations for Shensha
+from app.crud import shensha as _sync
+from app.crud.aio.base import awaitable
+
+
+get_all_shensha = awaitable(_sync.get_all_shensha)
+get_shensha_by_name = awaitable(_sync.get_shensha_by_name)
+get_shensha_by_id = awaitable(_sync.get_shensha_by_id)
+get_shensha_by_ganzhi = awaitable(_sync.get_shensha_by_ganzhi)
+get_ganzhi_by_shensha = awaitable(_sync.get_ganzhi_by_shensha)
+get_ganzhi_with_all_shensha = awaitable(_sync.get_ganzhi_with_all_shensha)
+get_zixing_shensha = awaitable(_sync.get_zixing_shensha)
+get_shensha_by_type = awaitable(_sync.get_shensha_by_type)
+get_shensha_types = awaitable(_sync.get_shensha_types)
@@ -0,0 +1,72 @@
+# CRUD operations for four-pillar chart analysis
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.chart import ChartTables
+from app.models import Ganzhi, Nayin, Shensha, GanzhiShensha, Xiji, Guanxi
+from app.relations import CYCLE_INDEX, RelationMatrix
+from app.store import knowledge_store
+
+
+def _rows(db: Session, model) -> List[dict]:
+    table = model.__table__
+    return [dict(row) for row in db.execute(select(table).order_by(table.c.id)).mappings().all()]
+
+
+def read_chart_tables(db: Session) -> tuple:
+    """The rows ChartTables needs, one query per table"""
+    return (
+        _rows(db, Ganzhi), _rows(db, Nayin), _rows(db, Shensha), _rows(db, GanzhiShensha), _rows(db, Xiji),
+        _rows(db, Guanxi),
+    )
+
+
+def build_chart_tables(ganzhi, nayin, shensha, ganzhi_shensha, xiji, guanxi) -> ChartTables:
+    """Build the chart lookup tables from the rows of read_chart_tables"""
+    return ChartTables(ganzhi, nayin, shensha, ganzhi_shensha, xiji, RelationMatrix(guanxi))
+
+
+def _chart_tables(db: Session) -> ChartTables:
+    """The snapshot's chart tables, or tables built from the database (one query per table)"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.chart_tables
+    return build_chart_tables(*read_chart_tables(db))
+
+
+def _unknown(charts: List[List[str]]) -> List[str]:
+    return list(dict.fromkeys(name for chart in charts for name in chart if name not in CYCLE_INDEX))
+
+
+def analyze_chart(db: Session, pillars: List[str], tables: Optional[ChartTables] = None) -> dict:
+    """
+    Analyse one chart (year, month, day, hour Ganzhi).
+    Returns {"pillars", "guanxi", "xiji", "unknown"}; only unknown is filled
+    when a name is outside the sixty-cycle. Pass tables to skip the lookup.
+    """
+    unknown = _unknown([pillars])
+    if unknown:
+        return {"pillars": [], "guanxi": [], "xiji": [], "unknown": unknown}
+    if tables is None:
+        tables = _chart_tables(db)
+    return {**tables.analyze(tables.positions(pillars)), "unknown": []}
+
+
+def analyze_charts(db: Session, charts: List[List[str]], tables: Optional[ChartTables] = None) -> dict:
+    """
+    Analyse many charts in integer form against one set of lookup tables.
+    Returns {"legend", "items", "unknown"}; items are empty when any name is
+    outside the sixty-cycle. Pass tables to skip the lookup.
+    """
+    unknown = _unknown(charts)
+    if unknown:
+        return {"legend": None, "items": [], "unknown": unknown}
+    if tables is None:
+        tables = _chart_tables(db)
+    return {
+        "legend": tables.legend(),
+        "items": [tables.evaluate(tables.positions(chart)) for chart in charts],
+        "unknown": [],
+    }
@@ -1,21 +1,32 @@
 # CRUD operations for Ganzhi
-from sqlalchemy.orm import Session
-from app.models import Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi
-from typing import List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, selectinload
+from app.models import Ganzhi, GanzhiShensha, Guanxi
+from app.store import knowledge_store
+from typing import List, Optional, Sequence
 
 
 def get_ganzhi_list(db: Session, skip: int = 0, limit: int = 60) -> List[Ganzhi]:
     """Get list of all Ganzhi"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return list(snapshot.ganzhi[skip:skip + limit])
     return db.query(Ganzhi).offset(skip).limit(limit).all()
 
 
 def get_ganzhi_by_id(db: Session, ganzhi_id: int) -> Optional[Ganzhi]:
     """Get Ganzhi by ID"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.ganzhi_by_id.get(ganzhi_id)
     return db.query(Ganzhi).filter(Ganzhi.id == ganzhi_id).first()
 
 
 def get_ganzhi_by_name(db: Session, ganzhi_name: str) -> Optional[Ganzhi]:
     """Get Ganzhi by name (e.g., '甲子')"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.ganzhi_by_name.get(ganzhi_name)
     return db.query(Ganzhi).filter(Ganzhi.ganzhi == ganzhi_name).first()
 
 
@@ -24,48 +35,42 @@ def search_ganzhi(db: Session, query: str, skip: int = 0, limit: int = 20) -> tu
     Search Ganzhi by query string
     Returns (total_count, results)
     """
-    # Build search filter
-    filter_query = db.query(Ganzhi).filter(
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        matches = [
+            g for g in snapshot.ganzhi
+            if query in g["ganzhi"] or query in g["tiangan"] or query in g["dizhi"]
+        ]
+        return len(matches), matches[skip:skip + limit]
+
+    # Build search filter; the total rides along as a window column
+    rows = db.query(Ganzhi, func.count().over().label("total")).filter(
         (Ganzhi.ganzhi.contains(query)) |
         (Ganzhi.tiangan.contains(query)) |
         (Ganzhi.dizhi.contains(query))
-    )
+    ).offset(skip).limit(limit).all()
 
-    total = filter_query.count()
-    results = filter_query.offset(skip).limit(limit).all()
+    if not rows:
+        return 0, []
+    return rows[0].total, [row.Ganzhi for row in rows]
 
-    return total, results
 
+# Related sections of a detail payload, in payload order
+DETAIL_SECTIONS = ("nayin", "xiangyi", "shensha", "xiji", "guanxi")
 
-def get_ganzhi_with_details(db: Session, ganzhi_name: str) -> Optional[dict]:
-    """Get complete Ganzhi with all related data"""
-    ganzhi = db.query(Ganzhi).filter(Ganzhi.ganzhi == ganzhi_name).first()
-    if not ganzhi:
-        return None
-
-    # Get Nayin
-    nayin = db.query(Nayin).filter(Nayin.ganzhi_id == ganzhi.id).first()
-
-    # Get Xiangyi
-    xiangyi = db.query(Xiangyi).filter(Xiangyi.ganzhi_id == ganzhi.id).all()
-
-    # Get Shensha (through GanzhiShensha)
-    shensha_ids = db.query(GanzhiShensha.shensha_id).filter(
-        GanzhiShensha.ganzhi_id == ganzhi.id
-    ).all()
-    shensha_ids = [s[0] for s in shensha_ids]
-    shensha = db.query(Shensha).filter(Shensha.id.in_(shensha_ids)).all() if shensha_ids else []
+# Eager-load every per-Ganzhi relationship so a batch of N Ganzhi costs a
+# constant number of queries (one per relationship) instead of six per name.
+DETAIL_LOAD_OPTIONS = {
+    "nayin": joinedload(Ganzhi.nayin),
+    "xiangyi": selectinload(Ganzhi.xiangyi_list),
+    "xiji": selectinload(Ganzhi.xiji_list),
+    "shensha": selectinload(Ganzhi.shensha_list).joinedload(GanzhiShensha.shensha),
+}
 
-    # Get Xiji
-    xiji = db.query(Xiji).filter(Xiji.ganzhi_id == ganzhi.id).all()
 
-    # Get Guanxi (relations where this ganzhi is either ganzhi1 or ganzhi2)
-    guanxi = db.query(Guanxi).filter(
-        (Guanxi.ganzhi1 == ganzhi.ganzhi) |
-        (Guanxi.ganzhi2 == ganzhi.ganzhi)
-    ).all()
-
-    return {
+def _serialize_details(ganzhi: Ganzhi, guanxi: List[Guanxi], include: Sequence[str] = DETAIL_SECTIONS) -> dict:
+    """Build the detail payload (basic info plus the included sections) from an eagerly loaded Ganzhi"""
+    details = {
         "id": ganzhi.id,
         "tiangan": ganzhi.tiangan,
         "dizhi": ganzhi.dizhi,
@@ -78,25 +83,92 @@ def get_ganzhi_with_details(db: Session, ganzhi_name: str) -> Optional[dict]:
         "tiangan_yuanshiming": ganzhi.tiangan_yuanshiming,
         "dizhi_yuanshiming": ganzhi.dizhi_yuanshiming,
         "special_desc": ganzhi.special_desc,
-        "nayin": nayin,
-        "xiangyi": xiangyi,
-        "shensha": shensha,
-        "xiji": xiji,
-        "guanxi": guanxi
     }
+    if "nayin" in include:
+        details["nayin"] = ganzhi.nayin
+    if "xiangyi" in include:
+        details["xiangyi"] = list(ganzhi.xiangyi_list)
+    if "shensha" in include:
+        shensha = {link.shensha.id: link.shensha for link in ganzhi.shensha_list if link.shensha}
+        details["shensha"] = [shensha[sid] for sid in sorted(shensha)]
+    if "xiji" in include:
+        details["xiji"] = list(ganzhi.xiji_list)
+    if "guanxi" in include:
+        details["guanxi"] = guanxi
+    return details
+
+
+def get_ganzhi_details_bulk(db: Session, ganzhi_names: List[str], include: Sequence[str] = DETAIL_SECTIONS) -> dict:
+    """
+    Get Ganzhi details for many names at once, with only the included
+    sections. Returns {name: details} for the names that exist; issues one
+    query for the Ganzhi (and nayin) plus one per other included section,
+    regardless of how many names are requested.
+    """
+    names = list(dict.fromkeys(ganzhi_names))
+    if not names:
+        return {}
+
+    options = [DETAIL_LOAD_OPTIONS[section] for section in include if section in DETAIL_LOAD_OPTIONS]
+    ganzhis = db.query(Ganzhi).options(*options).filter(Ganzhi.ganzhi.in_(names)).all()
+    if not ganzhis:
+        return {}
+
+    # Guanxi references Ganzhi by name, so fetch both sides in one query
+    found = [g.ganzhi for g in ganzhis]
+    guanxi_by_name = {name: [] for name in found}
+    if "guanxi" in include:
+        relations = db.query(Guanxi).filter(
+            Guanxi.ganzhi1.in_(found) | Guanxi.ganzhi2.in_(found)
+        ).order_by(Guanxi.id).all()
+        for rel in relations:
+            for name in {rel.ganzhi1, rel.ganzhi2}:
+                if name in guanxi_by_name:
+                    guanxi_by_name[name].append(rel)
+
+    return {g.ganzhi: _serialize_details(g, guanxi_by_name[g.ganzhi], include) for g in ganzhis}
+
+
+def get_ganzhi_with_details(db: Session, ganzhi_name: str) -> Optional[dict]:
+    """Get complete Ganzhi with all related data"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.details_by_name.get(ganzhi_name)
+
+    return get_ganzhi_details_bulk(db, [ganzhi_name]).get(ganzhi_name)
 
 
 def compare_ganzhi(db: Session, ganzhi_names: List[str]) -> List[dict]:
     """Compare multiple Ganzhi by their names"""
-    results = []
-    for name in ganzhi_names:
-        data = get_ganzhi_with_details(db, name)
-        if data:
-            results.append(data)
-    return results
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        details = snapshot.details_by_name
+    else:
+        details = get_ganzhi_details_bulk(db, ganzhi_names)
+    return [details[name] for name in ganzhi_names if name in details]
+
+
+def get_ganzhi_batch(db: Session, ganzhi_names: List[str], include: Sequence[str] = DETAIL_SECTIONS) -> dict:
+    """
+    Details of many Ganzhi keyed by name, in request order (duplicates and
+    unknown names dropped), with only the included sections
+    """
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        excluded = set(DETAIL_SECTIONS) - set(include)
+        details = {
+            name: {key: value for key, value in snapshot.details_by_name[name].items() if key not in excluded}
+            for name in ganzhi_names if name in snapshot.details_by_name
+        }
+    else:
+        details = get_ganzhi_details_bulk(db, ganzhi_names, include)
+    return {name: details[name] for name in ganzhi_names if name in details}
 
 
 def get_all_ganzhi_names(db: Session) -> List[str]:
     """Get all Ganzhi names (for autocomplete)"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return list(snapshot.ganzhi_names)
     ganzhis = db.query(Ganzhi).all()
     return [g.ganzhi for g in ganzhis]
@@ -0,0 +1,29 @@
+# CRUD operations for the knowledge graph
+from sqlalchemy.orm import Session
+
+from app.crud.chart import _rows
+from app.graph import KnowledgeGraph, build_graph, load_kg_data
+from app.models import Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi
+from app.relations import RelationMatrix
+from app.store import knowledge_store
+
+
+def read_graph_tables(db: Session) -> tuple:
+    """The rows build_graph_tables needs (one query per table) and KG_logic.json"""
+    return (
+        _rows(db, Ganzhi), _rows(db, Nayin), _rows(db, Xiangyi), _rows(db, Shensha), _rows(db, GanzhiShensha),
+        _rows(db, Xiji), _rows(db, Guanxi), load_kg_data(),
+    )
+
+
+def build_graph_tables(ganzhi, nayin, xiangyi, shensha, ganzhi_shensha, xiji, guanxi, kg_data) -> KnowledgeGraph:
+    """Compile the knowledge graph from the rows of read_graph_tables"""
+    return build_graph(ganzhi, nayin, xiangyi, shensha, ganzhi_shensha, xiji, RelationMatrix(guanxi), kg_data)
+
+
+def get_graph(db: Session) -> KnowledgeGraph:
+    """The snapshot's knowledge graph, or one built from the database (one query per table)"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.graph
+    return build_graph_tables(*read_graph_tables(db))
@@ -1,94 +1,161 @@
 # CRUD operations for Guanxi
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.orm import Session
-from app.models import Guanxi, Ganzhi
+from app.models import Guanxi
+from app.relations import CYCLE, CYCLE_INDEX, RELATION_TYPES, RelationMatrix, cell_relations, relation_type_order
+from app.store import knowledge_store
 from typing import List, Optional
 
 
+def read_guanxi_rows(db: Session) -> List[dict]:
+    """Every guanxi row, in id order"""
+    rows = db.execute(select(Guanxi.__table__).order_by(Guanxi.id)).mappings().all()
+    return [dict(row) for row in rows]
+
+
+def _relation_matrix(db: Session, matrix: Optional[RelationMatrix] = None) -> RelationMatrix:
+    """The given matrix, the snapshot's, or one built from the guanxi table"""
+    if matrix is not None:
+        return matrix
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.relation_matrix
+    return RelationMatrix(read_guanxi_rows(db))
+
+
 def get_all_guanxi(db: Session, skip: int = 0, limit: int = 300) -> List[Guanxi]:
     """Get all Guanxi relationships"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return list(snapshot.guanxi[skip:skip + limit])
     return db.query(Guanxi).offset(skip).limit(limit).all()
 
 
 def get_guanxi_by_id(db: Session, guanxi_id: int) -> Optional[Guanxi]:
     """Get Guanxi by ID"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.guanxi_by_id.get(guanxi_id)
     return db.query(Guanxi).filter(Guanxi.id == guanxi_id).first()
 
 
-def get_guanxi_by_type(db: Session, relation_type: str) -> List[dict]:
-    """Get all Guanxi by relation type"""
-    relationships = db.query(Guanxi).filter(Guanxi.relation_type == relation_type).all()
+def get_guanxi_by_type(db: Session, relation_type: str, matrix: Optional[RelationMatrix] = None) -> List[dict]:
+    """
+    Get all Guanxi by relation type.
+    Includes rule-derived relations (id is None for those).
+    """
+    return [dict(rel) for rel in _relation_matrix(db, matrix).by_type.get(relation_type, ())]
 
-    results = []
-    for rel in relationships:
-        results.append({
-            "id": rel.id,
-            "ganzhi1": rel.ganzhi1,
-            "ganzhi2": rel.ganzhi2,
-            "relation_type": rel.relation_type,
-            "remark": rel.remark
-        })
 
-    return results
+def get_guanxi_by_ganzhi(db: Session, ganzhi_name: str, matrix: Optional[RelationMatrix] = None) -> List[dict]:
+    """
+    Get all Guanxi relationships for a specific Ganzhi.
+    Includes rule-derived relations (id is None for those).
+    """
+    return [dict(rel) for rel in _relation_matrix(db, matrix).by_ganzhi.get(ganzhi_name, ())]
 
 
-def get_guanxi_by_ganzhi(db: Session, ganzhi_name: str) -> List[dict]:
-    """Get all Guanxi relationships for a specific Ganzhi"""
-    relationships = db.query(Guanxi).filter(
-        (Guanxi.ganzhi1 == ganzhi_name) | (Guanxi.ganzhi2 == ganzhi_name)
-    ).all()
+def _pair_from_db(db: Session, ganzhi1: str, ganzhi2: str) -> Optional[dict]:
+    """
+    get_guanxi_between without a relation matrix: only the stored rows of the
+    pair (both orders, through ix_guanxi_pair_type) plus its rule-derived types
+    """
+    i, j = CYCLE_INDEX.get(ganzhi1), CYCLE_INDEX.get(ganzhi2)
+    if i is None or j is None:
+        return None
+    i, j = min(i, j), max(i, j)
+    a, b = CYCLE[i], CYCLE[j]
+
+    # Two equality pairs rather than a row-value IN list, which SQLite answers
+    # with a full scan instead of the (ganzhi1, ganzhi2) index
+    table = Guanxi.__table__
+    rows = db.execute(
+        select(table)
+        .where(or_(and_(table.c.ganzhi1 == a, table.c.ganzhi2 == b),
+                   and_(table.c.ganzhi1 == b, table.c.ganzhi2 == a)))
+        .order_by(table.c.id)
+    ).mappings().all()
+    relations = cell_relations(i, j, rows)
+    if not relations:
+        return None
 
-    results = []
-    for rel in relationships:
-        # Determine which is the "other" ganzhi
-        other_ganzhi = rel.ganzhi2 if rel.ganzhi1 == ganzhi_name else rel.ganzhi1
+    types = RELATION_TYPES
+    if any(rel["relation_type"] and rel["relation_type"] not in types for rel in relations):
+        # Bits past RELATION_TYPES depend on the table-wide order of first appearance
+        types = relation_type_order(db.execute(
+            select(Guanxi.relation_type).group_by(Guanxi.relation_type).order_by(func.min(Guanxi.id))
+        ).scalars())
+    bits = {t: 1 << k for k, t in enumerate(types)}
+    mask = 0
+    for rel in relations:
+        mask |= bits.get(rel["relation_type"], 0)
+    return {
+        **relations[0],
+        "relation_types": [t for t in types if mask & bits[t]],
+        "relation_mask": mask
+    }
 
-        results.append({
-            "id": rel.id,
-            "ganzhi1": rel.ganzhi1,
-            "ganzhi2": rel.ganzhi2,
-            "relation_type": rel.relation_type,
-            "remark": rel.remark,
-            "other_ganzhi": other_ganzhi
-        })
 
-    return results
+def get_guanxi_between(db: Session, ganzhi1: str, ganzhi2: str,
+                       matrix: Optional[RelationMatrix] = None) -> Optional[dict]:
+    """
+    Get the Guanxi relationship between two specific Ganzhi.
+    Returns the first relation (stored rows before rule-derived ones) together
+    with every relation type and the relation bitmask of the pair.
+    """
+    if matrix is None and knowledge_store.snapshot is None:
+        return _pair_from_db(db, ganzhi1, ganzhi2)
+    matrix = _relation_matrix(db, matrix)
+    relations = matrix.relations(ganzhi1, ganzhi2)
+    if not relations:
+        return None
 
+    mask = matrix.mask(ganzhi1, ganzhi2)
+    return {
+        **relations[0],
+        "relation_types": matrix.decode(mask),
+        "relation_mask": mask
+    }
 
-def get_guanxi_between(db: Session, ganzhi1: str, ganzhi2: str) -> Optional[dict]:
-    """Get the Guanxi relationship between two specific Ganzhi"""
-    rel = db.query(Guanxi).filter(
-        ((Guanxi.ganzhi1 == ganzhi1) & (Guanxi.ganzhi2 == ganzhi2)) |
-        ((Guanxi.ganzhi1 == ganzhi2) & (Guanxi.ganzhi2 == ganzhi1))
-    ).first()
 
-    if not rel:
-        return None
+def get_relation_masks(db: Session, pairs: List[tuple], matrix: Optional[RelationMatrix] = None) -> dict:
+    """
+    Get the relation bitmask for many Ganzhi pairs at once.
+    Returns {"relation_bits", "items", "unknown"}; unknown lists names outside
+    the sixty-cycle.
+    """
+    matrix = _relation_matrix(db, matrix)
+    items = []
+    unknown = []
+    for ganzhi1, ganzhi2 in pairs:
+        mask = matrix.mask(ganzhi1, ganzhi2)
+        if mask is None:
+            unknown.extend(name for name in (ganzhi1, ganzhi2) if name not in CYCLE_INDEX)
+            continue
+        items.append({
+            "ganzhi1": ganzhi1,
+            "ganzhi2": ganzhi2,
+            "mask": mask,
+            "relation_types": matrix.decode(mask)
+        })
 
     return {
-        "id": rel.id,
-        "ganzhi1": rel.ganzhi1,
-        "ganzhi2": rel.ganzhi2,
-        "relation_type": rel.relation_type,
-        "remark": rel.remark
+        "relation_bits": dict(matrix.bits),
+        "items": items,
+        "unknown": list(dict.fromkeys(unknown))
     }
 
 
-def get_relation_types(db: Session) -> List[str]:
-    """Get all unique relation types"""
-    types = db.query(Guanxi.relation_type).distinct().all()
-    return [t[0] for t in types if t[0]]
+def get_relation_types(db: Session, matrix: Optional[RelationMatrix] = None) -> List[str]:
+    """Get all relation types that occur between at least one pair"""
+    matrix = _relation_matrix(db, matrix)
+    return [t for t in matrix.types if t in matrix.by_type]
 
 
-def get_ganzhi_pairs_by_type(db: Session, relation_type: str) -> List[dict]:
+def get_ganzhi_pairs_by_type(db: Session, relation_type: str,
+                             matrix: Optional[RelationMatrix] = None) -> List[dict]:
     """Get all Ganzhi pairs for a specific relation type"""
-    relationships = db.query(Guanxi).filter(Guanxi.relation_type == relation_type).all()
-
-    results = []
-    for rel in relationships:
-        results.append({
-            "ganzhi1": rel.ganzhi1,
-            "ganzhi2": rel.ganzhi2,
-            "remark": rel.remark
-        })
-
-    return results
+    return [
+        {"ganzhi1": rel["ganzhi1"], "ganzhi2": rel["ganzhi2"], "remark": rel["remark"]}
+        for rel in _relation_matrix(db, matrix).by_type.get(relation_type, ())
+    ]
@@ -0,0 +1,300 @@
+# Full-text search over Xiangyi, Shensha and Guanxi text
+#
+# SQLite's built-in FTS5 tokenizers treat a run of CJK characters as a single
+# token, so text is segmented here into unigrams and bigrams before indexing
+# and queries are matched as AND-ed bigrams. The original text is kept in an
+# unindexed column for snippets.
+import html
+import re
+from typing import List, Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.autocomplete import MAX_SUGGESTIONS, build_autocomplete
+from app.database import SessionLocal, retry_on_locked
+from app.models import Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Guanxi
+from app.store import knowledge_store
+
+
+SEARCH_TABLE = "search_index"
+
+CJK_RUN = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")
+WORD = re.compile(r"[0-9A-Za-z]+")
+
+SNIPPET_CONTEXT = 20
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+
+def segment(value: str) -> List[str]:
+    """Split text into CJK unigrams + bigrams and lower-cased latin words"""
+    terms = []
+    for run in CJK_RUN.findall(value or ""):
+        terms.extend(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    terms.extend(word.lower() for word in WORD.findall(value or ""))
+    return terms
+
+
+def _query_terms(query: str) -> List[str]:
+    """Terms that must all match: bigrams of each CJK run (or the single char)"""
+    terms = []
+    for run in CJK_RUN.findall(query):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    terms.extend(word.lower() for word in WORD.findall(query))
+    return list(dict.fromkeys(terms))
+
+
+def _match_expression(terms: List[str]) -> str:
+    """FTS5 MATCH expression; latin words match as prefixes"""
+    parts = []
+    for term in terms:
+        quoted = '"' + term.replace('"', '""') + '"'
+        parts.append(quoted + "*" if WORD.fullmatch(term) else quoted)
+    return " AND ".join(parts)
+
+
+def highlight(content: str, query: str) -> str:
+    """
+    Short excerpt of content around the first match, with matches marked.
+    The text is HTML-escaped, so the snippet can be rendered as HTML.
+    """
+    needles = [n for n in CJK_RUN.findall(query) + WORD.findall(query) if n]
+    pattern = re.compile("|".join(re.escape(n) for n in sorted(needles, key=len, reverse=True)), re.IGNORECASE)
+
+    first = pattern.search(content) if needles else None
+    if first is None:
+        return html.escape(content[:SNIPPET_CONTEXT * 2])
+
+    start = max(0, first.start() - SNIPPET_CONTEXT)
+    end = min(len(content), first.end() + SNIPPET_CONTEXT)
+    excerpt, parts, last = content[start:end], [], 0
+    for match in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[last:match.start()]))
+        parts.append(HIGHLIGHT_OPEN + html.escape(match.group(0)) + HIGHLIGHT_CLOSE)
+        last = match.end()
+    parts.append(html.escape(excerpt[last:]))
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(content) else "")
+
+
+def search_index_exists(db: Session) -> bool:
+    """Whether the FTS table has been created"""
+    return db.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": SEARCH_TABLE}
+    ).first() is not None
+
+
+def search_documents(db: Session, ganzhi_names=None) -> list:
+    """
+    (ganzhi, source, ref_id, content) of every document, or only of the
+    documents filed under the given Ganzhi names.
+    """
+    documents = []
+    ganzhi_query = select(Ganzhi.id, Ganzhi.ganzhi)
+    if ganzhi_names is not None:
+        ganzhi_query = ganzhi_query.where(Ganzhi.ganzhi.in_(ganzhi_names))
+    ganzhi_by_id = dict(db.execute(ganzhi_query).all())
+
+    xiangyi = select(Xiangyi.id, Xiangyi.ganzhi_id, Xiangyi.content, Xiangyi.description)
+    links = (
+        select(GanzhiShensha.ganzhi_id, Shensha.id, Shensha.name, Shensha.modern_desc)
+        .join(Shensha, Shensha.id == GanzhiShensha.shensha_id)
+    )
+    guanxi = select(Guanxi.id, Guanxi.ganzhi1, Guanxi.ganzhi2, Guanxi.remark).where(Guanxi.remark != "")
+    if ganzhi_names is not None:
+        xiangyi = xiangyi.where(Xiangyi.ganzhi_id.in_(ganzhi_by_id))
+        links = links.where(GanzhiShensha.ganzhi_id.in_(ganzhi_by_id))
+        guanxi = guanxi.where(Guanxi.ganzhi1.in_(ganzhi_names) | Guanxi.ganzhi2.in_(ganzhi_names))
+
+    for ref_id, ganzhi_id, content, description in db.execute(xiangyi):
+        if ganzhi_id in ganzhi_by_id:
+            documents.append((ganzhi_by_id[ganzhi_id], "xiangyi", ref_id, "：".join(p for p in (content, description) if p)))
+
+    for ganzhi_id, ref_id, name, modern_desc in db.execute(links):
+        if ganzhi_id in ganzhi_by_id:
+            documents.append((ganzhi_by_id[ganzhi_id], "shensha", ref_id, "：".join(p for p in (name, modern_desc) if p)))
+
+    for ref_id, ganzhi1, ganzhi2, remark in db.execute(guanxi):
+        for name in dict.fromkeys((ganzhi1, ganzhi2)):
+            if ganzhi_names is None or name in ganzhi_names:
+                documents.append((name, "guanxi", ref_id, remark))
+    return documents
+
+
+def _insert_documents(db: Session, documents: list):
+    if documents:
+        db.execute(
+            text(
+                f"INSERT INTO {SEARCH_TABLE} (ganzhi, source, ref_id, content, terms) "
+                "VALUES (:ganzhi, :source, :ref_id, :content, :terms)"
+            ),
+            [
+                {"ganzhi": g, "source": source, "ref_id": ref_id, "content": content,
+                 "terms": " ".join(segment(content))}
+                for g, source, ref_id, content in documents
+            ]
+        )
+
+
+def rebuild_search_index(db: Session) -> int:
+    """
+    (Re)create and populate the FTS5 table from the current data.
+    Returns the number of indexed documents. Caller commits.
+    """
+    db.execute(text(f"DROP TABLE IF EXISTS {SEARCH_TABLE}"))
+    db.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "ganzhi UNINDEXED, source UNINDEXED, ref_id UNINDEXED, content UNINDEXED, terms, "
+        "tokenize = 'unicode61')"
+    ))
+    documents = search_documents(db)
+    _insert_documents(db, documents)
+    return len(documents)
+
+
+def update_search_index(db: Session, ganzhi_names) -> int:
+    """
+    Re-index only the documents of the given Ganzhi (after a partial import);
+    rebuilds the whole table if it does not exist. Returns the number of
+    documents written. Caller commits.
+    """
+    if not search_index_exists(db):
+        return rebuild_search_index(db)
+    ganzhi_names = set(ganzhi_names)
+    if not ganzhi_names:
+        return 0
+    db.execute(
+        text(f"DELETE FROM {SEARCH_TABLE} WHERE ganzhi IN ({', '.join(f':g{i}' for i in range(len(ganzhi_names)))})"),
+        {f"g{i}": name for i, name in enumerate(ganzhi_names)}
+    )
+    documents = search_documents(db, ganzhi_names)
+    _insert_documents(db, documents)
+    return len(documents)
+
+
+def ensure_search_index(db: Session) -> bool:
+    """
+    Build the FTS table if it does not exist yet; returns whether it was built.
+    The build goes through the writer, since db may be a read-only session.
+    """
+    if search_index_exists(db):
+        return False
+    writer = SessionLocal()
+    try:
+        if search_index_exists(writer):
+            return False
+        retry_on_locked(_build_search_index)(writer)
+    finally:
+        writer.close()
+    return True
+
+
+def _build_search_index(db: Session):
+    rebuild_search_index(db)
+    db.commit()
+
+
+def _search_page(db: Session, match: str, skip: int, limit: int) -> list:
+    """Ganzhi of one page of results with their best score, hit count and the total"""
+    return db.execute(text(
+        f"""
+        WITH hits AS MATERIALIZED (
+            SELECT ganzhi, bm25({SEARCH_TABLE}) AS score
+            FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match
+        )
+        SELECT ganzhi, MIN(score) AS score, COUNT(*) AS hit_count, COUNT(*) OVER () AS total
+        FROM hits GROUP BY ganzhi
+        ORDER BY score, ganzhi
+        LIMIT :limit OFFSET :skip
+        """
+    ), {"match": match, "limit": limit, "skip": skip}).mappings().all()
+
+
+def search_text(db: Session, query: str, skip: int = 0, limit: int = 20,
+                hits_per_ganzhi: int = 5) -> Optional[dict]:
+    """
+    Ranked full-text search, grouped by Ganzhi.
+    The page of Ganzhi and the total number of matching Ganzhi come from one
+    query; the hits for that page from a second. Returns None when the FTS
+    table has not been built: startup, imports and ingest build it, never a
+    read.
+    """
+    terms = _query_terms(query)
+    if not terms:
+        return {"total": 0, "items": []}
+
+    match = _match_expression(terms)
+    try:
+        page = _search_page(db, match, skip, limit)
+    except OperationalError:
+        db.rollback()
+        if search_index_exists(db):
+            raise
+        return None
+
+    if not page:
+        total = 0
+        if skip > 0:
+            total = db.execute(text(
+                f"SELECT COUNT(DISTINCT ganzhi) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match"
+            ), {"match": match}).scalar()
+        return {"total": total, "items": []}
+
+    names = [row["ganzhi"] for row in page]
+    params = {f"g{i}": name for i, name in enumerate(names)}
+    placeholders = ", ".join(f":g{i}" for i in range(len(names)))
+    hit_rows = db.execute(text(
+        f"""
+        SELECT ganzhi, source, ref_id, content, bm25({SEARCH_TABLE}) AS score
+        FROM {SEARCH_TABLE}
+        WHERE {SEARCH_TABLE} MATCH :match AND ganzhi IN ({placeholders})
+        ORDER BY score
+        """
+    ), {"match": match, **params}).mappings().all()
+
+    hits_by_ganzhi = {name: [] for name in names}
+    for hit in hit_rows:
+        hits = hits_by_ganzhi[hit["ganzhi"]]
+        if len(hits) < hits_per_ganzhi:
+            hits.append({
+                "source": hit["source"],
+                "ref_id": hit["ref_id"],
+                "content": hit["content"],
+                "snippet": highlight(hit["content"], query),
+                "score": -hit["score"]
+            })
+
+    return {
+        "total": page[0]["total"],
+        "items": [
+            {
+                "ganzhi": row["ganzhi"],
+                "score": -row["score"],
+                "hit_count": row["hit_count"],
+                "hits": hits_by_ganzhi[row["ganzhi"]]
+            }
+            for row in page
+        ]
+    }
+
+
+def suggest(db: Session, prefix: str, limit: int = 10) -> List[dict]:
+    """
+    Autocomplete suggestions for Ganzhi (Chinese or pinyin), Nayin and Shensha names.
+    Served from the snapshot's trie; without a snapshot the trie is built from the tables.
+    """
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        trie = snapshot.autocomplete
+    else:
+        trie = build_autocomplete(
+            [name for (name,) in db.query(Ganzhi.ganzhi).order_by(Ganzhi.id)],
+            list(dict.fromkeys(name for (name,) in db.query(Nayin.nayin_name).order_by(Nayin.id) if name)),
+            [name for (name,) in db.query(Shensha.name).order_by(Shensha.id)],
+        )
+    return trie.suggest(prefix, min(limit, MAX_SUGGESTIONS))
@@ -1,110 +1,171 @@
 # CRUD operations for Shensha
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from app.models import Shensha, GanzhiShensha, Ganzhi
+from app.store import knowledge_store
 from typing import List, Optional
 
 
+SHENSHA_FIELDS = ("id", "name", "type", "check_method", "jixiong", "yuanwen", "modern_desc", "remark")
+
+
+def _shensha_dict(shensha, **extra) -> dict:
+    """Serialize a Shensha row (ORM object or snapshot dict)"""
+    if isinstance(shensha, dict):
+        data = {field: shensha[field] for field in SHENSHA_FIELDS}
+    else:
+        data = {field: getattr(shensha, field) for field in SHENSHA_FIELDS}
+    data.update(extra)
+    return data
+
+
 def get_all_shensha(db: Session, skip: int = 0, limit: int = 100) -> List[Shensha]:
     """Get all Shensha"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return list(snapshot.shensha[skip:skip + limit])
     return db.query(Shensha).offset(skip).limit(limit).all()
 
 
 def get_shensha_by_name(db: Session, name: str) -> Optional[Shensha]:
     """Get Shensha by name"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.shensha_by_name.get(name)
     return db.query(Shensha).filter(Shensha.name == name).first()
 
 
 def get_shensha_by_id(db: Session, shensha_id: int) -> Optional[Shensha]:
     """Get Shensha by ID"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return snapshot.shensha_by_id.get(shensha_id)
     return db.query(Shensha).filter(Shensha.id == shensha_id).first()
 
 
 def get_shensha_by_ganzhi(db: Session, ganzhi_name: str) -> List[dict]:
     """Get all Shensha for a specific Ganzhi"""
-    ganzhi = db.query(Ganzhi).filter(Ganzhi.ganzhi == ganzhi_name).first()
-    if not ganzhi:
-        return []
-
-    # Get all shensha links
-    links = db.query(GanzhiShensha).filter(GanzhiShensha.ganzhi_id == ganzhi.id).all()
-
-    results = []
-    for link in links:
-        shensha = db.query(Shensha).filter(Shensha.id == link.shensha_id).first()
-        if shensha:
-            results.append({
-                "id": shensha.id,
-                "name": shensha.name,
-                "type": shensha.type,
-                "check_method": shensha.check_method,
-                "jixiong": shensha.jixiong,
-                "yuanwen": shensha.yuanwen,
-                "modern_desc": shensha.modern_desc,
-                "remark": shensha.remark,
-                "is_zixing": link.is_zixing
-            })
-
-    return results
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        ganzhi = snapshot.ganzhi_by_name.get(ganzhi_name)
+        if not ganzhi:
+            return []
+        return [
+            _shensha_dict(snapshot.shensha_by_id[sid], is_zixing=is_zixing)
+            for sid, is_zixing in snapshot.shensha_incidence.by_ganzhi.get(ganzhi["id"], ())
+            if sid in snapshot.shensha_by_id
+        ]
+
+    rows = db.query(Shensha, GanzhiShensha.is_zixing).join(
+        GanzhiShensha, GanzhiShensha.shensha_id == Shensha.id
+    ).join(
+        Ganzhi, Ganzhi.id == GanzhiShensha.ganzhi_id
+    ).filter(Ganzhi.ganzhi == ganzhi_name).order_by(GanzhiShensha.id).all()
+
+    return [_shensha_dict(shensha, is_zixing=is_zixing) for shensha, is_zixing in rows]
 
 
 def get_ganzhi_by_shensha(db: Session, shensha_name: str) -> List[dict]:
     """Get all Ganzhi that have a specific Shensha"""
-    shensha = db.query(Shensha).filter(Shensha.name == shensha_name).first()
-    if not shensha:
-        return []
-
-    # Get all links
-    links = db.query(GanzhiShensha).filter(GanzhiShensha.shensha_id == shensha.id).all()
-
-    results = []
-    for link in links:
-        ganzhi = db.query(Ganzhi).filter(Ganzhi.id == link.ganzhi_id).first()
-        if ganzhi:
-            results.append({
-                "ganzhi": ganzhi.ganzhi,
-                "tiangan": ganzhi.tiangan,
-                "dizhi": ganzhi.dizhi,
-                "is_zixing": link.is_zixing
-            })
-
-    return results
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        shensha = snapshot.shensha_by_name.get(shensha_name)
+        if not shensha:
+            return []
+        results = []
+        for gid, is_zixing in snapshot.shensha_incidence.by_shensha.get(shensha["id"], ()):
+            ganzhi = snapshot.ganzhi_by_id.get(gid)
+            if ganzhi:
+                results.append({
+                    "ganzhi": ganzhi["ganzhi"],
+                    "tiangan": ganzhi["tiangan"],
+                    "dizhi": ganzhi["dizhi"],
+                    "is_zixing": is_zixing
+                })
+        return results
+
+    rows = db.execute(
+        select(Ganzhi.ganzhi, Ganzhi.tiangan, Ganzhi.dizhi, GanzhiShensha.is_zixing)
+        .join(GanzhiShensha, GanzhiShensha.ganzhi_id == Ganzhi.id)
+        .join(Shensha, Shensha.id == GanzhiShensha.shensha_id)
+        .where(Shensha.name == shensha_name)
+        .order_by(GanzhiShensha.id)
+    ).mappings()
+
+    return [dict(row) for row in rows]
+
+
+def get_ganzhi_with_all_shensha(db: Session, shensha_names: List[str]) -> dict:
+    """
+    Get the Ganzhi that carry every one of the given Shensha.
+    Returns {"items", "missing"}; items are empty when any Shensha name is
+    unknown, and missing lists those names.
+    """
+    names = list(dict.fromkeys(shensha_names))
+
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        missing = [name for name in names if name not in snapshot.shensha_by_name]
+        if missing:
+            return {"items": [], "missing": missing}
+        ganzhi_ids = snapshot.shensha_incidence.ganzhi_with_all(
+            [snapshot.shensha_by_name[name]["id"] for name in names]
+        )
+        items = [
+            {key: snapshot.ganzhi_by_id[gid][key] for key in ("ganzhi", "tiangan", "dizhi")}
+            for gid in ganzhi_ids
+        ]
+        return {"items": items, "missing": []}
+
+    found = dict(db.query(Shensha.name, Shensha.id).filter(Shensha.name.in_(names)).all())
+    missing = [name for name in names if name not in found]
+    if missing:
+        return {"items": [], "missing": missing}
+    shensha_ids = list(found.values())
+
+    matching = (
+        select(GanzhiShensha.ganzhi_id)
+        .where(GanzhiShensha.shensha_id.in_(shensha_ids))
+        .group_by(GanzhiShensha.ganzhi_id)
+        .having(func.count(func.distinct(GanzhiShensha.shensha_id)) == len(shensha_ids))
+    )
+    rows = db.execute(
+        select(Ganzhi.ganzhi, Ganzhi.tiangan, Ganzhi.dizhi)
+        .where(Ganzhi.id.in_(matching))
+        .order_by(Ganzhi.id)
+    ).mappings()
+
+    return {"items": [dict(row) for row in rows], "missing": []}
 
 
 def get_zixing_shensha(db: Session) -> List[dict]:
     """Get all Shensha that are Zixing (自星)"""
-    # Get all zixing links
-    links = db.query(GanzhiShensha).filter(GanzhiShensha.is_zixing == True).all()
-
-    results = []
-    seen_shensha = set()
-
-    for link in links:
-        if link.shensha_id in seen_shensha:
-            continue
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return [
+            _shensha_dict(snapshot.shensha_by_id[sid])
+            for sid in snapshot.shensha_incidence.zixing_shensha_ids
+            if sid in snapshot.shensha_by_id
+        ]
 
-        shensha = db.query(Shensha).filter(Shensha.id == link.shensha_id).first()
-        if shensha:
-            seen_shensha.add(link.shensha_id)
-            results.append({
-                "id": shensha.id,
-                "name": shensha.name,
-                "type": shensha.type,
-                "check_method": shensha.check_method,
-                "jixiong": shensha.jixiong,
-                "yuanwen": shensha.yuanwen,
-                "modern_desc": shensha.modern_desc,
-                "remark": shensha.remark
-            })
+    zixing_ids = select(GanzhiShensha.shensha_id).where(GanzhiShensha.is_zixing == True)
+    shensha_list = db.query(Shensha).filter(Shensha.id.in_(zixing_ids)).order_by(Shensha.id).all()
 
-    return results
+    return [_shensha_dict(shensha) for shensha in shensha_list]
 
 
 def get_shensha_by_type(db: Session, shensha_type: str) -> List[Shensha]:
     """Get all Shensha by type (字形神煞/组合神煞)"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return list(snapshot.shensha_by_type.get(shensha_type, ()))
     return db.query(Shensha).filter(Shensha.type == shensha_type).all()
 
 
 def get_shensha_types(db: Session) -> List[str]:
     """Get all unique Shensha types"""
+    snapshot = knowledge_store.snapshot
+    if snapshot is not None:
+        return list(snapshot.shensha_types)
     types = db.query(Shensha.type).distinct().all()
     return [t[0] for t in types if t[0]]
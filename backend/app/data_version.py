@@ -0,0 +1,34 @@
+# Global data version
+#
+# A counter stored in the meta table and bumped by every import (admin import
+# endpoints and import_data.py). Read responses only change when it does, so it
+# is the basis of the HTTP ETags. Databases created before the meta table
+# existed read as version 0.
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import Meta
+
+
+DATA_VERSION_KEY = "data_version"
+
+
+def _meta_table_exists(db: Session) -> bool:
+    return db.get_bind().dialect.has_table(db.connection(), Meta.__tablename__)
+
+
+def get_data_version(db: Session) -> int:
+    """Current data version (0 if never bumped)"""
+    if not _meta_table_exists(db):
+        return 0
+    value = db.execute(select(Meta.value).where(Meta.key == DATA_VERSION_KEY)).scalar()
+    return int(value) if value else 0
+
+
+def bump_data_version(db: Session) -> int:
+    """Increment the data version and return the new value. Caller commits."""
+    Meta.__table__.create(bind=db.connection(), checkfirst=True)
+    version = get_data_version(db) + 1
+    db.merge(Meta(key=DATA_VERSION_KEY, value=str(version)))
+    db.flush()
+    return version
@@ -1,7 +1,13 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import asyncio
+import functools
 import os
+import time
 
 # Database configuration
 db_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "liushijiazi.db")
@@ -13,6 +19,43 @@ DATABASE_URL = os.getenv(
 # Ensure data directory exists
 os.makedirs(os.path.dirname(DATABASE_URL.replace("sqlite:///", "")), exist_ok=True)
 
+# SQLite engine profile: "production" (WAL, page cache, mmap, busy timeout,
+# read-only reader pool, single-connection writer) or "basic" (one shared pool,
+# SQLite defaults)
+SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+
+# Application-level retries when a write still hits "database is locked"
+WRITE_RETRY_ATTEMPTS = int(os.getenv("WRITE_RETRY_ATTEMPTS", "5"))
+WRITE_RETRY_DELAY = float(os.getenv("WRITE_RETRY_DELAY", "0.05"))
+
+_url = make_url(DATABASE_URL)
+IS_SQLITE_FILE = _url.get_backend_name() == "sqlite" and _url.database not in (None, "", ":memory:")
+PRODUCTION_PROFILE = IS_SQLITE_FILE and SQLITE_PROFILE == "production"
+
+READ_PRAGMAS = (
+    f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}",
+    f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store = MEMORY",
+)
+WRITE_PRAGMAS = ("PRAGMA journal_mode = WAL", "PRAGMA synchronous = NORMAL") + READ_PRAGMAS
+
+
+def _apply_pragmas(target_engine, pragmas):
+    """Run the pragmas on every new DBAPI connection of an engine"""
+    @event.listens_for(target_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+# Writer: imports, admin and the startup snapshot load
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
@@ -20,6 +63,31 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engines for the API routers (aiosqlite), on the same database
+ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+if PRODUCTION_PROFILE:
+    # One writer connection: SQLite allows a single writer, so queue in the
+    # pool rather than in busy handlers
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=1, max_overflow=0)
+    # Readers open the file read-only; with WAL they never block on the writer
+    async_read_engine = create_async_engine(
+        _url.set(drivername="sqlite+aiosqlite", database=f"file:{_url.database}?mode=ro", query={"uri": "true"}),
+        pool_size=SQLITE_READ_POOL_SIZE,
+        max_overflow=SQLITE_READ_POOL_SIZE,
+    )
+    _apply_pragmas(engine, WRITE_PRAGMAS)
+    _apply_pragmas(async_engine.sync_engine, WRITE_PRAGMAS)
+    _apply_pragmas(async_read_engine.sync_engine, READ_PRAGMAS + ("PRAGMA query_only = ON",))
+else:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+    async_read_engine = async_engine
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -32,6 +100,63 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Async database session dependency (writer; admin routes)"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    """Async read-only database session dependency (GET routes)"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def is_locked_error(exc: Exception) -> bool:
+    """Whether an error is SQLite lock contention that is worth retrying"""
+    return isinstance(exc, OperationalError) and (
+        "database is locked" in str(exc) or "database is busy" in str(exc)
+    )
+
+
+def retry_on_locked(fn):
+    """
+    Wrap a write function taking a Session as its first argument: on
+    "database is locked" roll back and retry with exponential backoff.
+    """
+    @functools.wraps(fn)
+    def wrapper(db, *args, **kwargs):
+        for attempt in range(WRITE_RETRY_ATTEMPTS):
+            try:
+                return fn(db, *args, **kwargs)
+            except OperationalError as exc:
+                if not is_locked_error(exc) or attempt == WRITE_RETRY_ATTEMPTS - 1:
+                    raise
+                db.rollback()
+                time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+    return wrapper
+
+
+async def run_write(db: AsyncSession, fn, *args, **kwargs):
+    """
+    Run a sync write function on an AsyncSession, retrying on "database is
+    locked" like retry_on_locked but without blocking the event loop.
+    """
+    for attempt in range(WRITE_RETRY_ATTEMPTS):
+        try:
+            return await db.run_sync(fn, *args, **kwargs)
+        except OperationalError as exc:
+            if not is_locked_error(exc) or attempt == WRITE_RETRY_ATTEMPTS - 1:
+                raise
+            await db.rollback()
+            await asyncio.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+
+
 def init_db():
-    """Initialize database tables"""
+    """Initialize database tables, apply pending schema migrations and drop leftover ingest staging tables"""
+    from app.ingest import drop_leftover_staging
+    from app.migrations import migrate
+
     Base.metadata.create_all(bind=engine)
+    migrate(engine)
+    drop_leftover_staging(engine)
@@ -0,0 +1,123 @@
+# Streaming table exports
+#
+# Rows are read in yield_per batches from a read-only session and encoded
+# batch by batch, so the first bytes go out immediately and memory stays flat
+# however large the tables grow. JSON output is byte-for-byte what
+# json.dumps(rows, ensure_ascii=False, indent=2) would produce; NDJSON writes
+# one compact row per line. Either can be gzip-compressed on the fly.
+import json
+import os
+import zlib
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+
+from app.database import AsyncReadSessionLocal
+from app.models import Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi
+from app.static_api import choose_encoding
+
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+
+EXPORT_FORMATS = ("json", "ndjson")
+MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+# Exportable tables by name
+EXPORT_TABLES = {
+    model.__tablename__: model
+    for model in (Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi)
+}
+
+
+def table_columns(model) -> Tuple[str, ...]:
+    return tuple(column.name for column in model.__table__.columns)
+
+
+async def iter_batches(model, columns: Optional[Iterable[str]] = None,
+                       batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+    """Rows of a table (all or the given columns, in id order) as lists of dicts, batch_size at a time"""
+    table = model.__table__
+    columns = tuple(columns or table_columns(model))
+    query = select(*(table.c[name] for name in columns)).order_by(table.c.id).execution_options(yield_per=batch_size)
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(query)
+        async for partition in result.partitions():
+            yield [dict(zip(columns, row)) for row in partition]
+
+
+def _indent(text: str, prefix: str) -> str:
+    return prefix + text.replace("\n", "\n" + prefix)
+
+
+async def json_array_chunks(batches: AsyncIterator[List[dict]], level: int = 0) -> AsyncIterator[str]:
+    """Incrementally encode batches of rows as one indented JSON array nested level deep"""
+    inner = "  " * (level + 1)
+    first = True
+    async for batch in batches:
+        if not batch:
+            continue
+        items = ",\n".join(_indent(json.dumps(row, ensure_ascii=False, indent=2), inner) for row in batch)
+        yield ("[\n" if first else ",\n") + items
+        first = False
+    yield "[]" if first else "\n" + "  " * level + "]"
+
+
+async def json_object_chunks(sections: Dict[str, AsyncIterator[List[dict]]]) -> AsyncIterator[str]:
+    """Incrementally encode {key: array} with one streamed array per key"""
+    yield "{"
+    for i, (key, batches) in enumerate(sections.items()):
+        yield ("\n" if i == 0 else ",\n") + f"  {json.dumps(key, ensure_ascii=False)}: "
+        async for chunk in json_array_chunks(batches, level=1):
+            yield chunk
+    yield "\n}" if sections else "}"
+
+
+async def ndjson_chunks(batches: AsyncIterator[List[dict]], table: Optional[str] = None) -> AsyncIterator[str]:
+    """One JSON document per row and line; with table, rows are wrapped as {"table": ..., "row": ...}"""
+    async for batch in batches:
+        if table is None:
+            lines = (json.dumps(row, ensure_ascii=False) for row in batch)
+        else:
+            lines = (json.dumps({"table": table, "row": row}, ensure_ascii=False) for row in batch)
+        yield "".join(line + "\n" for line in lines)
+
+
+async def _encode(chunks: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    async for chunk in chunks:
+        yield chunk.encode("utf-8")
+
+
+async def gzip_chunks(chunks: AsyncIterator[str], level: int = EXPORT_GZIP_LEVEL) -> AsyncIterator[bytes]:
+    """gzip-compress a text stream as it is produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(chunks: AsyncIterator[str], filename: str, format: str = "json",
+                    gzip: bool = False, accept_encoding: Optional[str] = None) -> StreamingResponse:
+    """
+    Stream an export as an attachment. With gzip the body is compressed on the
+    fly: sent with Content-Encoding: gzip when the client accepts it, as a
+    .gz file otherwise.
+    """
+    media_type = MEDIA_TYPES[format]
+    filename = f"{filename}.{format}"
+    headers = {}
+    if gzip:
+        body = gzip_chunks(chunks)
+        headers["Vary"] = "Accept-Encoding"
+        if choose_encoding(accept_encoding, ("gzip", "identity")) == "gzip":
+            headers["Content-Encoding"] = "gzip"
+        else:
+            media_type = "application/gzip"
+            filename += ".gz"
+    else:
+        body = _encode(chunks)
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -0,0 +1,396 @@
+# Knowledge graph
+#
+# KG_logic.json describes typed nodes (天干, 地支, 六十甲子, 五行, 方位, ...) and
+# typed edges (纳音为, 有神煞, 相生, 同位, ...), but the import only keeps its
+# Ganzhi–Ganzhi edges. Here the whole graph is compiled once per snapshot: the
+# nodes and edges implied by the tables (each Ganzhi's stem, branch, nayin,
+# xiangyi, shensha and xiji; the stems' and branches' wuxing, direction and
+# season; every relation of the RelationMatrix), merged with the nodes and
+# edges of the file itself.
+#
+# Adjacency is stored in CSR form, one per traversal direction, with rows
+# split by edge type: the edges of node v and type t are
+# targets[offsets[v * T + t]:offsets[v * T + t + 1]], so a neighbourhood
+# restricted to some edge types is a few slices. Traversals (BFS / k-hop,
+# shortest path, paths following a sequence of edge types) are generators, so
+# callers can stream results as they are found.
+import json
+import os
+from collections import deque
+from itertools import combinations
+from types import MappingProxyType
+from typing import Iterator, List, Optional, Sequence
+
+from app.chart import DI_ZHI_SEASON
+from app.import_data import (
+    TIAN_GAN, TIAN_GAN_WUXING, DI_ZHI, DI_ZHI_WUXING, DI_ZHI_FANGWEI, JIAZI_KEYS
+)
+from app.relations import CYCLE, RelationMatrix, _dizhi_relations
+
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+KG_LOGIC_PATH = os.getenv("KG_LOGIC_PATH", os.path.join(PROJECT_ROOT, "KG_logic.json"))
+
+# Traversal directions: along edges, against them, or either way
+DIRECTIONS = ("out", "in", "both")
+
+# Node and edge types beyond those KG_logic.json declares (appended in this order)
+NODE_TYPES = ("六十甲子", "天干", "地支", "纳音五行", "象意类别", "神煞", "喜忌对象", "五行", "方位", "季节")
+EDGE_TYPES = ("天干为", "地支为", "纳音为", "有象意", "有神煞", "喜", "忌", "所属五行", "位于", "对应季节", "相生", "相克", "相合")
+# Edge types that hold both ways; they are stored in both directions
+SYMMETRIC_TYPES = frozenset({"相合", "相冲", "相刑", "相害", "同位", "同天干", "同地支", "六合", "六冲", "六害", "半合", "三刑", "自刑"})
+
+# 相生 / 相克 cycles of the five phases
+WUXING_SHENG = {"木": "火", "火": "土", "土": "金", "金": "水", "水": "木"}
+WUXING_KE = {"木": "土", "土": "水", "水": "火", "火": "金", "金": "木"}
+# Stem combinations (天干五合)
+TIAN_GAN_HE = (("甲", "己"), ("乙", "庚"), ("丙", "辛"), ("丁", "壬"), ("戊", "癸"))
+
+JIAZI_IDS = {name: key for key, name in JIAZI_KEYS.items()}
+
+
+def load_kg_data(path: str = KG_LOGIC_PATH) -> dict:
+    """KG_logic.json, or an empty graph when the file is not deployed"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+class GraphBuilder:
+    """Collects typed nodes and de-duplicated typed edges before compiling them"""
+
+    def __init__(self, kg_data: dict):
+        graph = kg_data.get("knowledge_graph", {})
+        self.node_types = list(dict.fromkeys([*graph.get("node_types", ()), *NODE_TYPES]))
+        self.edge_types = list(dict.fromkeys([*graph.get("edge_types", ()), *EDGE_TYPES]))
+        # Ids declared by the file for (type, label), so derived nodes keep them
+        self.kg_ids = {(n.get("type"), n.get("label")): n["id"] for n in graph.get("nodes", ()) if n.get("id")}
+        self.nodes = []
+        self.index = {}  # node id -> position
+        self.by_key = {}  # (type, label) -> position
+        self.edges = {}  # (source, target, type) -> note
+        self.skipped_edges = 0
+
+    def node(self, type_: str, label: str, node_id: Optional[str] = None) -> int:
+        """Position of the node (type, label), added on first use"""
+        key = (type_, label)
+        if key in self.by_key:
+            return self.by_key[key]
+        if node_id is None:
+            node_id = self.kg_ids.get(key) or (JIAZI_IDS.get(label) if type_ == "六十甲子" else None) or f"{type_}:{label}"
+        if type_ not in self.node_types:
+            self.node_types.append(type_)
+        position = self.by_key[key] = self.index[node_id] = len(self.nodes)
+        self.nodes.append({"id": node_id, "label": label, "type": type_})
+        return position
+
+    def edge(self, source: int, target: int, type_: str, note: str = ""):
+        if not type_:
+            return
+        if type_ not in self.edge_types:
+            self.edge_types.append(type_)
+        pairs = ((source, target), (target, source)) if type_ in SYMMETRIC_TYPES else ((source, target),)
+        for a, b in pairs:
+            self.edges.setdefault((a, b, type_), note)
+
+    def kg_nodes_and_edges(self, kg_data: dict):
+        """
+        The file's own nodes and edges. Ganzhi keys resolve to the derived
+        Ganzhi nodes even when the file does not declare them (ren_shen);
+        edges to other undeclared ids are skipped.
+        """
+        graph = kg_data.get("knowledge_graph", {})
+        for n in graph.get("nodes", ()):
+            if n.get("id") and n["id"] not in self.index:
+                self.node(n.get("type") or "", n.get("label") or n["id"], n["id"])
+        for e in graph.get("edges", ()):
+            ends = [self.index.get(e.get("from", "")), self.index.get(e.get("to", ""))]
+            if None in ends:
+                self.skipped_edges += 1
+                continue
+            self.edge(ends[0], ends[1], e.get("relation", ""), e.get("note", ""))
+
+
+def build_graph(ganzhi, nayin, xiangyi, shensha, ganzhi_shensha, xiji,
+                relation_matrix: RelationMatrix, kg_data: dict) -> "KnowledgeGraph":
+    """Compile the knowledge graph from snapshot tables (plain dict rows) and KG_logic.json"""
+    b = GraphBuilder(kg_data)
+
+    # Stems and branches with their wuxing, direction and season
+    wuxing = {w: b.node("五行", w) for w in WUXING_SHENG}
+    for w in WUXING_SHENG:
+        b.edge(wuxing[w], wuxing[WUXING_SHENG[w]], "相生")
+        b.edge(wuxing[w], wuxing[WUXING_KE[w]], "相克")
+    tiangan = {t: b.node("天干", t) for t in TIAN_GAN}
+    for t, v in tiangan.items():
+        b.edge(v, wuxing[TIAN_GAN_WUXING[t]], "所属五行")
+    for t1, t2 in TIAN_GAN_HE:
+        b.edge(tiangan[t1], tiangan[t2], "相合")
+    dizhi = {d: b.node("地支", d) for d in DI_ZHI}
+    for d, v in dizhi.items():
+        b.edge(v, wuxing[DI_ZHI_WUXING[d]], "所属五行")
+        b.edge(v, b.node("方位", DI_ZHI_FANGWEI[d]), "位于")
+        b.edge(v, b.node("季节", DI_ZHI_SEASON[d]), "对应季节")
+    for (a, d1), (c, d2) in combinations(enumerate(DI_ZHI), 2):
+        for relation in _dizhi_relations(a, c):
+            b.edge(dizhi[d1], dizhi[d2], relation)
+
+    # Each Ganzhi and what the tables attach to it
+    by_id = {}
+    for g in ganzhi:
+        v = by_id[g["id"]] = b.node("六十甲子", g["ganzhi"])
+        if g["tiangan"] in tiangan:
+            b.edge(v, tiangan[g["tiangan"]], "天干为")
+        if g["dizhi"] in dizhi:
+            b.edge(v, dizhi[g["dizhi"]], "地支为")
+        if g["fangwei"]:
+            b.edge(v, b.node("方位", g["fangwei"]), "位于")
+    for n in nayin:
+        if n["ganzhi_id"] in by_id and n["nayin_name"]:
+            node = b.node("纳音五行", n["nayin_name"])
+            b.edge(by_id[n["ganzhi_id"]], node, "纳音为")
+            if n["nayin_wuxing"] in wuxing:
+                b.edge(node, wuxing[n["nayin_wuxing"]], "所属五行")
+    for x in xiangyi:
+        if x["ganzhi_id"] in by_id and x["content"]:
+            b.edge(by_id[x["ganzhi_id"]], b.node("象意类别", x["content"]), "有象意")
+    shensha_by_id = {s["id"]: s for s in shensha}
+    for link in ganzhi_shensha:
+        s = shensha_by_id.get(link["shensha_id"])
+        if link["ganzhi_id"] in by_id and s is not None:
+            b.edge(by_id[link["ganzhi_id"]], b.node("神煞", s["name"]), "有神煞")
+    for x in xiji:
+        if x["ganzhi_id"] in by_id and x["target_value"]:
+            b.edge(by_id[x["ganzhi_id"]], b.node("喜忌对象", x["target_value"]), x["type"], x["remark"] or "")
+
+    # Every Ganzhi–Ganzhi relation, stored rows keeping their direction
+    for i, j in combinations(range(60), 2):
+        for rel in relation_matrix.relations(CYCLE[i], CYCLE[j]):
+            source = b.by_key.get(("六十甲子", rel["ganzhi1"]))
+            target = b.by_key.get(("六十甲子", rel["ganzhi2"]))
+            if source is not None and target is not None:
+                b.edge(source, target, rel["relation_type"], rel["remark"] or "")
+
+    b.kg_nodes_and_edges(kg_data)
+    return KnowledgeGraph(b.nodes, b.node_types, b.edge_types, b.edges, b.skipped_edges)
+
+
+class Adjacency:
+    """
+    CSR adjacency with rows split by edge type: the edges of node v and type
+    t are the entries offsets[v * T + t] to offsets[v * T + t + 1] of targets
+    (neighbour positions), types and reversed (whether the edge is walked
+    against its direction); all edges of v are the entries offsets[v * T] to
+    offsets[(v + 1) * T]
+    """
+
+    def __init__(self, node_count: int, type_count: int, entries):
+        entries = sorted(entries)  # (source, type, target, reversed)
+        counts = [0] * (node_count * type_count + 1)
+        for source, t, _, _ in entries:
+            counts[source * type_count + t + 1] += 1
+        for k in range(1, len(counts)):
+            counts[k] += counts[k - 1]
+        self.type_count = type_count
+        self.offsets = counts
+        self.types = [t for _, t, _, _ in entries]
+        self.targets = [target for _, _, target, _ in entries]
+        self.reversed = [rev for _, _, _, rev in entries]
+
+    def edges(self, v: int, types: Optional[Sequence[int]] = None) -> Iterator[tuple]:
+        """(type, neighbour, reversed) of node v, restricted to the given edge types"""
+        offsets, width = self.offsets, self.type_count
+        row = v * width
+        if types is None:
+            ranges = (range(offsets[row], offsets[row + width]),)
+        else:
+            ranges = (range(offsets[row + t], offsets[row + t + 1]) for t in types)
+        for entries in ranges:
+            for k in entries:
+                yield self.types[k], self.targets[k], self.reversed[k]
+
+    def degree(self, v: int, t: int) -> int:
+        row = v * self.type_count + t
+        return self.offsets[row + 1] - self.offsets[row]
+
+
+class KnowledgeGraph:
+    """Typed nodes and edges with CSR adjacency per direction and traversal queries"""
+
+    def __init__(self, nodes, node_types, edge_types, edges, skipped_edges=0):
+        self.nodes = tuple(MappingProxyType(n) for n in nodes)
+        self.node_types = tuple(node_types)
+        self.edge_types = tuple(edge_types)
+        self.type_index = MappingProxyType({t: k for k, t in enumerate(self.edge_types)})
+        self.node_index = MappingProxyType({n["id"]: v for v, n in enumerate(nodes)})
+        by_label = {}
+        for v, n in enumerate(nodes):
+            by_label.setdefault(n["label"], []).append(v)
+        self.by_label = MappingProxyType({k: tuple(v) for k, v in by_label.items()})
+        self.edge_count = len(edges)
+        self.skipped_edges = skipped_edges
+        self.notes = MappingProxyType({
+            (source, target, self.type_index[t]): note for (source, target, t), note in edges.items() if note
+        })
+
+        n, width = len(self.nodes), len(self.edge_types)
+        forward = [(s, self.type_index[t], d, False) for s, d, t in edges]
+        backward = [(d, self.type_index[t], s, True) for s, d, t in edges if t not in SYMMETRIC_TYPES]
+        symmetric = {k for k, t in enumerate(self.edge_types) if t in SYMMETRIC_TYPES}
+        self.adjacency = MappingProxyType({
+            "out": Adjacency(n, width, forward),
+            # Symmetric edges are stored both ways, so they count in both directions
+            "in": Adjacency(n, width, backward + [e for e in forward if e[1] in symmetric]),
+            "both": Adjacency(n, width, forward + backward),
+        })
+
+    # ----- lookup -----
+
+    def resolve(self, ref: str) -> List[int]:
+        """Nodes a reference names: a node id (jia_zi, 五行:火) or a label (甲子, 火)"""
+        if ref in self.node_index:
+            return [self.node_index[ref]]
+        return list(self.by_label.get(ref, ()))
+
+    def edge_type_ids(self, types: Optional[Sequence[str]]) -> Optional[List[int]]:
+        """Edge type names -> indexes (None for all types); raises KeyError for an unknown type"""
+        if not types:
+            return None
+        return sorted({self.type_index[t] for t in types})
+
+    def node(self, v: int) -> dict:
+        return dict(self.nodes[v])
+
+    def step(self, source: int, t: int, target: int, reversed_: bool) -> dict:
+        """An edge walked from source to target, in its stored orientation"""
+        stored = (target, source) if reversed_ else (source, target)
+        return {
+            "from": self.nodes[stored[0]]["id"],
+            "to": self.nodes[stored[1]]["id"],
+            "relation": self.edge_types[t],
+            "note": self.notes.get((*stored, t), ""),
+        }
+
+    def describe(self, v: int) -> dict:
+        """A node with its edge count per type and direction"""
+        out, into = self.adjacency["out"], self.adjacency["in"]
+        degrees = {}
+        for t, name in enumerate(self.edge_types):
+            counts = {"out": out.degree(v, t), "in": into.degree(v, t)}
+            if counts["out"] or counts["in"]:
+                degrees[name] = counts
+        return {**self.nodes[v], "degree": degrees}
+
+    def schema(self) -> dict:
+        """Node / edge types with their counts"""
+        node_counts = dict.fromkeys(self.node_types, 0)
+        for n in self.nodes:
+            node_counts[n["type"]] += 1
+        edge_counts = dict.fromkeys(self.edge_types, 0)
+        for t in self.adjacency["out"].types:
+            edge_counts[self.edge_types[t]] += 1
+        return {
+            "node_count": len(self.nodes),
+            "edge_count": self.edge_count,
+            "skipped_edges": self.skipped_edges,
+            "node_types": node_counts,
+            "edge_types": edge_counts,
+            "symmetric_types": [t for t in self.edge_types if t in SYMMETRIC_TYPES],
+        }
+
+    # ----- traversal -----
+
+    def neighbourhood(self, v: int, types=None, direction: str = "both") -> Iterator[dict]:
+        """Edges of node v: {"node", "edge"}"""
+        for t, w, rev in self.adjacency[direction].edges(v, types):
+            yield {"node": self.node(w), "edge": self.step(v, t, w, rev)}
+
+    def bfs(self, source: int, max_depth: int, types=None, direction: str = "both") -> Iterator[dict]:
+        """
+        Nodes within max_depth hops of source in breadth-first order, source
+        first: {"node", "depth", "edge"} where edge is the one the node was
+        first reached by (None for the source)
+        """
+        adjacency = self.adjacency[direction]
+        seen = {source}
+        frontier = [source]
+        yield {"node": self.node(source), "depth": 0, "edge": None}
+        for depth in range(1, max_depth + 1):
+            following = []
+            for v in frontier:
+                for t, w, rev in adjacency.edges(v, types):
+                    if w not in seen:
+                        seen.add(w)
+                        following.append(w)
+                        yield {"node": self.node(w), "depth": depth, "edge": self.step(v, t, w, rev)}
+            if not following:
+                return
+            frontier = following
+
+    def path(self, source: int, hops: Sequence[tuple]) -> dict:
+        """A path from source given as (type, node, reversed) hops: {"nodes": ids, "edges"}"""
+        nodes, edges = [self.nodes[source]["id"]], []
+        v = source
+        for t, w, rev in hops:
+            nodes.append(self.nodes[w]["id"])
+            edges.append(self.step(v, t, w, rev))
+            v = w
+        return {"nodes": nodes, "edges": edges}
+
+    def shortest_path(self, source: int, target: int, max_depth: int, types=None,
+                      direction: str = "both") -> Optional[dict]:
+        """
+        A shortest path (fewest hops, at most max_depth) from source to target
+        as {"nodes", "edges"}, or None when there is none
+        """
+        adjacency = self.adjacency[direction]
+        parent = {source: None}
+        queue = deque([(source, 0)])
+        while target not in parent and queue:
+            v, depth = queue.popleft()
+            if depth == max_depth:
+                continue
+            for t, w, rev in adjacency.edges(v, types):
+                if w not in parent:
+                    parent[w] = (v, t, rev)
+                    queue.append((w, depth + 1))
+        if target not in parent:
+            return None
+        hops, w = [], target
+        while parent[w] is not None:
+            v, t, rev = parent[w]
+            hops.append((t, w, rev))
+            w = v
+        return self.path(source, hops[::-1])
+
+    def typed_paths(self, source: int, pattern: Sequence[int], target: Optional[int] = None,
+                    direction: str = "both") -> Iterator[dict]:
+        """
+        Simple paths from source whose k-th edge has type pattern[k] (and that
+        end at target, if given), depth first, as {"nodes", "edges"}
+        """
+        adjacency = self.adjacency[direction]
+        last = len(pattern) - 1
+        hops, visited = [], {source}
+        stack = [(source, adjacency.edges(source, (pattern[0],)))]
+        while stack:
+            v, edges = stack[-1]
+            k = len(stack) - 1
+            for t, w, rev in edges:
+                if w in visited:
+                    continue
+                if k == last:
+                    if target is None or w == target:
+                        yield self.path(source, [*hops, (t, w, rev)])
+                    continue
+                hops.append((t, w, rev))
+                visited.add(w)
+                stack.append((w, adjacency.edges(w, (pattern[k + 1],))))
+                break
+            else:
+                stack.pop()
+                if stack:
+                    visited.discard(v)
+                    hops.pop()
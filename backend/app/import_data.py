@@ -2,15 +2,31 @@
 """
 Data import script.
 Imports data from xiangyi.json and KG_logic.json into the database.
+
+Every table is rebuilt from in-memory rows (ids assigned up front, duplicates
+removed with sets) and written with Core executemany batches, all in a single
+transaction, so readers see either the old or the new data.
+
+By default only the changes are applied (see app/import_diff.py): source
+records whose content hash is unchanged are skipped and kept rows keep their
+ids.
+
+Usage: python app/import_data.py [--dry-run] [--full]
 """
+import argparse
 import sys
 import os
 import json
+import time
+from contextlib import contextmanager
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.database import SessionLocal, init_db
+from sqlalchemy import delete, insert
+
+from app.database import SessionLocal, init_db, retry_on_locked
+from app.data_version import bump_data_version
 from app.models import Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi
 
 
@@ -71,501 +87,480 @@ JIAZI_SEQUENCE = [
 ]
 
 
-def import_ganzhi(db):
-    """Import 60 Ganzhi records."""
-    print("Importing 60 Ganzhi records...")
+# JSON / knowledge-graph keys of the 60 Jiazi (romanized pinyin)
+JIAZI_KEYS = {
+    'jia_zi': '甲子', 'yi_chou': '乙丑', 'bing_yin': '丙寅', 'ding_mao': '丁卯',
+    'wu_chen': '戊辰', 'ji_si': '己巳', 'geng_wu': '庚午', 'xin_wei': '辛未',
+    'ren_shen': '壬申', 'gui_you': '癸酉', 'jia_xu': '甲戌', 'yi_hai': '乙亥',
+    'bing_zi': '丙子', 'ding_chou': '丁丑', 'wu_yin': '戊寅', 'ji_mao': '己卯',
+    'geng_chen': '庚辰', 'xin_si': '辛巳', 'ren_wu': '壬午', 'gui_wei': '癸未',
+    'jia_shen': '甲申', 'yi_you': '乙酉', 'bing_xu': '丙戌', 'ding_hai': '丁亥',
+    'wu_zi': '戊子', 'ji_chou': '己丑', 'geng_yin': '庚寅', 'xin_mao': '辛卯',
+    'ren_chen': '壬辰', 'gui_si': '癸巳', 'jia_wu': '甲午', 'yi_wei': '乙未',
+    'bing_shen': '丙申', 'ding_you': '丁酉', 'wu_xu': '戊戌', 'ji_hai': '己亥',
+    'geng_zi': '庚子', 'xin_chou': '辛丑', 'ren_yin': '壬寅', 'gui_mao': '癸卯',
+    'jia_chen': '甲辰', 'yi_si': '乙巳', 'bing_wu': '丙午', 'ding_wei': '丁未',
+    'wu_shen': '戊申', 'ji_you': '己酉', 'geng_xu': '庚戌', 'xin_hai': '辛亥',
+    'ren_zi': '壬子', 'gui_chou': '癸丑', 'jia_yin': '甲寅', 'yi_mao': '乙卯',
+    'bing_chen': '丙辰', 'ding_si': '丁巳', 'wu_wu': '戊午', 'ji_wei': '己未',
+    'geng_shen': '庚申', 'xin_you': '辛酉', 'ren_xu': '壬戌', 'gui_hai': '癸亥'
+}
 
-    # Clear existing data
-    db.query(Ganzhi).delete()
-
-    ganzhi_list = []
-    for tg, dz in JIAZI_SEQUENCE:
-        ganzhi_name = tg + dz
-        # Determine the wuxing of the ganzhi (based on tian gan)
-        tg_wuxing = TIAN_GAN_WUXING.get(tg, '')
-        dz_wuxing = DI_ZHI_WUXING.get(dz, '')
-
-        # Get tian gan yuan shi ming
-        tg_yuanshiming = ''
-        if tg in SHI_TIAN_GAN_DATA:
-            tg_yuanshiming = SHI_TIAN_GAN_DATA[tg].get('原始命名', '')
-
-        # Get di zhi yuan shi ming
-        dz_yuanshiming = ''
-        if dz in SHI_ER_DI_ZHI_DATA:
-            dz_yuanshiming = SHI_ER_DI_ZHI_DATA[dz].get('原始命名', '')
-
-        g = Ganzhi(
-            tiangan=tg,
-            dizhi=dz,
-            ganzhi=ganzhi_name,
-            tiangan_wuxing=tg_wuxing,
-            dizhi_wuxing=dz_wuxing,
-            yinyang=TIAN_GAN_YINYANG.get(tg, ''),
-            fangwei=DI_ZHI_FANGWEI.get(dz, ''),
-            jijie=DI_ZHI_JIJIE.get(dz, ''),
-            tiangan_yuanshiming=tg_yuanshiming,
-            dizhi_yuanshiming=dz_yuanshiming
-        )
-        ganzhi_list.append(g)
+# Nayin status / shengda-xiaoruo by tian gan
+ZHUANGTAI_MAP = {
+    '甲': '旺', '乙': '衰', '丙': '旺', '丁': '衰',
+    '戊': '旺', '己': '衰', '庚': '旺', '辛': '衰',
+    '壬': '旺', '癸': '衰'
+}
+SHENGDA_MAP = {
+    '甲': '长生', '乙': '帝旺', '丙': '帝旺', '丁': '长生',
+    '戊': '长生', '己': '帝旺', '庚': '帝旺', '辛': '长生',
+    '壬': '帝旺', '癸': '长生'
+}
 
-    db.add_all(ganzhi_list)
-    db.commit()
-    print(f"  Imported {len(ganzhi_list)} ganzhi records")
+# Source files, in the project root
+SOURCE_FILES = ('xiangyi.json', 'KG_logic.json')
 
+# Rows per executemany batch
+BATCH_SIZE = 5000
 
-def import_nayin(db):
-    """Import Nayin data for 60 Ganzhi."""
-    print("Importing Nayin data...")
+# Tables in delete order (children first)
+IMPORT_TABLES = (GanzhiShensha, Xiji, Xiangyi, Nayin, Guanxi, Shensha, Ganzhi)
+
+
+class StageTimer:
+    """Collects wall-clock timings of the import stages"""
 
-    # Clear existing data
-    db.query(Nayin).delete()
-
-    # Get all ganzhi
-    all_ganzhi = db.query(Ganzhi).all()
-    ganzhi_map = {g.ganzhi: g for g in all_ganzhi}
-
-    # Get xiangyi data - use the JSON keys directly
-    liu_shi_jia_zi = XIANGYI_DATA.get('liu_shi_jia_zi_na_yin', {})
-
-    nayin_list = []
-    for json_key, data in liu_shi_jia_zi.items():
-        # Convert json key to Chinese ganzhi
-        ganzhi_name = convert_jiazi_key(json_key)
-        if ganzhi_name in ganzhi_map:
-            g = ganzhi_map[ganzhi_name]
-            nayin_name = data.get('纳音', '')
-            # Determine zhuangtai based on tian gan
-            tg = g.tiangan
-            zhuangtai_map = {
-                '甲': '旺', '乙': '衰', '丙': '旺', '丁': '衰',
-                '戊': '旺', '己': '衰', '庚': '旺', '辛': '衰',
-                '壬': '旺', '癸': '衰'
-            }
-            zhuangtai = zhuangtai_map.get(tg, '平')
-
-            # Determine shengda xiaoruo
-            shengda_map = {
-                '甲': '长生', '乙': '帝旺', '丙': '帝旺', '丁': '长生',
-                '戊': '长生', '己': '帝旺', '庚': '帝旺', '辛': '长生',
-                '壬': '帝旺', '癸': '长生'
-            }
-            shengda = shengda_map.get(tg, '')
-
-            n = Nayin(
-                ganzhi_id=g.id,
-                nayin_name=nayin_name,
-                nayin_wuxing=nayin_name[0] if nayin_name else '',
-                zhuangtai=zhuangtai,
-                shengda_xiaoruo=shengda,
-                zhuangtai_desc=data.get('备注', '')
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, time.perf_counter() - start))
+
+    @property
+    def total(self):
+        return sum(elapsed for _, elapsed in self.stages)
+
+    def report(self):
+        print("\nTimings:")
+        for name, elapsed in self.stages:
+            print(f"  {name:<16} {elapsed * 1000:9.1f} ms")
+        print(f"  {'total':<16} {self.total * 1000:9.1f} ms")
+
+
+def bulk_insert(db, model, rows, batch_size=BATCH_SIZE):
+    """Insert row dicts with Core executemany batches; returns the row count"""
+    table = model.__table__
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(table), rows[start:start + batch_size])
+    return len(rows)
+
+
+def clear_tables(db):
+    """Delete every imported row (inside the import transaction)."""
+    for model in IMPORT_TABLES:
+        db.execute(delete(model))
+
+
+def _xiangyi_row(ganzhi_id, type_, category, content, description=''):
+    return {
+        'ganzhi_id': ganzhi_id,
+        'type': type_,
+        'category': category,
+        'content': content,
+        'description': description,
+        'source': '原文',
+        'confidence': 1.0
+    }
+
+
+def _xiangyi_rows_for(ganzhi_id, data):
+    """Core and detailed xiangyi rows of a tian gan / di zhi entry."""
+    rows = [_xiangyi_row(ganzhi_id, '核心', '综合', content) for content in data.get('核心象意', [])]
+    for category, contents in data.get('细分象意', {}).items():
+        rows.extend(_xiangyi_row(ganzhi_id, '细分', category, content) for content in contents)
+    return rows
+
+
+def build_ganzhi_rows(xiangyi_data):
+    """The 60 Ganzhi rows, with ids 1..60 in jiazi order."""
+    shi_tian_gan = xiangyi_data.get('shi_tian_gan', {})
+    shi_er_di_zhi = xiangyi_data.get('shi_er_di_zhi', {})
+
+    rows = []
+    for i, (tg, dz) in enumerate(JIAZI_SEQUENCE, start=1):
+        rows.append({
+            'id': i,
+            'tiangan': tg,
+            'dizhi': dz,
+            'ganzhi': tg + dz,
+            'tiangan_wuxing': TIAN_GAN_WUXING.get(tg, ''),
+            'dizhi_wuxing': DI_ZHI_WUXING.get(dz, ''),
+            'yinyang': TIAN_GAN_YINYANG.get(tg, ''),
+            'fangwei': DI_ZHI_FANGWEI.get(dz, ''),
+            'jijie': DI_ZHI_JIJIE.get(dz, ''),
+            'tiangan_yuanshiming': shi_tian_gan.get(tg, {}).get('原始命名', ''),
+            'dizhi_yuanshiming': shi_er_di_zhi.get(dz, {}).get('原始命名', ''),
+            'special_desc': None
+        })
+    return rows
+
+
+def _jiazi_entries(xiangyi_data, ganzhi_ids):
+    """(ganzhi_id, data) for every 60-jiazi entry whose key maps to a known Ganzhi."""
+    for json_key, data in xiangyi_data.get('liu_shi_jia_zi_na_yin', {}).items():
+        ganzhi_id = ganzhi_ids.get(convert_jiazi_key(json_key))
+        if ganzhi_id is not None:
+            yield ganzhi_id, data
+
+
+def build_nayin_rows(xiangyi_data, ganzhi_rows):
+    """One Nayin row per 60-jiazi entry."""
+    ganzhi_ids = {g['ganzhi']: g['id'] for g in ganzhi_rows}
+    tiangan_by_id = {g['id']: g['tiangan'] for g in ganzhi_rows}
+
+    rows = []
+    for ganzhi_id, data in _jiazi_entries(xiangyi_data, ganzhi_ids):
+        nayin_name = data.get('纳音', '')
+        tg = tiangan_by_id[ganzhi_id]
+        rows.append({
+            'ganzhi_id': ganzhi_id,
+            'nayin_name': nayin_name,
+            'nayin_wuxing': nayin_name[0] if nayin_name else '',
+            'zhuangtai': ZHUANGTAI_MAP.get(tg, '平'),
+            'shengda_xiaoruo': SHENGDA_MAP.get(tg, ''),
+            'zhuangtai_desc': data.get('备注', '')
+        })
+    return rows
+
+
+def first_ganzhi_ids(ganzhi_rows):
+    """
+    ({tiangan: ganzhi_id}, {dizhi: ganzhi_id}) of the first Ganzhi with each
+    stem / branch, which carries the tian gan / di zhi xiangyi.
+    """
+    first_by_tiangan = {}
+    first_by_dizhi = {}
+    for g in ganzhi_rows:
+        first_by_tiangan.setdefault(g['tiangan'], g['id'])
+        first_by_dizhi.setdefault(g['dizhi'], g['id'])
+    return first_by_tiangan, first_by_dizhi
+
+
+def build_xiangyi_rows(xiangyi_data, ganzhi_rows):
+    """Tian gan, di zhi and 60-jiazi xiangyi rows."""
+    ganzhi_ids = {g['ganzhi']: g['id'] for g in ganzhi_rows}
+    first_by_tiangan, first_by_dizhi = first_ganzhi_ids(ganzhi_rows)
+
+    rows = []
+    for tg, data in xiangyi_data.get('shi_tian_gan', {}).items():
+        if tg in first_by_tiangan:
+            rows.extend(_xiangyi_rows_for(first_by_tiangan[tg], data))
+    for dz, data in xiangyi_data.get('shi_er_di_zhi', {}).items():
+        if dz in first_by_dizhi:
+            rows.extend(_xiangyi_rows_for(first_by_dizhi[dz], data))
+
+    # 60 jiazi xiangyi
+    for ganzhi_id, data in _jiazi_entries(xiangyi_data, ganzhi_ids):
+        rows.extend(
+            _xiangyi_row(ganzhi_id, '核心', '综合', content, data.get('备注', ''))
+            for content in data.get('核心象意', [])
+        )
+    return rows
+
+
+def shensha_names(xiangyi_data, kg_data, ganzhi_rows):
+    """Every shensha name (60-jiazi lists, then knowledge-graph nodes) in order of first appearance."""
+    ganzhi_ids = {g['ganzhi']: g['id'] for g in ganzhi_rows}
+    names = {}
+    for _, data in _jiazi_entries(xiangyi_data, ganzhi_ids):
+        for name in data.get('神煞', []):
+            names.setdefault(name, None)
+    for node in kg_data.get('knowledge_graph', {}).get('nodes', []):
+        if node.get('type') == '神煞':
+            names.setdefault(node.get('label'), None)
+    return list(names)
+
+
+def build_shensha_rows(shensha_ids):
+    """Shensha rows for a {name: id} mapping."""
+    return [
+        {
+            'id': shensha_id,
+            'name': name,
+            'type': '组合神煞',
+            'check_method': '',
+            'jixiong': '平',
+            'yuanwen': '',
+            'modern_desc': '',
+            'remark': ''
+        }
+        for name, shensha_id in shensha_ids.items()
+    ]
+
+
+def build_link_rows(xiangyi_data, ganzhi_rows, shensha_ids):
+    """Ganzhi-Shensha links from the 60-jiazi shensha lists."""
+    ganzhi_ids = {g['ganzhi']: g['id'] for g in ganzhi_rows}
+    return [
+        {'ganzhi_id': ganzhi_id, 'shensha_id': shensha_ids[name], 'is_zixing': False}
+        for ganzhi_id, data in _jiazi_entries(xiangyi_data, ganzhi_ids)
+        for name in data.get('神煞', [])
+    ]
+
+
+def build_xiji_rows(xiangyi_data, ganzhi_rows):
+    """Xi (喜) and Ji (忌) rows of the 60-jiazi entries."""
+    ganzhi_ids = {g['ganzhi']: g['id'] for g in ganzhi_rows}
+
+    rows = []
+    for ganzhi_id, data in _jiazi_entries(xiangyi_data, ganzhi_ids):
+        for type_ in ('喜', '忌'):
+            rows.extend(
+                {
+                    'ganzhi_id': ganzhi_id,
+                    'type': type_,
+                    'target_type': '五行/方位',
+                    'target_value': target,
+                    'remark': ''
+                }
+                for target in data.get(type_, [])
             )
-            nayin_list.append(n)
+    return rows
+
+
+def build_guanxi_rows(kg_data, ganzhi_rows):
+    """Guanxi rows, de-duplicated on (ganzhi1, ganzhi2, relation_type)."""
+    ganzhi_names = {g['ganzhi'] for g in ganzhi_rows}
+
+    rows = []
+    seen = set()
+
+    def add(g1, g2, relation, remark):
+        key = (g1, g2, relation)
+        if key not in seen:
+            seen.add(key)
+            rows.append({'ganzhi1': g1, 'ganzhi2': g2, 'relation_type': relation, 'remark': remark})
+
+    # Edges from KG_logic.json, e.g. "jia_zi" -> "甲子"
+    for edge in kg_data.get('knowledge_graph', {}).get('edges', []):
+        g1 = convert_jiazi_key(edge.get('from', ''))
+        g2 = convert_jiazi_key(edge.get('to', ''))
+        if g1 in ganzhi_names and g2 in ganzhi_names:
+            add(g1, g2, edge.get('relation', ''), edge.get('note', ''))
+
+    # Same tian gan (同天干) / same di zhi (同地支) pairs along the 60 jiazi sequence
+    for column, relation in (('tiangan', '同天干'), ('dizhi', '同地支')):
+        groups = {}
+        for g in ganzhi_rows:
+            groups.setdefault(g[column], []).append(g['ganzhi'])
+        for members in groups.values():
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    add(members[i], members[j], relation, '')
+    return rows
+
+
+def import_ganzhi(db, xiangyi_data):
+    """Import the 60 Ganzhi records; returns the rows (with ids)."""
+    print("Importing 60 Ganzhi records...")
+    rows = build_ganzhi_rows(xiangyi_data)
+    bulk_insert(db, Ganzhi, rows)
+    print(f"  Imported {len(rows)} ganzhi records")
+    return rows
+
 
-    db.add_all(nayin_list)
-    db.commit()
-    print(f"  Imported {len(nayin_list)} nayin records")
+def import_nayin(db, xiangyi_data, ganzhi_rows):
+    """Import Nayin data for 60 Ganzhi."""
+    print("Importing Nayin data...")
+    count = bulk_insert(db, Nayin, build_nayin_rows(xiangyi_data, ganzhi_rows))
+    print(f"  Imported {count} nayin records")
+    return count
 
 
-def import_xiangyi(db):
+def import_xiangyi(db, xiangyi_data, ganzhi_rows):
     """Import Xiangyi data."""
     print("Importing Xiangyi data...")
+    count = bulk_insert(db, Xiangyi, build_xiangyi_rows(xiangyi_data, ganzhi_rows))
+    print(f"  Imported {count} xiangyi records")
+    return count
 
-    # Clear existing data
-    db.query(Xiangyi).delete()
-
-    # Get all ganzhi
-    all_ganzhi = db.query(Ganzhi).all()
-    ganzhi_map = {g.ganzhi: g for g in all_ganzhi}
-
-    # Import tian gan xiangyi
-    xiangyi_list = []
-    for tg, data in SHI_TIAN_GAN_DATA.items():
-        # Find the ganzhi that starts with this tian gan
-        for g in all_ganzhi:
-            if g.tiangan == tg:
-                # Core xiangyi
-                core_yixiang = data.get('核心象意', [])
-                for content in core_yixiang:
-                    x = Xiangyi(
-                        ganzhi_id=g.id,
-                        type='核心',
-                        category='综合',
-                        content=content,
-                        description='',
-                        source='原文',
-                        confidence=1.0
-                    )
-                    xiangyi_list.append(x)
-
-                # Detailed xiangyi
-                detail = data.get('细分象意', {})
-                for category, contents in detail.items():
-                    for content in contents:
-                        x = Xiangyi(
-                            ganzhi_id=g.id,
-                            type='细分',
-                            category=category,
-                            content=content,
-                            description='',
-                            source='原文',
-                            confidence=1.0
-                        )
-                        xiangyi_list.append(x)
-                break
-
-    # Import di zhi xiangyi
-    for dz, data in SHI_ER_DI_ZHI_DATA.items():
-        for g in all_ganzhi:
-            if g.dizhi == dz:
-                core_yixiang = data.get('核心象意', [])
-                for content in core_yixiang:
-                    x = Xiangyi(
-                        ganzhi_id=g.id,
-                        type='核心',
-                        category='综合',
-                        content=content,
-                        description='',
-                        source='原文',
-                        confidence=1.0
-                    )
-                    xiangyi_list.append(x)
-
-                detail = data.get('细分象意', {})
-                for category, contents in detail.items():
-                    for content in contents:
-                        x = Xiangyi(
-                            ganzhi_id=g.id,
-                            type='细分',
-                            category=category,
-                            content=content,
-                            description='',
-                            source='原文',
-                            confidence=1.0
-                        )
-                        xiangyi_list.append(x)
-                break
-
-    # Import 60 jiazi xiangyi
-    liu_shi_jia_zi = XIANGYI_DATA.get('liu_shi_jia_zi_na_yin', {})
-    for json_key, data in liu_shi_jia_zi.items():
-        ganzhi_name = convert_jiazi_key(json_key)
-        if ganzhi_name in ganzhi_map:
-            g = ganzhi_map[ganzhi_name]
-            core_yixiang = data.get('核心象意', [])
-            for content in core_yixiang:
-                x = Xiangyi(
-                    ganzhi_id=g.id,
-                    type='核心',
-                    category='综合',
-                    content=content,
-                    description=data.get('备注', ''),
-                    source='原文',
-                    confidence=1.0
-                )
-                xiangyi_list.append(x)
-
-    db.add_all(xiangyi_list)
-    db.commit()
-    print(f"  Imported {len(xiangyi_list)} xiangyi records")
-
-
-def import_shensha(db):
+
+def import_shensha(db, xiangyi_data, kg_data, ganzhi_rows):
     """Import Shensha data and links to Ganzhi."""
     print("Importing Shensha data...")
+    shensha_ids = {name: i for i, name in enumerate(shensha_names(xiangyi_data, kg_data, ganzhi_rows), start=1)}
+    shensha_count = bulk_insert(db, Shensha, build_shensha_rows(shensha_ids))
+    link_count = bulk_insert(db, GanzhiShensha, build_link_rows(xiangyi_data, ganzhi_rows, shensha_ids))
+    print(f"  Imported {shensha_count} shensha records and {link_count} links")
+    return shensha_count, link_count
 
-    # Clear existing data
-    db.query(GanzhiShensha).delete()
-    db.query(Shensha).delete()
-
-    # Get all ganzhi
-    all_ganzhi = db.query(Ganzhi).all()
-    ganzhi_map = {g.ganzhi: g for g in all_ganzhi}
-
-    # Collect all shensha from the data
-    shensha_set = set()
-    liu_shi_jia_zi = XIANGYI_DATA.get('liu_shi_jia_zi_na_yin', {})
-    for data in liu_shi_jia_zi.values():
-        for s in data.get('神煞', []):
-            shensha_set.add(s)
-
-    # Add shensha from KG_logic.json if available
-    if KG_DATA.get('knowledge_graph', {}).get('nodes'):
-        for node in KG_DATA['knowledge_graph']['nodes']:
-            if node.get('type') == '神煞':
-                shensha_set.add(node.get('label'))
-
-    # Create shensha records
-    shensha_list = []
-    for name in shensha_set:
-        s = Shensha(
-            name=name,
-            type='组合神煞',
-            check_method='',
-            jixiong='平',
-            yuanwen='',
-            modern_desc='',
-            remark=''
-        )
-        shensha_list.append(s)
-
-    db.add_all(shensha_list)
-    db.commit()
-
-    # Create shensha map
-    shensha_map = {s.name: s for s in db.query(Shensha).all()}
-
-    # Link shensha to ganzhi
-    gs_list = []
-    for json_key, data in liu_shi_jia_zi.items():
-        ganzhi_name = convert_jiazi_key(json_key)
-        if ganzhi_name in ganzhi_map:
-            g = ganzhi_map[ganzhi_name]
-            for s_name in data.get('神煞', []):
-                if s_name in shensha_map:
-                    gs = GanzhiShensha(
-                        ganzhi_id=g.id,
-                        shensha_id=shensha_map[s_name].id,
-                        is_zixing=False
-                    )
-                    gs_list.append(gs)
-
-    db.add_all(gs_list)
-    db.commit()
-    print(f"  Imported {len(shensha_list)} shensha records and {len(gs_list)} links")
-
-
-def import_xiji(db):
+
+def import_xiji(db, xiangyi_data, ganzhi_rows):
     """Import Xi (喜) and Ji (忌) data."""
     print("Importing Xiji (喜忌) data...")
+    count = bulk_insert(db, Xiji, build_xiji_rows(xiangyi_data, ganzhi_rows))
+    print(f"  Imported {count} xiji records")
+    return count
 
-    # Clear existing data
-    db.query(Xiji).delete()
-
-    # Get all ganzhi
-    all_ganzhi = db.query(Ganzhi).all()
-    ganzhi_map = {g.ganzhi: g for g in all_ganzhi}
-
-    liu_shi_jia_zi = XIANGYI_DATA.get('liu_shi_jia_zi_na_yin', {})
-
-    xiji_list = []
-    for json_key, data in liu_shi_jia_zi.items():
-        ganzhi_name = convert_jiazi_key(json_key)
-        if ganzhi_name in ganzhi_map:
-            g = ganzhi_map[ganzhi_name]
-
-            # 喜
-            for target in data.get('喜', []):
-                x = Xiji(
-                    ganzhi_id=g.id,
-                    type='喜',
-                    target_type='五行/方位',
-                    target_value=target,
-                    remark=''
-                )
-                xiji_list.append(x)
-
-            # 忌
-            for target in data.get('忌', []):
-                x = Xiji(
-                    ganzhi_id=g.id,
-                    type='忌',
-                    target_type='五行/方位',
-                    target_value=target,
-                    remark=''
-                )
-                xiji_list.append(x)
-
-    db.add_all(xiji_list)
-    db.commit()
-    print(f"  Imported {len(xiji_list)} xiji records")
-
-
-def import_guanxi(db):
+
+def import_guanxi(db, kg_data, ganzhi_rows):
     """Import Guanxi (relationships) data."""
     print("Importing Guanxi data...")
+    count = bulk_insert(db, Guanxi, build_guanxi_rows(kg_data, ganzhi_rows))
+    print(f"  Imported {count} guanxi records")
+    return count
+
+
+def import_search_index(db):
+    """Rebuild the full-text search index."""
+    print("Building search index...")
+    from app.crud.search import rebuild_search_index
 
-    # Clear existing data
-    db.query(Guanxi).delete()
-
-    # Get all ganzhi
-    all_ganzhi = db.query(Ganzhi).all()
-    ganzhi_set = {g.ganzhi for g in all_ganzhi}
-
-    # Process edges from KG_logic.json
-    guanxi_list = []
-    edges = KG_DATA.get('knowledge_graph', {}).get('edges', [])
-
-    for edge in edges:
-        from_node = edge.get('from', '')
-        to_node = edge.get('to', '')
-        relation = edge.get('relation', '')
-        note = edge.get('note', '')
-
-        # Convert node IDs to ganzhi names
-        # e.g., "jia_zi" -> "甲子", "yi_chou" -> "乙丑"
-        g1 = convert_jiazi_key(from_node)
-        g2 = convert_jiazi_key(to_node)
-
-        if g1 and g2 and g1 in ganzhi_set and g2 in ganzhi_set:
-            # Skip if duplicate
-            exists = db.query(Guanxi).filter(
-                Guanxi.ganzhi1 == g1,
-                Guanxi.ganzhi2 == g2,
-                Guanxi.relation_type == relation
-            ).first()
-
-            if not exists:
-                g = Guanxi(
-                    ganzhi1=g1,
-                    ganzhi2=g2,
-                    relation_type=relation,
-                    remark=note
-                )
-                guanxi_list.append(g)
-
-    # Add some basic relationships based on the 60 jiazi sequence
-    # Same tian gan (同天干)
-    tg_ganzhi = {}
-    for g in all_ganzhi:
-        if g.tiangan not in tg_ganzhi:
-            tg_ganzhi[g.tiangan] = []
-        tg_ganzhi[g.tiangan].append(g.ganzhi)
-
-    for tg, g_list in tg_ganzhi.items():
-        for i in range(len(g_list)):
-            for j in range(i+1, len(g_list)):
-                # Check if not already exists
-                exists = db.query(Guanxi).filter(
-                    Guanxi.ganzhi1 == g_list[i],
-                    Guanxi.ganzhi2 == g_list[j],
-                    Guanxi.relation_type == '同天干'
-                ).first()
-                if not exists:
-                    g = Guanxi(
-                        ganzhi1=g_list[i],
-                        ganzhi2=g_list[j],
-                        relation_type='同天干',
-                        remark=''
-                    )
-                    guanxi_list.append(g)
-
-    # Same di zhi (同地支)
-    dz_ganzhi = {}
-    for g in all_ganzhi:
-        if g.dizhi not in dz_ganzhi:
-            dz_ganzhi[g.dizhi] = []
-        dz_ganzhi[g.dizhi].append(g.ganzhi)
-
-    for dz, g_list in dz_ganzhi.items():
-        for i in range(len(g_list)):
-            for j in range(i+1, len(g_list)):
-                exists = db.query(Guanxi).filter(
-                    Guanxi.ganzhi1 == g_list[i],
-                    Guanxi.ganzhi2 == g_list[j],
-                    Guanxi.relation_type == '同地支'
-                ).first()
-                if not exists:
-                    g = Guanxi(
-                        ganzhi1=g_list[i],
-                        ganzhi2=g_list[j],
-                        relation_type='同地支',
-                        remark=''
-                    )
-                    guanxi_list.append(g)
-
-    db.add_all(guanxi_list)
-    db.commit()
-    print(f"  Imported {len(guanxi_list)} guanxi records")
+    count = rebuild_search_index(db)
+    print(f"  Indexed {count} documents")
+    return count
+
+
+def bump_version(db):
+    """Bump the data version so cached API responses are revalidated."""
+    version = bump_data_version(db)
+    print(f"  Data version is now {version}")
+    return version
 
 
 def convert_jiazi_key(key):
     """Convert jiazi key from JSON format to Chinese ganzhi."""
-    mapping = {
-        'jia_zi': '甲子', 'yi_chou': '乙丑', 'bing_yin': '丙寅', 'ding_mao': '丁卯',
-        'wu_chen': '戊辰', 'ji_si': '己巳', 'geng_wu': '庚午', 'xin_wei': '辛未',
-        'ren_shen': '壬申', 'gui_you': '癸酉', 'jia_xu': '甲戌', 'yi_hai': '乙亥',
-        'bing_zi': '丙子', 'ding_chou': '丁丑', 'wu_yin': '戊寅', 'ji_mao': '己卯',
-        'geng_chen': '庚辰', 'xin_si': '辛巳', 'ren_wu': '壬午', 'gui_wei': '癸未',
-        'jia_shen': '甲申', 'yi_you': '乙酉', 'bing_xu': '丙戌', 'ding_hai': '丁亥',
-        'wu_zi': '戊子', 'ji_chou': '己丑', 'geng_yin': '庚寅', 'xin_mao': '辛卯',
-        'ren_chen': '壬辰', 'gui_si': '癸巳', 'jia_wu': '甲午', 'yi_wei': '乙未',
-        'bing_shen': '丙申', 'ding_you': '丁酉', 'wu_xu': '戊戌', 'ji_hai': '己亥',
-        'geng_zi': '庚子', 'xin_chou': '辛丑', 'ren_yin': '壬寅', 'gui_mao': '癸卯',
-        'jia_chen': '甲辰', 'yi_si': '乙巳', 'bing_wu': '丙午', 'ding_wei': '丁未',
-        'wu_shen': '戊申', 'ji_you': '己酉', 'geng_xu': '庚戌', 'xin_hai': '辛亥',
-        'ren_zi': '壬子', 'gui_chou': '癸丑', 'jia_yin': '甲寅', 'yi_mao': '乙卯',
-        'bing_chen': '丙辰', 'ding_si': '丁巳', 'wu_wu': '戊午', 'ji_wei': '己未',
-        'geng_shen': '庚申', 'xin_you': '辛酉', 'ren_xu': '壬戌', 'gui_hai': '癸亥'
-    }
-    return mapping.get(key, key)
+    return JIAZI_KEYS.get(key, key)
+
+
+def load_sources(project_root):
+    """Load xiangyi.json and KG_logic.json from the project root."""
+    sources = []
+    for name in SOURCE_FILES:
+        with open(os.path.join(project_root, name), 'r', encoding='utf-8') as f:
+            sources.append(json.load(f))
+    return tuple(sources)
+
+
+def run_import(db, xiangyi_data, kg_data, timer=None, hashes=None):
+    """
+    Replace every table from the source data in a single transaction.
+    Returns the row counts; stage timings are recorded on timer.
+    hashes are the source hashes to record for later differential reimports;
+    without them the recorded hashes are cleared.
+    """
+    from app.import_diff import clear_source_hashes, store_source_hashes
+
+    timer = timer or StageTimer()
+    counts = {}
+    try:
+        with timer.stage("clear"):
+            clear_tables(db)
+        with timer.stage("ganzhi"):
+            ganzhi_rows = import_ganzhi(db, xiangyi_data)
+            counts['ganzhi'] = len(ganzhi_rows)
+        with timer.stage("nayin"):
+            counts['nayin'] = import_nayin(db, xiangyi_data, ganzhi_rows)
+        with timer.stage("xiangyi"):
+            counts['xiangyi'] = import_xiangyi(db, xiangyi_data, ganzhi_rows)
+        with timer.stage("shensha"):
+            counts['shensha'], counts['ganzhi_shensha'] = import_shensha(db, xiangyi_data, kg_data, ganzhi_rows)
+        with timer.stage("xiji"):
+            counts['xiji'] = import_xiji(db, xiangyi_data, ganzhi_rows)
+        with timer.stage("guanxi"):
+            counts['guanxi'] = import_guanxi(db, kg_data, ganzhi_rows)
+        with timer.stage("search index"):
+            counts['search_index'] = import_search_index(db)
+        with timer.stage("data version"):
+            bump_version(db)
+        with timer.stage("hashes"):
+            clear_source_hashes(db)
+            if hashes is not None:
+                store_source_hashes(db, {}, hashes)
+        with timer.stage("commit"):
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return counts
 
 
 def main():
     """Main import function."""
-    global SHI_TIAN_GAN_DATA, SHI_ER_DI_ZHI_DATA, XIANGYI_DATA, KG_DATA
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Print the changes without writing them")
+    parser.add_argument("--full", action="store_true", help="Rebuild every table instead of applying a diff")
+    args = parser.parse_args()
+
+    from app.import_diff import file_hashes, record_hashes, run_reimport
 
     print("=" * 50)
     print("Data Import Script")
     print("=" * 50)
 
+    timer = StageTimer()
+
     # Load data files
     print("\nLoading data files...")
 
     # Get project root (go up 3 levels from app/import_data.py to reach project root)
     # app/import_data.py -> app/ -> backend/ -> project root
-    current_file = os.path.abspath(__file__)
-    app_dir = os.path.dirname(current_file)
-    backend_dir = os.path.dirname(app_dir)
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     project_root = os.path.dirname(backend_dir)
-    xiangyi_path = os.path.join(project_root, 'xiangyi.json')
-    kg_path = os.path.join(project_root, 'KG_logic.json')
 
-    with open(xiangyi_path, 'r', encoding='utf-8') as f:
-        XIANGYI_DATA = json.load(f)
+    with timer.stage("load sources"):
+        xiangyi_data, kg_data = load_sources(project_root)
+        files = file_hashes(project_root)
 
-    with open(kg_path, 'r', encoding='utf-8') as f:
-        KG_DATA = json.load(f)
-
-    SHI_TIAN_GAN_DATA = XIANGYI_DATA.get('shi_tian_gan', {})
-    SHI_ER_DI_ZHI_DATA = XIANGYI_DATA.get('shi_er_di_zhi', {})
-
-    print(f"  Loaded xiangyi.json with {len(SHI_TIAN_GAN_DATA)} tian gan, {len(SHI_ER_DI_ZHI_DATA)} di zhi")
-    print(f"  Loaded KG_logic.json with {len(KG_DATA.get('knowledge_graph', {}).get('nodes', []))} nodes")
+    print(f"  Loaded xiangyi.json with {len(xiangyi_data.get('shi_tian_gan', {}))} tian gan, "
+          f"{len(xiangyi_data.get('shi_er_di_zhi', {}))} di zhi")
+    print(f"  Loaded KG_logic.json with {len(kg_data.get('knowledge_graph', {}).get('nodes', []))} nodes")
 
     # Initialize database
-    print("\nInitializing database...")
-    init_db()
+    if not args.dry_run:
+        print("\nInitializing database...")
+        with timer.stage("init db"):
+            init_db()
 
     # Create database session
     db = SessionLocal()
 
     try:
-        # Import data
-        import_ganzhi(db)
-        import_nayin(db)
-        import_xiangyi(db)
-        import_shensha(db)
-        import_xiji(db)
-        import_guanxi(db)
-
-        print("\n" + "=" * 50)
-        print("Data import completed!")
-        print("=" * 50)
-
-        # Print summary
-        print("\nSummary:")
-        print(f"  Ganzhi: {db.query(Ganzhi).count()} records")
-        print(f"  Nayin: {db.query(Nayin).count()} records")
-        print(f"  Xiangyi: {db.query(Xiangyi).count()} records")
-        print(f"  Shensha: {db.query(Shensha).count()} records")
-        print(f"  GanzhiShensha: {db.query(GanzhiShensha).count()} records")
-        print(f"  Xiji: {db.query(Xiji).count()} records")
-        print(f"  Guanxi: {db.query(Guanxi).count()} records")
+        if args.full and not args.dry_run:
+            hashes = {**files, **record_hashes(xiangyi_data, kg_data)}
+            counts = retry_on_locked(run_import)(db, xiangyi_data, kg_data, timer, hashes)
+
+            print("\n" + "=" * 50)
+            print("Data import completed!")
+            print("=" * 50)
+
+            # Print summary
+            print("\nSummary:")
+            print(f"  Ganzhi: {counts['ganzhi']} records")
+            print(f"  Nayin: {counts['nayin']} records")
+            print(f"  Xiangyi: {counts['xiangyi']} records")
+            print(f"  Shensha: {counts['shensha']} records")
+            print(f"  GanzhiShensha: {counts['ganzhi_shensha']} records")
+            print(f"  Xiji: {counts['xiji']} records")
+            print(f"  Guanxi: {counts['guanxi']} records")
+        else:
+            plan = retry_on_locked(run_reimport)(db, xiangyi_data, kg_data, files, args.dry_run, timer)
+            plan.report()
+
+            print("\n" + "=" * 50)
+            print("Dry run: nothing written" if args.dry_run else "Differential import completed!")
+            print("=" * 50)
+
+        timer.report()
 
     except Exception as e:
         print(f"\nError: {e}")
-        db.rollback()
         raise
     finally:
         db.close()
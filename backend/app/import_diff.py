@@ -0,0 +1,390 @@
+"""
+Differential reimport.
+
+Content hashes of the import sources are kept in the source_hash table: one
+per source file and one per logical record (tian gan, di zhi and 60-jiazi
+entries of xiangyi.json, shensha nodes and edges of KG_logic.json). A
+reimport compares them with the hashes of the current sources; only the rows
+produced by changed records are diffed against the database, on natural keys,
+and written as inserts, updates and deletes. Rows that are kept keep their ids.
+"""
+import hashlib
+import json
+import os
+from collections import defaultdict
+
+from sqlalchemy import delete, select, update
+
+from app.import_data import (
+    BATCH_SIZE, SOURCE_FILES, StageTimer, build_ganzhi_rows, build_guanxi_rows, build_link_rows,
+    build_nayin_rows, build_shensha_rows, build_xiangyi_rows, build_xiji_rows, bulk_insert,
+    bump_version, convert_jiazi_key, first_ganzhi_ids, shensha_names
+)
+from app.crud.search import update_search_index
+from app.models import Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi, SourceHash
+
+
+# Record scopes: xiangyi.json sections, then knowledge-graph nodes and edges
+RECORD_SECTIONS = (
+    ('tiangan', 'shi_tian_gan'),
+    ('dizhi', 'shi_er_di_zhi'),
+    ('jiazi', 'liu_shi_jia_zi_na_yin'),
+)
+
+# Natural key of every table; rows are matched on it
+NATURAL_KEYS = {
+    Ganzhi: ('ganzhi',),
+    Shensha: ('name',),
+    Nayin: ('ganzhi_id',),
+    Xiangyi: ('ganzhi_id', 'type', 'category', 'content'),
+    GanzhiShensha: ('ganzhi_id', 'shensha_id'),
+    Xiji: ('ganzhi_id', 'type', 'target_value'),
+    Guanxi: ('ganzhi1', 'ganzhi2', 'relation_type'),
+}
+
+# Tables in insert order (parents first); deletes run in reverse
+APPLY_ORDER = (Ganzhi, Shensha, Nayin, Xiangyi, GanzhiShensha, Xiji, Guanxi)
+
+
+def content_hash(value) -> str:
+    """SHA-1 of the canonical JSON encoding of a value"""
+    encoded = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def file_hashes(project_root) -> dict:
+    """{('file', name): hash} of the raw source files"""
+    hashes = {}
+    for name in SOURCE_FILES:
+        with open(os.path.join(project_root, name), 'rb') as f:
+            hashes[('file', name)] = hashlib.sha1(f.read()).hexdigest()
+    return hashes
+
+
+def edge_key(edge) -> str:
+    return f"{edge.get('from', '')}|{edge.get('to', '')}|{edge.get('relation', '')}"
+
+
+def record_hashes(xiangyi_data, kg_data) -> dict:
+    """
+    {(scope, key): hash} of every logical record. Duplicate shensha nodes and
+    edges hash their first occurrence, the one the importer keeps.
+    """
+    hashes = {}
+    for scope, section in RECORD_SECTIONS:
+        for key, entry in xiangyi_data.get(section, {}).items():
+            hashes[(scope, key)] = content_hash(entry)
+
+    graph = kg_data.get('knowledge_graph', {})
+    for node in graph.get('nodes', []):
+        if node.get('type') == '神煞':
+            hashes.setdefault(('shensha', str(node.get('label'))), content_hash(node))
+    for edge in graph.get('edges', []):
+        hashes.setdefault(('edge', edge_key(edge)), content_hash(edge))
+    return hashes
+
+
+def _hash_table_exists(db) -> bool:
+    return db.get_bind().dialect.has_table(db.connection(), SourceHash.__tablename__)
+
+
+def load_source_hashes(db) -> dict:
+    """Recorded {(scope, key): hash}; empty if nothing was recorded yet"""
+    if not _hash_table_exists(db):
+        return {}
+    return {(scope, key): value for scope, key, value in db.execute(select(SourceHash.scope, SourceHash.key, SourceHash.hash))}
+
+
+def store_source_hashes(db, stored, hashes):
+    """Write the difference between the recorded and the new hashes. Caller commits."""
+    SourceHash.__table__.create(bind=db.connection(), checkfirst=True)
+    removed = [key for key in stored if key not in hashes]
+    changed = [key for key, value in hashes.items() if stored.get(key) != value]
+    for scope, key in removed + [key for key in changed if key in stored]:
+        db.execute(delete(SourceHash).where(SourceHash.scope == scope, SourceHash.key == key))
+    bulk_insert(db, SourceHash, [{'scope': scope, 'key': key, 'hash': hashes[(scope, key)]} for scope, key in changed])
+
+
+def clear_source_hashes(db):
+    """
+    Forget the recorded hashes, after the tables were written by something else
+    (admin imports), so the next reimport diffs every record. Caller commits.
+    """
+    if _hash_table_exists(db):
+        db.execute(delete(SourceHash))
+
+
+class TableDiff:
+    """Row changes of one table: new rows, updated rows (with ids) and deleted ids"""
+
+    def __init__(self, model):
+        self.model = model
+        self.inserts = []
+        self.updates = []
+        self.deletes = []
+        self.previous = {}  # id -> row before the update or delete
+
+    def __bool__(self):
+        return bool(self.inserts or self.updates or self.deletes)
+
+    def summary(self) -> str:
+        return f"+{len(self.inserts)} ~{len(self.updates)} -{len(self.deletes)}"
+
+
+def diff_rows(model, existing, desired) -> TableDiff:
+    """
+    Match desired rows to existing rows (with ids) on the table's natural key.
+    Rows sharing a key are paired in id order; unmatched existing rows are deleted.
+    """
+    key_columns = NATURAL_KEYS[model]
+    diff = TableDiff(model)
+    pending = defaultdict(list)
+    for row in existing:
+        pending[tuple(row[c] for c in key_columns)].append(row)
+
+    for row in desired:
+        matches = pending.get(tuple(row[c] for c in key_columns))
+        if not matches:
+            diff.inserts.append(row)
+            continue
+        current = matches.pop(0)
+        if any(current[column] != value for column, value in row.items()):
+            diff.updates.append({**row, 'id': current['id']})
+            diff.previous[current['id']] = current
+
+    for rows in pending.values():
+        for row in rows:
+            diff.deletes.append(row['id'])
+            diff.previous[row['id']] = row
+    return diff
+
+
+def diff_table(db, model, desired, column=None, values=None, match=None) -> TableDiff:
+    """
+    Diff the desired rows of a table against the database. With column/values
+    only rows whose column is in values are compared (None: the whole table);
+    match further filters both sides.
+    """
+    table = model.__table__
+    query = select(table).order_by(table.c.id)
+    if values is not None:
+        if not values:
+            return TableDiff(model)
+        query = query.where(table.c[column].in_(values))
+        desired = [row for row in desired if row[column] in values]
+    existing = [dict(row) for row in db.execute(query).mappings()]
+    if match is not None:
+        existing = [row for row in existing if match(row)]
+        desired = [row for row in desired if match(row)]
+    return diff_rows(model, existing, desired)
+
+
+def _entries_for(xiangyi_data, ganzhi_rows, ganzhi_ids):
+    """xiangyi_data restricted to the entries that produce rows of the given Ganzhi (None: all)"""
+    if ganzhi_ids is None:
+        return xiangyi_data
+    first_by_tiangan, first_by_dizhi = first_ganzhi_ids(ganzhi_rows)
+    names = {g['ganzhi'] for g in ganzhi_rows if g['id'] in ganzhi_ids}
+    return {
+        **xiangyi_data,
+        'shi_tian_gan': {k: v for k, v in xiangyi_data.get('shi_tian_gan', {}).items()
+                         if first_by_tiangan.get(k) in ganzhi_ids},
+        'shi_er_di_zhi': {k: v for k, v in xiangyi_data.get('shi_er_di_zhi', {}).items()
+                          if first_by_dizhi.get(k) in ganzhi_ids},
+        'liu_shi_jia_zi_na_yin': {k: v for k, v in xiangyi_data.get('liu_shi_jia_zi_na_yin', {}).items()
+                                  if convert_jiazi_key(k) in names},
+    }
+
+
+class ReimportPlan:
+    """Changed source records and the row changes they cause"""
+
+    def __init__(self, stored, hashes):
+        self.stored = stored
+        self.hashes = hashes
+        self.records = {}  # scope -> {"added": [...], "changed": [...], "removed": [...]}
+        self.tables = {}  # table name -> TableDiff
+
+        for scope, key in sorted(stored.keys() | hashes.keys()):
+            old, new = stored.get((scope, key)), hashes.get((scope, key))
+            if old != new:
+                kind = 'added' if old is None else 'removed' if new is None else 'changed'
+                self.records.setdefault(scope, {'added': [], 'changed': [], 'removed': []})[kind].append(key)
+
+    def changed_keys(self, scope) -> set:
+        """Keys of a scope that were added, changed or removed"""
+        return {key for keys in self.records.get(scope, {}).values() for key in keys}
+
+    @property
+    def changed(self) -> bool:
+        """Whether any row changes"""
+        return any(self.tables.values())
+
+    def report(self, rows_per_table=20, keys_per_line=10):
+        print("\nSource changes:")
+        if not self.records:
+            print("  none")
+        for scope, kinds in self.records.items():
+            for kind, sign in (('added', '+'), ('changed', '~'), ('removed', '-')):
+                keys = kinds[kind]
+                if keys:
+                    more = f" ... and {len(keys) - keys_per_line} more" if len(keys) > keys_per_line else ""
+                    print(f"  {scope:<8} {sign} {', '.join(keys[:keys_per_line])}{more}")
+
+        print("\nRow changes:")
+        if not self.changed:
+            print("  none")
+        for name, diff in self.tables.items():
+            if not diff:
+                continue
+            print(f"  {name:<16} {diff.summary()}")
+            lines = [f"+ {row}" for row in diff.inserts]
+            for row in diff.updates:
+                before = diff.previous[row['id']]
+                columns = {c: f"{before[c]!r} -> {v!r}" for c, v in row.items() if before[c] != v}
+                lines.append(f"~ #{row['id']} {columns}")
+            lines += [f"- #{row_id} {diff.previous[row_id]}" for row_id in diff.deletes]
+            for line in lines[:rows_per_table]:
+                print(f"      {line}")
+            if len(lines) > rows_per_table:
+                print(f"      ... and {len(lines) - rows_per_table} more")
+
+
+def plan_reimport(db, xiangyi_data, kg_data, files=None) -> ReimportPlan:
+    """
+    Compare the sources with the recorded hashes and diff the rows of the
+    changed records. files are the file hashes: when they all match, nothing
+    else is looked at.
+    """
+    stored = load_source_hashes(db)
+    if files and all(stored.get(key) == value for key, value in files.items()):
+        return ReimportPlan(stored, stored)
+
+    hashes = {**(files or {}), **record_hashes(xiangyi_data, kg_data)}
+    plan = ReimportPlan(stored, hashes)
+    if not any(scope != 'file' for scope in plan.records):
+        return plan
+    # Nothing recorded yet (first reimport, or after an admin import): diff everything
+    full = not any(scope != 'file' for scope, _ in stored)
+
+    ganzhi_rows = build_ganzhi_rows(xiangyi_data)
+    ganzhi_ids = {g['ganzhi']: g['id'] for g in ganzhi_rows}
+    first_by_tiangan, first_by_dizhi = first_ganzhi_ids(ganzhi_rows)
+    tiangan, dizhi, jiazi = (plan.changed_keys(scope) for scope in ('tiangan', 'dizhi', 'jiazi'))
+
+    # Ganzhi whose rows come from a changed record; None means all of them
+    changed_ganzhi = changed_xiangyi = changed_jiazi = changed_guanxi = None
+    if not full:
+        changed_jiazi = {ganzhi_ids[name] for name in map(convert_jiazi_key, jiazi) if name in ganzhi_ids}
+        changed_ganzhi = {g['id'] for g in ganzhi_rows if g['tiangan'] in tiangan or g['dizhi'] in dizhi}
+        changed_xiangyi = (changed_jiazi
+                           | {first_by_tiangan[tg] for tg in tiangan if tg in first_by_tiangan}
+                           | {first_by_dizhi[dz] for dz in dizhi if dz in first_by_dizhi})
+        changed_guanxi = set()
+        for key in plan.changed_keys('edge'):
+            source, target, relation = key.split('|', 2)
+            changed_guanxi.add((convert_jiazi_key(source), convert_jiazi_key(target), relation))
+
+    plan.tables['ganzhi'] = diff_table(db, Ganzhi, ganzhi_rows, 'id', changed_ganzhi)
+
+    # Shensha keep their ids; new names continue after the largest one
+    shensha_ids = dict(db.execute(select(Shensha.name, Shensha.id)).all())
+    next_id = max(shensha_ids.values(), default=0) + 1
+    names = shensha_names(xiangyi_data, kg_data, ganzhi_rows)
+    for name in names:
+        if name not in shensha_ids:
+            shensha_ids[name] = next_id
+            next_id += 1
+    if full or jiazi or plan.changed_keys('shensha'):
+        desired = build_shensha_rows({name: shensha_ids[name] for name in names})
+        plan.tables['shensha'] = diff_table(db, Shensha, desired)
+    else:
+        plan.tables['shensha'] = TableDiff(Shensha)
+
+    # Rows are only built from the entries of the changed Ganzhi
+    jiazi_entries = _entries_for(xiangyi_data, ganzhi_rows, changed_jiazi)
+    xiangyi_entries = _entries_for(xiangyi_data, ganzhi_rows, changed_xiangyi)
+    plan.tables['nayin'] = diff_table(
+        db, Nayin, build_nayin_rows(jiazi_entries, ganzhi_rows), 'ganzhi_id', changed_jiazi)
+    plan.tables['xiangyi'] = diff_table(
+        db, Xiangyi, build_xiangyi_rows(xiangyi_entries, ganzhi_rows), 'ganzhi_id', changed_xiangyi)
+    plan.tables['ganzhi_shensha'] = diff_table(
+        db, GanzhiShensha, build_link_rows(jiazi_entries, ganzhi_rows, shensha_ids), 'ganzhi_id', changed_jiazi)
+    plan.tables['xiji'] = diff_table(
+        db, Xiji, build_xiji_rows(jiazi_entries, ganzhi_rows), 'ganzhi_id', changed_jiazi)
+
+    guanxi_rows = build_guanxi_rows(kg_data, ganzhi_rows)
+    if changed_guanxi is None:
+        plan.tables['guanxi'] = diff_table(db, Guanxi, guanxi_rows)
+    else:
+        plan.tables['guanxi'] = diff_table(
+            db, Guanxi, guanxi_rows, 'ganzhi1', {g1 for g1, _, _ in changed_guanxi},
+            match=lambda row: (row['ganzhi1'], row['ganzhi2'], row['relation_type']) in changed_guanxi
+        )
+    return plan
+
+
+def changed_ganzhi_names(db, plan) -> set:
+    """Names of the Ganzhi whose search documents a plan changes"""
+    ganzhi_ids = set()
+    names = set()
+    for name in ('xiangyi', 'ganzhi_shensha'):
+        diff = plan.tables.get(name)
+        if diff:
+            ganzhi_ids.update(row['ganzhi_id'] for row in diff.inserts + diff.updates + list(diff.previous.values()))
+    shensha = plan.tables.get('shensha')
+    if shensha:
+        ganzhi_ids.update(db.scalars(
+            select(GanzhiShensha.ganzhi_id).where(GanzhiShensha.shensha_id.in_([row['id'] for row in shensha.updates]))
+        ))
+    guanxi = plan.tables.get('guanxi')
+    if guanxi:
+        for row in guanxi.inserts + guanxi.updates + list(guanxi.previous.values()):
+            names.update((row['ganzhi1'], row['ganzhi2']))
+    if ganzhi_ids:
+        names.update(db.scalars(select(Ganzhi.ganzhi).where(Ganzhi.id.in_(ganzhi_ids))))
+    return names
+
+
+def apply_plan(db, plan):
+    """Write the row changes of a plan (inside the caller's transaction)"""
+    diffs = {diff.model: diff for diff in plan.tables.values()}
+    order = [model for model in APPLY_ORDER if diffs.get(model)]
+    for model in reversed(order):
+        ids = diffs[model].deletes
+        for start in range(0, len(ids), BATCH_SIZE):
+            db.execute(delete(model).where(model.id.in_(ids[start:start + BATCH_SIZE])))
+    for model in order:
+        if diffs[model].updates:
+            db.execute(update(model), diffs[model].updates)
+        bulk_insert(db, model, diffs[model].inserts)
+
+
+def run_reimport(db, xiangyi_data, kg_data, files=None, dry_run=False, timer=None) -> ReimportPlan:
+    """
+    Apply only the changes between the sources and the database, in a single
+    transaction. With dry_run nothing is written. Returns the plan.
+    """
+    timer = timer or StageTimer()
+    try:
+        with timer.stage("diff"):
+            plan = plan_reimport(db, xiangyi_data, kg_data, files)
+        if dry_run:
+            db.rollback()
+            return plan
+        with timer.stage("apply"):
+            apply_plan(db, plan)
+        if plan.changed:
+            with timer.stage("search index"):
+                count = update_search_index(db, changed_ganzhi_names(db, plan))
+                print(f"  Re-indexed {count} search documents")
+            with timer.stage("data version"):
+                bump_version(db)
+        with timer.stage("hashes"):
+            store_source_hashes(db, plan.stored, plan.hashes)
+        with timer.stage("commit"):
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return plan
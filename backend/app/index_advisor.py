@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Index advisor.
+
+Runs a representative call of every crud function on the database path (no
+knowledge snapshot), captures the SQL it emits and asks SQLite for the
+EXPLAIN QUERY PLAN of each statement. Full table scans are flagged unless the
+query is expected to read the whole table (ALLOWED_SCANS); for each flagged
+scan an index is suggested on the columns the statement filters that table by.
+
+Usage: python app/index_advisor.py [--all]   (exit status 1 on unexpected scans)
+"""
+import argparse
+import os
+import re
+import sys
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud
+from app.database import Base
+from app.import_diff import diff_table
+from app.models import Guanxi, Xiangyi
+from app.store import knowledge_store
+
+
+# (label, fn(db)) for every crud function that reads the database
+CRUD_CALLS = (
+    ("ganzhi.get_ganzhi_list", lambda db: crud.ganzhi.get_ganzhi_list(db)),
+    ("ganzhi.get_ganzhi_by_id", lambda db: crud.ganzhi.get_ganzhi_by_id(db, 1)),
+    ("ganzhi.get_ganzhi_by_name", lambda db: crud.ganzhi.get_ganzhi_by_name(db, "甲子")),
+    ("ganzhi.search_ganzhi", lambda db: crud.ganzhi.search_ganzhi(db, "甲")),
+    ("ganzhi.get_ganzhi_details_bulk", lambda db: crud.ganzhi.get_ganzhi_details_bulk(db, ["甲子", "乙丑"])),
+    ("ganzhi.get_all_ganzhi_names", lambda db: crud.ganzhi.get_all_ganzhi_names(db)),
+    ("nayin.get_nayin_by_ganzhi", lambda db: crud.nayin.get_nayin_by_ganzhi(db, "甲子")),
+    ("nayin.get_ganzhi_by_nayin", lambda db: crud.nayin.get_ganzhi_by_nayin(db, "金")),
+    ("nayin.get_all_nayin_categories", lambda db: crud.nayin.get_all_nayin_categories(db)),
+    ("nayin.get_nayin_by_category", lambda db: crud.nayin.get_nayin_by_category(db, "shengda")),
+    ("nayin.get_status_list", lambda db: crud.nayin.get_status_list(db)),
+    ("nayin.get_nayin_by_status", lambda db: crud.nayin.get_nayin_by_status(db, "长生")),
+    ("shensha.get_all_shensha", lambda db: crud.shensha.get_all_shensha(db)),
+    ("shensha.get_shensha_by_name", lambda db: crud.shensha.get_shensha_by_name(db, "天乙")),
+    ("shensha.get_shensha_by_id", lambda db: crud.shensha.get_shensha_by_id(db, 1)),
+    ("shensha.get_shensha_by_ganzhi", lambda db: crud.shensha.get_shensha_by_ganzhi(db, "甲子")),
+    ("shensha.get_ganzhi_by_shensha", lambda db: crud.shensha.get_ganzhi_by_shensha(db, "天乙")),
+    ("shensha.get_ganzhi_with_all_shensha",
+     lambda db: crud.shensha.get_ganzhi_with_all_shensha(db, ["天乙", "贵人"])),
+    ("shensha.get_zixing_shensha", lambda db: crud.shensha.get_zixing_shensha(db)),
+    ("shensha.get_shensha_by_type", lambda db: crud.shensha.get_shensha_by_type(db, "组合神煞")),
+    ("shensha.get_shensha_types", lambda db: crud.shensha.get_shensha_types(db)),
+    ("guanxi.get_all_guanxi", lambda db: crud.guanxi.get_all_guanxi(db)),
+    ("guanxi.get_guanxi_by_id", lambda db: crud.guanxi.get_guanxi_by_id(db, 1)),
+    ("guanxi.get_guanxi_between", lambda db: crud.guanxi.get_guanxi_between(db, "甲子", "乙丑")),
+    ("search.search_text", lambda db: crud.search.search_text(db, "金")),
+    ("search.suggest", lambda db: crud.search.suggest(db, "甲")),
+    ("chart.analyze_chart", lambda db: crud.chart.analyze_chart(db, ["甲子", "丙寅", "庚午", "丙子"])),
+    ("graph.get_graph", lambda db: crud.graph.get_graph(db)),
+    # Differential reimport (app/import_diff.py): rows of the changed Ganzhi / relations
+    ("import_diff.diff_table(xiangyi)", lambda db: diff_table(db, Xiangyi, [], "ganzhi_id", {1, 2})),
+    ("import_diff.diff_table(guanxi)", lambda db: diff_table(db, Guanxi, [], "ganzhi1", {"甲子"})),
+)
+
+# Full scans that are the point of the query: listings, whole-table loads
+# (relation matrix, distinct values) and substring matches no B-tree can serve
+ALLOWED_SCANS = {
+    "ganzhi.get_ganzhi_list": {"ganzhi"},
+    "ganzhi.search_ganzhi": {"ganzhi"},
+    "ganzhi.get_all_ganzhi_names": {"ganzhi"},
+    "nayin.get_ganzhi_by_nayin": {"nayin"},
+    "nayin.get_all_nayin_categories": {"nayin"},
+    "nayin.get_nayin_by_category": {"nayin"},
+    "nayin.get_status_list": {"nayin"},
+    "nayin.get_nayin_by_status": {"nayin"},
+    "shensha.get_all_shensha": {"shensha"},
+    "shensha.get_zixing_shensha": {"ganzhi_shensha"},
+    "shensha.get_shensha_by_type": {"shensha"},
+    "shensha.get_shensha_types": {"shensha"},
+    "guanxi.get_all_guanxi": {"guanxi"},
+    "search.suggest": {"ganzhi", "nayin", "shensha"},
+    "chart.analyze_chart": {"ganzhi", "nayin", "shensha", "ganzhi_shensha", "xiji", "guanxi"},
+    "graph.get_graph": {"ganzhi", "nayin", "xiangyi", "shensha", "ganzhi_shensha", "xiji", "guanxi"},
+}
+
+QueryPlan = namedtuple("QueryPlan", "label statement plan scans suggestions")
+
+SCAN = re.compile(r"^SCAN (\w+)")
+
+
+@contextmanager
+def capture_statements(bind):
+    """Collect (statement, parameters) of everything executed on an engine"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+
+def explain(db: Session, statement: str, parameters) -> List[str]:
+    """The EXPLAIN QUERY PLAN detail lines of a statement"""
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        return [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    finally:
+        cursor.close()
+
+
+def full_scans(plan: List[str]) -> List[str]:
+    """Model tables read in full (CTEs, subqueries, the catalog and FTS are not flagged)"""
+    return [
+        match.group(1) for match in map(SCAN.match, plan)
+        if match and match.group(1) in Base.metadata.tables
+    ]
+
+
+def indexed_columns(db: Session, table: str) -> set:
+    """Leading columns of the table's indexes"""
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    try:
+        leading = set()
+        for index in cursor.execute(f"PRAGMA index_list({table})").fetchall():
+            columns = cursor.execute(f"PRAGMA index_info({index[1]})").fetchall()
+            if columns:
+                leading.add(columns[0][2])
+        return leading
+    finally:
+        cursor.close()
+
+
+def suggest_indexes(db: Session, statement: str, table: str) -> List[str]:
+    """CREATE INDEX statements for unindexed columns the statement filters the table by"""
+    filtered = re.findall(rf"\b{table}\.(\w+) (?:=|IN \()", statement)
+    indexed = indexed_columns(db, table)
+    return [
+        f"CREATE INDEX ix_{table}_{column} ON {table} ({column})"
+        for column in dict.fromkeys(filtered) if column not in indexed
+    ]
+
+
+def advise(db: Session, calls=CRUD_CALLS) -> List[QueryPlan]:
+    """
+    Plans of every statement the calls emit, read through the database
+    (the snapshot is cleared for the duration and reloaded afterwards if it was loaded).
+    """
+    had_snapshot = knowledge_store.snapshot is not None
+    knowledge_store.clear()
+    # Built once up front so its whole-table reads are not attributed to search
+    crud.search.ensure_search_index(db)
+    plans = []
+    try:
+        for label, call in calls:
+            with capture_statements(db.get_bind()) as statements:
+                call(db)
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                    continue
+                plan = explain(db, statement, parameters)
+                scans = full_scans(plan)
+                suggestions = [s for table in scans for s in suggest_indexes(db, statement, table)]
+                plans.append(QueryPlan(label, statement, plan, scans, suggestions))
+    finally:
+        db.rollback()
+        if had_snapshot:
+            knowledge_store.load(db)
+    return plans
+
+
+def unexpected_scans(plans: List[QueryPlan]) -> List[QueryPlan]:
+    """Plans scanning a table their query is not expected to read in full"""
+    return [
+        plan for plan in plans
+        if set(plan.scans) - ALLOWED_SCANS.get(plan.label, set())
+    ]
+
+
+def report(plans: List[QueryPlan], show_all: bool = False):
+    flagged = unexpected_scans(plans)
+    for plan in plans if show_all else flagged:
+        marker = "SCAN" if plan in flagged else "ok"
+        print(f"[{marker}] {plan.label}")
+        print("    " + " ".join(plan.statement.split())[:200])
+        for line in plan.plan:
+            print(f"      {line}")
+        for suggestion in plan.suggestions:
+            print(f"    suggest: {suggestion}")
+    print(f"{len(plans)} statements, {len(flagged)} unexpected full scans")
+
+
+def main():
+    from app.database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="print every plan, not only the flagged ones")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        plans = advise(db)
+    finally:
+        db.close()
+    report(plans, show_all=args.all)
+    sys.exit(1 if unexpected_scans(plans) else 0)
+
+
+if __name__ == "__main__":
+    main()
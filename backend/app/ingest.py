@@ -0,0 +1,184 @@
+# Streaming NDJSON ingest
+#
+# Admin uploads are read line by line from the request body, validated one row
+# at a time (app/schemas/ingest.py) and written in batches to a staging table,
+# committing after each batch so the single writer is never held for the whole
+# upload. Once the body is consumed the staged rows are moved into the real
+# table in one short transaction (replacing or appending), so readers see
+# either the old or the new table. Memory stays bounded by the batch size.
+import json
+import os
+import uuid
+from typing import AsyncIterator, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import Column, MetaData, Table, delete, insert, inspect, literal_column, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.responses import StreamingResponse
+
+from app.database import AsyncSessionLocal, run_write
+from app.schemas.ingest import row_schema
+from app.store import knowledge_store
+
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1000"))
+INGEST_MAX_LINE_BYTES = int(os.getenv("INGEST_MAX_LINE_BYTES", str(1024 * 1024)))
+
+
+class LineTooLong(ValueError):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = INGEST_MAX_LINE_BYTES):
+    """(line number, bytes) of every line of a byte stream, holding at most one line in memory"""
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line
+        if len(buffer) > max_line_bytes:
+            raise LineTooLong(f"line {number + 1} is longer than {max_line_bytes} bytes")
+    if buffer:
+        yield number + 1, buffer
+
+
+def validation_message(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in error['loc']) or 'row'}: {error['msg']}" for error in exc.errors()
+    )
+
+
+STAGING_PREFIX = "_ingest_"
+
+
+def staging_table(model) -> Table:
+    """A uniquely named copy of a table's columns, without constraints"""
+    name = f"{STAGING_PREFIX}{model.__tablename__}_{uuid.uuid4().hex[:8]}"
+    return Table(name, MetaData(), *(Column(column.name, column.type) for column in model.__table__.columns))
+
+
+def drop_leftover_staging(bind):
+    """
+    Drop staging tables left behind by ingests that never reached their
+    cleanup (process killed mid-upload). Called at startup, from init_db.
+    Staging tables are regular tables rather than TEMP ones because each batch
+    commits, and under the "basic" SQLite profile the next batch may run on
+    another pooled connection.
+    """
+    with bind.begin() as conn:
+        for name in inspect(conn).get_table_names():
+            if name.startswith(STAGING_PREFIX):
+                Table(name, MetaData()).drop(bind=conn)
+
+
+def _create_staging(db: Session, staging: Table):
+    staging.create(bind=db.connection())
+    db.commit()
+
+
+def _stage_batch(db: Session, staging: Table, rows: list):
+    db.execute(insert(staging), rows)
+    db.commit()
+
+
+def _drop_staging(db: Session, staging: Table):
+    staging.drop(bind=db.connection(), checkfirst=True)
+    db.commit()
+
+
+def _swap_in(db: Session, model, staging: Table, replace: bool, after_import):
+    """Move the staged rows into the table in one transaction, then refresh derived data"""
+    table = model.__table__
+    if replace:
+        db.execute(delete(table))
+    columns = [column.name for column in table.columns]
+    staged = select(*(staging.c[name] for name in columns)).order_by(literal_column("rowid"))
+    db.execute(insert(table).from_select(columns, staged))
+    staging.drop(bind=db.connection())
+    after_import(db)
+
+
+async def ingest_ndjson(model, chunks: AsyncIterator[bytes], after_import, mode: str = "replace",
+                        batch_size: int = INGEST_BATCH_SIZE, on_error: str = "skip"):
+    """
+    Ingest an NDJSON byte stream into a table; yields progress events:
+    {"event": "error", "line", "message"} per rejected line,
+    {"event": "progress", "lines", "staged", "errors"} per committed batch and a
+    final {"event": "done", ...} or {"event": "aborted", "reason", ...}.
+    after_import(db) refreshes derived data and commits; the snapshot is then
+    reloaded before the "done" event.
+    """
+    schema = row_schema(model)
+    staging = staging_table(model)
+    counts = {"lines": 0, "staged": 0, "errors": 0}
+    batch = []
+    reason: Optional[str] = None
+
+    async with AsyncSessionLocal() as db:
+        await run_write(db, _create_staging, staging)
+        try:
+            try:
+                async for number, line in iter_lines(chunks):
+                    if not line.strip():
+                        continue
+                    counts["lines"] += 1
+                    try:
+                        batch.append(schema.model_validate_json(line).model_dump())
+                    except ValidationError as exc:
+                        counts["errors"] += 1
+                        yield {"event": "error", "line": number, "message": validation_message(exc)}
+                        if on_error == "abort":
+                            reason = f"invalid line {number}"
+                            break
+                        continue
+                    if len(batch) >= batch_size:
+                        await run_write(db, _stage_batch, staging, batch)
+                        counts["staged"] += len(batch)
+                        batch = []
+                        yield {"event": "progress", **counts}
+            except LineTooLong as exc:
+                reason = str(exc)
+
+            if reason is None:
+                if batch:
+                    await run_write(db, _stage_batch, staging, batch)
+                    counts["staged"] += len(batch)
+                    yield {"event": "progress", **counts}
+                try:
+                    await run_write(db, _swap_in, model, staging, mode == "replace", after_import)
+                except IntegrityError as exc:
+                    await db.rollback()
+                    reason = f"constraint violation: {exc.orig}"
+                else:
+                    await knowledge_store.reload(db)
+        finally:
+            await run_write(db, _drop_staging, staging)
+
+    if reason is None:
+        yield {"event": "done", "table": model.__tablename__, "mode": mode, "imported": counts["staged"], **counts}
+    else:
+        yield {"event": "aborted", "table": model.__tablename__, "reason": reason, **counts}
+
+
+class IngestResponse(StreamingResponse):
+    """
+    Streams ingest events while the request body is still being read. The
+    body iterator consumes receive() itself, so unlike StreamingResponse this
+    does not also listen for disconnects on it.
+    """
+    media_type = "application/x-ndjson"
+
+    def __init__(self, events: AsyncIterator[dict]):
+        super().__init__(self._encode(events))
+
+    @staticmethod
+    async def _encode(events):
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
@@ -1,6 +1,35 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import ganzhi, nayin, shensha, guanxi, admin
+from fastapi.responses import PlainTextResponse
+from app import metrics, profiler
+from app.caching import ConditionalGetMiddleware
+from app.static_api import StaticSnapshotMiddleware
+from app import crud
+from app.database import SessionLocal, async_engine, init_db
+from app.store import knowledge_store
+from app.routers import ganzhi, nayin, shensha, guanxi, search, chart, calendar, graph, admin
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Migrate the schema, then load the in-memory knowledge snapshot (and the FTS
+    index) once at startup. Loading also records the data version, which the
+    ETag middleware reads from memory.
+    """
+    init_db()
+    db = SessionLocal()
+    try:
+        knowledge_store.load(db)
+        crud.search.ensure_search_index(db)
+    finally:
+        db.close()
+    yield
+    knowledge_store.clear()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="六十甲子象意百科查询系统 API",
@@ -9,6 +38,7 @@ app = FastAPI(
     openapi_url="/api/openapi.json",
     docs_url="/api/docs",
     redoc_url="/api/redoc",
+    lifespan=lifespan,
 )
 
 # Register routers
@@ -16,8 +46,20 @@ app.include_router(ganzhi.router)
 app.include_router(nayin.router)
 app.include_router(shensha.router)
 app.include_router(guanxi.router)
+app.include_router(search.router)
+app.include_router(chart.router)
+app.include_router(calendar.router)
+app.include_router(graph.router)
 app.include_router(admin.router)
 
+# ETag / 304 handling for the read API
+app.add_middleware(ConditionalGetMiddleware)
+
+# Serve pre-rendered responses (app/build_static.py) when configured
+STATIC_API_DIR = os.getenv("STATIC_API_DIR")
+if STATIC_API_DIR:
+    app.add_middleware(StaticSnapshotMiddleware, directory=STATIC_API_DIR)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -27,6 +69,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request SQL profiling (SQL_PROFILE=1, see /api/admin/profiler)
+if profiler.SQL_PROFILE:
+    profiler.instrument_engines()
+    app.add_middleware(profiler.SQLProfilerMiddleware)
+
+# Request / SQL metrics for /api/metrics (outermost, so every response counts)
+metrics.instrument_engines()
+app.add_middleware(metrics.MetricsMiddleware)
+
 
 @app.get("/")
 async def root():
@@ -36,3 +87,9 @@ async def root():
 @app.get("/api/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Runtime metrics in the Prometheus text format"""
+    return PlainTextResponse(await metrics.render(), media_type=metrics.CONTENT_TYPE)
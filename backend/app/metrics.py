@@ -0,0 +1,251 @@
+# Runtime metrics in the Prometheus text format
+#
+# MetricsMiddleware (outermost, so 304s and static responses are included)
+# records per-route request counts, latency, response size and in-flight
+# requests; SQL statements and time are attributed to the current request
+# through a context variable set by the middleware and updated by engine
+# events. Routes are labelled by their path template, never the raw path, to
+# keep the label cardinality fixed. No client library: the few instrument
+# types needed are implemented here.
+import bisect
+import contextvars
+import functools
+import time
+from typing import Optional, Sequence
+
+from sqlalchemy import event, func, select
+from starlette.routing import compile_path
+
+from app.caching import current_data_version
+from app.database import AsyncReadSessionLocal, async_engine, async_read_engine, engine
+from app.models import Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label set"""
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.values = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield self.name, _labels(self.labelnames, labels), value
+
+
+class Gauge(Counter):
+    """Value that goes up and down (or is set) per label set"""
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        self.values[labels] = value
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}
+
+    def observe(self, *labels, value: float):
+        counts, total = self.values.get(labels) or ([0] * (len(self.buckets) + 1), 0)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.values[labels] = (counts, total + value)
+
+    def samples(self):
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                yield f"{self.name}_bucket", _labels(self.labelnames, labels, f'le="{le}"'), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, labels), total
+            yield f"{self.name}_count", _labels(self.labelnames, labels), cumulative
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+LATENCY = Histogram(
+    "http_request_duration_seconds", "Time until the last response byte was sent", ("method", "route")
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body bytes (after compression)", ("method", "route"), SIZE_BUCKETS
+)
+IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being handled", ("method",))
+SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements executed per request", ("method", "route"), SQL_COUNT_BUCKETS
+)
+SQL_SECONDS = Histogram(
+    "http_request_sql_seconds", "Time spent executing SQL per request", ("method", "route")
+)
+TABLE_ROWS = Gauge("db_table_rows", "Rows per table at the current data version", ("table",))
+DATA_VERSION = Gauge("db_data_version", "Current data version")
+
+INSTRUMENTS = (REQUESTS, LATENCY, RESPONSE_SIZE, IN_PROGRESS, SQL_STATEMENTS, SQL_SECONDS, TABLE_ROWS, DATA_VERSION)
+
+
+# ==================== SQL per request ====================
+
+# [statements, seconds] of the request being handled, or None outside requests
+_request_sql: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_sql", default=None)
+
+
+# The start time lives on the statement's execution context, so a statement
+# that raises (no after_cursor_execute) leaves nothing behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_query_start", None)
+    totals = _request_sql.get()
+    if totals is not None and started is not None:
+        totals[0] += 1
+        totals[1] += time.perf_counter() - started
+
+
+def instrument_engines():
+    """Time the statements of the writer, async writer and reader engines"""
+    for target in {engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+        if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+            event.listen(target, "before_cursor_execute", _before_cursor_execute)
+            event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+# ==================== Table counts ====================
+
+COUNTED_TABLES = (Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi)
+
+_table_counts = (None, {})
+
+
+async def table_counts() -> dict:
+    """
+    Rows per table, counted once per data version: every write bumps the
+    version, so repeated calls (scrapes, /api/admin/stats) cost no queries.
+    """
+    global _table_counts
+    version = current_data_version()
+    cached_version, counts = _table_counts
+    if version is None or cached_version != version:
+        async with AsyncReadSessionLocal() as db:
+            counts = {
+                model.__tablename__: await db.scalar(select(func.count()).select_from(model))
+                for model in COUNTED_TABLES
+            }
+        _table_counts = (version, counts)
+    return dict(counts)
+
+
+async def render() -> str:
+    """Every instrument in the Prometheus text exposition format"""
+    version = current_data_version()
+    if version is not None:
+        DATA_VERSION.set(value=version)
+    for table, count in (await table_counts()).items():
+        TABLE_ROWS.set(table, value=count)
+
+    lines = []
+    for instrument in INSTRUMENTS:
+        lines.append(f"# HELP {instrument.name} {instrument.help}")
+        lines.append(f"# TYPE {instrument.name} {instrument.type}")
+        for name, labels, value in instrument.samples():
+            lines.append(f"{name}{labels} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ==================== Middleware ====================
+
+@functools.lru_cache(maxsize=None)
+def _route_patterns(app) -> tuple:
+    """(regex, template) of every documented route, in routing order"""
+    return tuple((compile_path(path)[0], path) for path in app.openapi()["paths"])
+
+
+def route_template(scope) -> str:
+    """
+    Path template of the route serving a request. Set by routing; responses
+    sent before routing (304s, static snapshots) are matched against the
+    OpenAPI paths instead.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "app" in scope:
+        for regex, template in _route_patterns(scope["app"]):
+            if regex.match(scope["path"]):
+                return template
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the request metrics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        started = time.perf_counter()
+        status = 500
+        size = 0
+        totals = [0, 0.0]
+        token = _request_sql.set(totals)
+        IN_PROGRESS.inc(method)
+
+        async def send_and_measure(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_measure)
+        finally:
+            _request_sql.reset(token)
+            IN_PROGRESS.dec(method)
+            route = route_template(scope)
+            REQUESTS.inc(method, route, str(status))
+            LATENCY.observe(method, route, value=time.perf_counter() - started)
+            RESPONSE_SIZE.observe(method, route, value=size)
+            SQL_STATEMENTS.observe(method, route, value=totals[0])
+            SQL_SECONDS.observe(method, route, value=totals[1])
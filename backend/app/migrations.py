@@ -0,0 +1,54 @@
+# Schema migrations
+#
+# create_all() only creates missing tables, so changes to existing tables
+# (new indexes, ...) are applied here. The schema version is kept in SQLite's
+# PRAGMA user_version; each migration runs once, in order, and the version is
+# bumped after its statements. Statements are idempotent (IF [NOT] EXISTS)
+# so a database freshly created from the current models migrates cleanly too.
+from collections import namedtuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+
+Migration = namedtuple("Migration", "version description statements")
+
+MIGRATIONS = (
+    Migration(1, "foreign key indexes, composite guanxi index", (
+        "CREATE INDEX IF NOT EXISTS ix_xiangyi_ganzhi_id ON xiangyi (ganzhi_id)",
+        "CREATE INDEX IF NOT EXISTS ix_xiji_ganzhi_id ON xiji (ganzhi_id)",
+        "CREATE INDEX IF NOT EXISTS ix_ganzhi_shensha_ganzhi_id ON ganzhi_shensha (ganzhi_id)",
+        "CREATE INDEX IF NOT EXISTS ix_ganzhi_shensha_shensha_id ON ganzhi_shensha (shensha_id)",
+        "CREATE INDEX IF NOT EXISTS ix_guanxi_pair_type ON guanxi (ganzhi1, ganzhi2, relation_type)",
+        # Prefix of ix_guanxi_pair_type
+        "DROP INDEX IF EXISTS ix_guanxi_ganzhi1",
+    )),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def schema_version(conn: Connection) -> int:
+    """PRAGMA user_version of the database (0 before any migration)"""
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def pending_migrations(conn: Connection) -> list:
+    version = schema_version(conn)
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+
+def migrate(engine: Engine) -> list:
+    """
+    Apply the pending migrations on the writer engine; returns the versions
+    applied. No ANALYZE: without sqlite_stat1 the planner assumes large tables,
+    so plans do not flip to scans while the bundled tables are still small.
+    """
+    applied = []
+    with engine.begin() as conn:
+        for migration in pending_migrations(conn):
+            for statement in migration.statements:
+                conn.execute(text(statement))
+            conn.exec_driver_sql(f"PRAGMA user_version = {migration.version}")
+            applied.append(migration.version)
+    return applied
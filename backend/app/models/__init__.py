@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database import Base
 
@@ -48,7 +48,7 @@ class Xiangyi(Base):
     __tablename__ = "xiangyi"
 
     id = Column(Integer, primary_key=True, index=True)
-    ganzhi_id = Column(Integer, ForeignKey("ganzhi.id"))
+    ganzhi_id = Column(Integer, ForeignKey("ganzhi.id"), index=True)
     type = Column(String(10))  # 核心、细分、组合
     category = Column(String(20))  # 天文气象、地理建筑、人物伦常、性情、身体、事物、植物、器物
     content = Column(String(100))
@@ -82,8 +82,8 @@ class GanzhiShensha(Base):
     __tablename__ = "ganzhi_shensha"
 
     id = Column(Integer, primary_key=True, index=True)
-    ganzhi_id = Column(Integer, ForeignKey("ganzhi.id"))
-    shensha_id = Column(Integer, ForeignKey("shensha.id"))
+    ganzhi_id = Column(Integer, ForeignKey("ganzhi.id"), index=True)
+    shensha_id = Column(Integer, ForeignKey("shensha.id"), index=True)
     is_zixing = Column(Boolean, default=False)
 
     # Relationships
@@ -96,7 +96,7 @@ class Xiji(Base):
     __tablename__ = "xiji"
 
     id = Column(Integer, primary_key=True, index=True)
-    ganzhi_id = Column(Integer, ForeignKey("ganzhi.id"))
+    ganzhi_id = Column(Integer, ForeignKey("ganzhi.id"), index=True)
     type = Column(String(4))  # 喜/忌
     target_type = Column(String(10))  # 五行、季节、地支
     target_value = Column(String(20))
@@ -109,9 +109,30 @@ class Xiji(Base):
 class Guanxi(Base):
     """干支关系表"""
     __tablename__ = "guanxi"
+    __table_args__ = (
+        # Natural key lookups (importer, pair queries); also serves ganzhi1 alone
+        Index("ix_guanxi_pair_type", "ganzhi1", "ganzhi2", "relation_type"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    ganzhi1 = Column(String(4), index=True)
+    ganzhi1 = Column(String(4))
     ganzhi2 = Column(String(4), index=True)
     relation_type = Column(String(20), index=True)  # 六合、三合、半合、六冲、六害、三刑、自刑、同位、隔八生子
     remark = Column(Text)
+
+
+class Meta(Base):
+    """Key/value metadata (data version, ...)"""
+    __tablename__ = "meta"
+
+    key = Column(String(50), primary_key=True)
+    value = Column(Text)
+
+
+class SourceHash(Base):
+    """Content hashes of the import sources (per file and per record)"""
+    __tablename__ = "source_hash"
+
+    scope = Column(String(20), primary_key=True)  # file、tiangan、dizhi、jiazi、shensha、edge
+    key = Column(String(200), primary_key=True)
+    hash = Column(String(64), nullable=False)
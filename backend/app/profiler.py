@@ -0,0 +1,180 @@
+# Per-request SQL profiler (opt-in)
+#
+# With SQL_PROFILE=1 every request records the statements it executes,
+# grouped by normalized SQL (literals and IN-lists folded). A statement shape
+# run N_PLUS_ONE_THRESHOLD or more times in one request is flagged as N+1, and
+# statements slower than SLOW_QUERY_MS are logged with their EXPLAIN QUERY
+# PLAN. The request's summary is returned in the X-SQL-Profile header
+# (statements run before the response starts; streamed bodies may add more) and
+# the recent profiles and slow queries are served by /api/admin/profiler.
+import contextvars
+import logging
+import os
+import re
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.database import async_engine, async_read_engine, engine
+
+
+SQL_PROFILE = os.getenv("SQL_PROFILE", "") not in ("", "0", "false")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+PROFILE_HISTORY = int(os.getenv("SQL_PROFILE_HISTORY", "100"))
+
+HEADER = "x-sql-profile"
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r"\bIN \((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """Statement shape: literals replaced by ?, IN-lists folded, whitespace collapsed"""
+    shape = STRING_LITERAL.sub("?", statement)
+    shape = NUMBER_LITERAL.sub("?", shape)
+    shape = WHITESPACE.sub(" ", shape).strip()
+    return IN_LIST.sub("IN (...)", shape)
+
+
+class RequestProfile:
+    """Statements of one request, grouped by shape"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.groups = {}  # shape -> [count, seconds]
+        self.statements = 0
+        self.seconds = 0.0
+
+    def record(self, statement: str, seconds: float):
+        group = self.groups.setdefault(normalize_sql(statement), [0, 0.0])
+        group[0] += 1
+        group[1] += seconds
+        self.statements += 1
+        self.seconds += seconds
+
+    @property
+    def n_plus_one(self) -> list:
+        return [shape for shape, (count, _) in self.groups.items() if count >= N_PLUS_ONE_THRESHOLD]
+
+    def header(self) -> str:
+        return (
+            f"statements={self.statements}; distinct={len(self.groups)}; "
+            f"time_ms={self.seconds * 1000:.2f}; n_plus_one={len(self.n_plus_one)}"
+        )
+
+    def summary(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "statements": self.statements,
+            "time_ms": round(self.seconds * 1000, 3),
+            "n_plus_one": self.n_plus_one,
+            "groups": [
+                {"sql": shape, "count": count, "time_ms": round(seconds * 1000, 3)}
+                for shape, (count, seconds) in sorted(self.groups.items(), key=lambda item: -item[1][1])
+            ],
+        }
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("sql_profile", default=None)
+
+recent_profiles = deque(maxlen=PROFILE_HISTORY)
+slow_queries = deque(maxlen=PROFILE_HISTORY)
+
+
+def explain_plan(conn, statement: str, parameters) -> list:
+    """EXPLAIN QUERY PLAN detail lines, on a raw cursor so the events do not fire again"""
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return []
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+    except Exception as exc:  # the plan is diagnostic only
+        return [f"EXPLAIN failed: {exc}"]
+    finally:
+        cursor.close()
+
+
+# The start time is kept on the statement's execution context rather than the
+# connection, so statements that raise leave no stale entry behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._profile_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = getattr(context, "_profile_query_start", None)
+    if profile is None or started is None:
+        return
+    seconds = time.perf_counter() - started
+    profile.record(statement, seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        plan = [] if executemany else explain_plan(conn, statement, parameters)
+        slow_queries.append({
+            "path": profile.path,
+            "sql": normalize_sql(statement),
+            "time_ms": round(seconds * 1000, 3),
+            "plan": plan,
+        })
+        logger.warning("slow query (%.1f ms) on %s: %s\n  %s", seconds * 1000, profile.path,
+                       normalize_sql(statement), "\n  ".join(plan))
+
+
+def instrument_engines():
+    """Profile the statements of the writer, async writer and reader engines"""
+    for target in {engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+        if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+            event.listen(target, "before_cursor_execute", _before_cursor_execute)
+            event.listen(target, "after_cursor_execute", _after_cursor_execute)
+
+
+def report() -> dict:
+    """Recent request profiles (newest first) and slow queries"""
+    return {
+        "enabled": SQL_PROFILE,
+        "slow_query_ms": SLOW_QUERY_MS,
+        "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD,
+        "requests": [profile.summary() for profile in reversed(recent_profiles)],
+        "slow_queries": list(reversed(slow_queries)),
+    }
+
+
+class SQLProfilerMiddleware:
+    """ASGI middleware profiling the SQL of each request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _current.set(profile)
+
+        async def send_with_summary(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", [])) + [(HEADER.encode(), profile.header().encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_summary)
+        finally:
+            _current.reset(token)
+            if profile.statements:
+                recent_profiles.append(profile)
+            for shape in profile.n_plus_one:
+                logger.warning("possible N+1 on %s %s: %d x %s", profile.method, profile.path,
+                               profile.groups[shape][0], shape)
@@ -0,0 +1,146 @@
+# Ganzhi relation matrix
+#
+# A dense 60×60 matrix keyed by position in the sexagenary cycle. Each cell
+# holds a bitmask of relation types between the two Ganzhi: the rule-derived
+# dizhi relations (六合、六冲、六害、半合、三刑、自刑), 同天干/同地支, and every
+# relation stored in the guanxi table (同位、隔八生子, ...).
+from types import MappingProxyType
+from typing import List, Optional
+
+from app.import_data import TIAN_GAN, DI_ZHI
+
+
+# Sexagenary cycle order: position i pairs TIAN_GAN[i % 10] with DI_ZHI[i % 12]
+CYCLE = tuple(TIAN_GAN[i % 10] + DI_ZHI[i % 12] for i in range(60))
+CYCLE_INDEX = MappingProxyType({name: i for i, name in enumerate(CYCLE)})
+
+# Relation types with fixed bit positions; other types found in the guanxi
+# table are assigned the following bits in order of first appearance.
+RELATION_TYPES = ("同天干", "同地支", "六合", "六冲", "六害", "半合", "三刑", "自刑", "同位", "隔八生子")
+
+# Dizhi groups, by index into DI_ZHI (子=0 ... 亥=11)
+SAN_XING_GROUPS = ({2, 5, 8}, {1, 7, 10}, {0, 3})  # 寅巳申、丑未戌、子卯
+ZI_XING = {4, 6, 9, 11}  # 辰、午、酉、亥
+
+
+def _dizhi_relations(a: int, b: int) -> List[str]:
+    """Rule-derived relations between two different dizhi indexes"""
+    found = []
+    if (a + b) % 12 == 1:
+        found.append("六合")
+    if abs(a - b) == 6:
+        found.append("六冲")
+    if (a + b) % 12 == 7:
+        found.append("六害")
+    if a % 4 == b % 4:
+        # Two members of the same 三合 frame (申子辰、亥卯未、寅午戌、巳酉丑)
+        found.append("半合")
+    if any(a in group and b in group for group in SAN_XING_GROUPS):
+        found.append("三刑")
+    return found
+
+
+def derive_relations(i: int, j: int) -> List[str]:
+    """Relation types implied by the rules for cycle positions i != j"""
+    found = []
+    if i % 10 == j % 10:
+        found.append("同天干")
+    a, b = i % 12, j % 12
+    if a == b:
+        found.append("同地支")
+        if a in ZI_XING:
+            found.append("自刑")
+    else:
+        found.extend(_dizhi_relations(a, b))
+    return found
+
+
+def relation_type_order(row_types) -> tuple:
+    """RELATION_TYPES, then the other types of guanxi rows in order of first appearance"""
+    types = list(RELATION_TYPES)
+    for relation_type in row_types:
+        if relation_type and relation_type not in types:
+            types.append(relation_type)
+    return tuple(types)
+
+
+def cell_relations(i: int, j: int, stored_rows) -> List[dict]:
+    """
+    Every relation between cycle positions i <= j: the stored rows of the
+    pair (in id order) first, then rule-derived types not already covered
+    """
+    relations = [dict(row) for row in stored_rows]
+    seen = {row["relation_type"] for row in stored_rows}
+    if i != j:
+        for t in derive_relations(i, j):
+            if t not in seen:
+                relations.append({
+                    "id": None,
+                    "ganzhi1": CYCLE[i],
+                    "ganzhi2": CYCLE[j],
+                    "relation_type": t,
+                    "remark": f"{CYCLE[i][1]}{CYCLE[j][1]}{t}" if t not in ("同天干", "同地支") else ""
+                })
+    return relations
+
+
+class RelationMatrix:
+    """60×60 relation bitmasks plus the per-Ganzhi and per-type listings"""
+
+    def __init__(self, guanxi_rows):
+        self.types = relation_type_order(row["relation_type"] for row in guanxi_rows)
+        self.bits = MappingProxyType({t: 1 << k for k, t in enumerate(self.types)})
+        self.masks = [0] * (60 * 60)
+
+        # Stored rows by unordered cell, in id order
+        stored = {}
+        for row in guanxi_rows:
+            i, j = CYCLE_INDEX.get(row["ganzhi1"]), CYCLE_INDEX.get(row["ganzhi2"])
+            if i is None or j is None:
+                continue
+            stored.setdefault((min(i, j), max(i, j)), []).append(row)
+
+        # Every relation per unordered cell: stored rows first, then rule-derived
+        # types not already covered by a stored row
+        cells = {}
+        for i in range(60):
+            for j in range(i, 60):
+                relations = cell_relations(i, j, stored.get((i, j), []))
+                if not relations:
+                    continue
+                mask = 0
+                for rel in relations:
+                    mask |= self.bits.get(rel["relation_type"], 0)
+                self.masks[i * 60 + j] = self.masks[j * 60 + i] = mask
+                cells[(i, j)] = tuple(relations)
+        self._cells = cells
+
+        by_ganzhi = {name: [] for name in CYCLE}
+        by_type = {t: [] for t in self.types}
+        for (i, j), relations in sorted(cells.items()):
+            for rel in relations:
+                by_type.setdefault(rel["relation_type"], []).append(rel)
+        for i in range(60):
+            for j in range(60):
+                for rel in cells.get((min(i, j), max(i, j)), ()):
+                    by_ganzhi[CYCLE[i]].append({**rel, "other_ganzhi": CYCLE[j]})
+        self.by_ganzhi = MappingProxyType({k: tuple(v) for k, v in by_ganzhi.items()})
+        self.by_type = MappingProxyType({k: tuple(v) for k, v in by_type.items() if v})
+
+    def mask(self, ganzhi1: str, ganzhi2: str) -> Optional[int]:
+        """Relation bitmask between two Ganzhi, or None if either name is unknown"""
+        i, j = CYCLE_INDEX.get(ganzhi1), CYCLE_INDEX.get(ganzhi2)
+        if i is None or j is None:
+            return None
+        return self.masks[i * 60 + j]
+
+    def relations(self, ganzhi1: str, ganzhi2: str) -> tuple:
+        """All relations between two Ganzhi, stored rows first"""
+        i, j = CYCLE_INDEX.get(ganzhi1), CYCLE_INDEX.get(ganzhi2)
+        if i is None or j is None:
+            return ()
+        return self._cells.get((min(i, j), max(i, j)), ())
+
+    def decode(self, mask: int) -> List[str]:
+        """Relation type names set in a mask"""
+        return [t for t in self.types if mask & self.bits[t]]
@@ -1,52 +1,69 @@
 # Admin API Router
 # Provides CRUD operations for all entities and import/export functionality
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-import json
-import io
+from typing import List, Optional
 
-from app.database import get_db
+from app.database import get_async_db, run_write
+from app import columnar, crud, export, ingest, metrics, profiler
 from app.models import Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi
+from app.data_version import bump_data_version
+from app.import_diff import clear_source_hashes
+from app.store import knowledge_store
 
 router = APIRouter(prefix="/api/admin", tags=["管理"])
 
 
+def _after_import(db: Session):
+    """
+    Refresh the data derived from the tables in the database after an import;
+    the caller then reloads the snapshot with knowledge_store.reload, off the
+    event loop.
+    """
+    crud.search.rebuild_search_index(db)
+    bump_data_version(db)
+    clear_source_hashes(db)  # the tables no longer match the source files
+    db.commit()
+
+
+def _replace_table(db: Session, model, rows: list):
+    """Replace every row of a table and refresh derived data, in one transaction"""
+    db.execute(delete(model))
+    db.add_all(rows)
+    db.flush()
+    _after_import(db)
+
+
 # ==================== Statistics ====================
 
 @router.get("/stats")
-def get_database_stats(db: Session = Depends(get_db)):
+async def get_database_stats():
     """
-    Get database statistics.
+    Get database statistics (row counts, cached per data version).
     """
-    return {
-        "ganzhi_count": db.query(Ganzhi).count(),
-        "nayin_count": db.query(Nayin).count(),
-        "xiangyi_count": db.query(Xiangyi).count(),
-        "shensha_count": db.query(Shensha).count(),
-        "ganzhi_shensha_count": db.query(GanzhiShensha).count(),
-        "xiji_count": db.query(Xiji).count(),
-        "guanxi_count": db.query(Guanxi).count(),
-    }
+    return {f"{table}_count": count for table, count in (await metrics.table_counts()).items()}
 
 
 # ==================== Ganzhi CRUD ====================
 
 @router.get("/ganzhi")
-def get_all_ganzhi_admin(
+async def get_all_ganzhi_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all Ganzhi (admin)"""
-    return db.query(Ganzhi).offset(skip).limit(limit).all()
+    return (await db.scalars(select(Ganzhi).offset(skip).limit(limit))).all()
 
 
 @router.get("/ganzhi/{ganzhi_name}")
-def get_ganzhi_admin(ganzhi_name: str, db: Session = Depends(get_db)):
+async def get_ganzhi_admin(ganzhi_name: str, db: AsyncSession = Depends(get_async_db)):
     """Get single Ganzhi (admin)"""
-    g = db.query(Ganzhi).filter(Ganzhi.ganzhi == ganzhi_name).first()
+    g = await db.scalar(select(Ganzhi).where(Ganzhi.ganzhi == ganzhi_name))
     if not g:
         raise HTTPException(status_code=404, detail="Ganzhi not found")
     return g
@@ -55,265 +72,155 @@ def get_ganzhi_admin(ganzhi_name: str, db: Session = Depends(get_db)):
 # ==================== Nayin CRUD ====================
 
 @router.get("/nayin")
-def get_all_nayin_admin(
+async def get_all_nayin_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all Nayin (admin)"""
-    return db.query(Nayin).offset(skip).limit(limit).all()
+    return (await db.scalars(select(Nayin).offset(skip).limit(limit))).all()
 
 
 # ==================== Xiangyi CRUD ====================
 
 @router.get("/xiangyi")
-def get_all_xiangyi_admin(
+async def get_all_xiangyi_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all Xiangyi (admin)"""
-    return db.query(Xiangyi).offset(skip).limit(limit).all()
+    return (await db.scalars(select(Xiangyi).offset(skip).limit(limit))).all()
 
 
 # ==================== Shensha CRUD ====================
 
 @router.get("/shensha")
-def get_all_shensha_admin(
+async def get_all_shensha_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all Shensha (admin)"""
-    return db.query(Shensha).offset(skip).limit(limit).all()
+    return (await db.scalars(select(Shensha).offset(skip).limit(limit))).all()
 
 
 @router.get("/ganzhi-shensha")
-def get_all_ganzhi_shensha_admin(
+async def get_all_ganzhi_shensha_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all Ganzhi-Shensha relationships (admin)"""
-    return db.query(GanzhiShensha).offset(skip).limit(limit).all()
+    return (await db.scalars(select(GanzhiShensha).offset(skip).limit(limit))).all()
 
 
 # ==================== Xiji CRUD ====================
 
 @router.get("/xiji")
-def get_all_xiji_admin(
+async def get_all_xiji_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all Xiji (admin)"""
-    return db.query(Xiji).offset(skip).limit(limit).all()
+    return (await db.scalars(select(Xiji).offset(skip).limit(limit))).all()
 
 
 # ==================== Guanxi CRUD ====================
 
 @router.get("/guanxi")
-def get_all_guanxi_admin(
+async def get_all_guanxi_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all Guanxi (admin)"""
-    return db.query(Guanxi).offset(skip).limit(limit).all()
+    return (await db.scalars(select(Guanxi).offset(skip).limit(limit))).all()
 
 
 # ==================== Export ====================
 
-@router.get("/export/ganzhi")
-def export_ganzhi(db: Session = Depends(get_db)):
-    """Export all Ganzhi as JSON"""
-    data = db.query(Ganzhi).all()
-    result = []
-    for g in data:
-        result.append({
-            "id": g.id,
-            "tiangan": g.tiangan,
-            "dizhi": g.dizhi,
-            "ganzhi": g.ganzhi,
-            "tiangan_wuxing": g.tiangan_wuxing,
-            "dizhi_wuxing": g.dizhi_wuxing,
-            "yinyang": g.yinyang,
-            "fangwei": g.fangwei,
-            "jijie": g.jijie,
-            "tiangan_yuanshiming": g.tiangan_yuanshiming,
-            "dizhi_yuanshiming": g.dizhi_yuanshiming,
-            "special_desc": g.special_desc,
-        })
-
-    json_str = json.dumps(result, ensure_ascii=False, indent=2)
-    return StreamingResponse(
-        io.BytesIO(json_str.encode("utf-8")),
-        media_type="application/json",
-        headers={"Content-Disposition": "attachment; filename=ganzhi.json"}
-    )
-
-
-@router.get("/export/nayin")
-def export_nayin(db: Session = Depends(get_db)):
-    """Export all Nayin as JSON"""
-    data = db.query(Nayin).all()
-    result = []
-    for n in data:
-        result.append({
-            "id": n.id,
-            "ganzhi_id": n.ganzhi_id,
-            "nayin_name": n.nayin_name,
-            "nayin_wuxing": n.nayin_wuxing,
-            "zhuangtai": n.zhuangtai,
-            "shengda_xiaoruo": n.shengda_xiaoruo,
-            "zhuangtai_desc": n.zhuangtai_desc,
-        })
-
-    json_str = json.dumps(result, ensure_ascii=False, indent=2)
-    return StreamingResponse(
-        io.BytesIO(json_str.encode("utf-8")),
-        media_type="application/json",
-        headers={"Content-Disposition": "attachment; filename=nayin.json"}
-    )
-
-
-@router.get("/export/xiangyi")
-def export_xiangyi(db: Session = Depends(get_db)):
-    """Export all Xiangyi as JSON"""
-    data = db.query(Xiangyi).all()
-    result = []
-    for x in data:
-        result.append({
-            "id": x.id,
-            "ganzhi_id": x.ganzhi_id,
-            "type": x.type,
-            "category": x.category,
-            "content": x.content,
-            "description": x.description,
-            "source": x.source,
-            "confidence": x.confidence,
-        })
-
-    json_str = json.dumps(result, ensure_ascii=False, indent=2)
-    return StreamingResponse(
-        io.BytesIO(json_str.encode("utf-8")),
-        media_type="application/json",
-        headers={"Content-Disposition": "attachment; filename=xiangyi.json"}
-    )
-
-
-@router.get("/export/shensha")
-def export_shensha(db: Session = Depends(get_db)):
-    """Export all Shensha as JSON"""
-    data = db.query(Shensha).all()
-    result = []
-    for s in data:
-        result.append({
-            "id": s.id,
-            "name": s.name,
-            "type": s.type,
-            "check_method": s.check_method,
-            "jixiong": s.jixiong,
-            "yuanwen": s.yuanwen,
-            "modern_desc": s.modern_desc,
-            "remark": s.remark,
-        })
-
-    json_str = json.dumps(result, ensure_ascii=False, indent=2)
-    return StreamingResponse(
-        io.BytesIO(json_str.encode("utf-8")),
-        media_type="application/json",
-        headers={"Content-Disposition": "attachment; filename=shensha.json"}
-    )
+# Columns of each table in /export/all
+EXPORT_ALL_COLUMNS = {
+    "ganzhi": ("id", "tiangan", "dizhi", "ganzhi", "tiangan_wuxing", "dizhi_wuxing", "yinyang", "fangwei", "jijie"),
+    "nayin": ("id", "ganzhi_id", "nayin_name", "nayin_wuxing", "zhuangtai", "shengda_xiaoruo"),
+    "xiangyi": ("id", "ganzhi_id", "type", "category", "content", "description"),
+    "shensha": ("id", "name", "type", "jixiong"),
+    "ganzhi_shensha": ("id", "ganzhi_id", "shensha_id", "is_zixing"),
+    "xiji": ("id", "ganzhi_id", "type", "target_type", "target_value", "remark"),
+    "guanxi": ("id", "ganzhi1", "ganzhi2", "relation_type", "remark"),
+}
 
 
 @router.get("/export/all")
-def export_all(db: Session = Depends(get_db)):
-    """Export all data as JSON"""
-    data = {
-        "ganzhi": [],
-        "nayin": [],
-        "xiangyi": [],
-        "shensha": [],
-        "ganzhi_shensha": [],
-        "xiji": [],
-        "guanxi": [],
-    }
-
-    # Export Ganzhi
-    for g in db.query(Ganzhi).all():
-        data["ganzhi"].append({
-            "id": g.id,
-            "tiangan": g.tiangan,
-            "dizhi": g.dizhi,
-            "ganzhi": g.ganzhi,
-            "tiangan_wuxing": g.tiangan_wuxing,
-            "dizhi_wuxing": g.dizhi_wuxing,
-            "yinyang": g.yinyang,
-            "fangwei": g.fangwei,
-            "jijie": g.jijie,
-        })
-
-    # Export Nayin
-    for n in db.query(Nayin).all():
-        data["nayin"].append({
-            "id": n.id,
-            "ganzhi_id": n.ganzhi_id,
-            "nayin_name": n.nayin_name,
-            "nayin_wuxing": n.nayin_wuxing,
-            "zhuangtai": n.zhuangtai,
-            "shengda_xiaoruo": n.shengda_xiaoruo,
-        })
-
-    # Export Xiangyi
-    for x in db.query(Xiangyi).all():
-        data["xiangyi"].append({
-            "id": x.id,
-            "ganzhi_id": x.ganzhi_id,
-            "type": x.type,
-            "category": x.category,
-            "content": x.content,
-            "description": x.description,
-        })
-
-    # Export Shensha
-    for s in db.query(Shensha).all():
-        data["shensha"].append({
-            "id": s.id,
-            "name": s.name,
-            "type": s.type,
-            "jixiong": s.jixiong,
-        })
-
-    # Export Guanxi
-    for g in db.query(Guanxi).all():
-        data["guanxi"].append({
-            "id": g.id,
-            "ganzhi1": g.ganzhi1,
-            "ganzhi2": g.ganzhi2,
-            "relation_type": g.relation_type,
-            "remark": g.remark,
-        })
-
-    json_str = json.dumps(data, ensure_ascii=False, indent=2)
-    return StreamingResponse(
-        io.BytesIO(json_str.encode("utf-8")),
-        media_type="application/json",
-        headers={"Content-Disposition": "attachment; filename=liushijiazi_all.json"}
-    )
+async def export_all(
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    gzip: bool = Query(False),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """Export all data as JSON ({table: [rows]}) or NDJSON ({"table", "row"} per line), streamed"""
+    if format == "ndjson":
+        async def chunks():
+            for name, columns in EXPORT_ALL_COLUMNS.items():
+                async for chunk in export.ndjson_chunks(export.iter_batches(export.EXPORT_TABLES[name], columns), name):
+                    yield chunk
+    else:
+        def chunks():
+            return export.json_object_chunks({
+                name: export.iter_batches(export.EXPORT_TABLES[name], columns)
+                for name, columns in EXPORT_ALL_COLUMNS.items()
+            })
+    return export.export_response(chunks(), "liushijiazi_all", format, gzip, accept_encoding)
+
+
+@router.get("/export/{table}")
+async def export_table(
+    table: str,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    gzip: bool = Query(False),
+    accept_encoding: Optional[str] = Header(None)
+):
+    """Export every row of a table as a JSON array or NDJSON, streamed"""
+    model = export.EXPORT_TABLES.get(table)
+    if model is None:
+        raise HTTPException(status_code=404, detail="Table not found")
+    batches = export.iter_batches(model)
+    chunks = export.ndjson_chunks(batches) if format == "ndjson" else export.json_array_chunks(batches)
+    return export.export_response(chunks, table, format, gzip, accept_encoding)
+
+
+# ==================== Columnar export ====================
+
+@router.get("/columnar")
+async def columnar_formats():
+    """Tables and formats available as columnar downloads"""
+    return {"tables": list(export.EXPORT_TABLES), "formats": list(columnar.available_formats())}
+
+
+@router.get("/columnar/{filename}")
+async def columnar_export(filename: str):
+    """
+    Download a table as {table}.csv.gz, {table}.arrow or {table}.parquet
+    (Arrow and Parquet need pyarrow), cached per data version.
+    """
+    parsed = columnar.parse_filename(filename)
+    if parsed is None or parsed[0] not in export.EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail="Table not found")
+    table, fmt = parsed
+    if fmt not in columnar.available_formats():
+        raise HTTPException(status_code=501, detail=f"{fmt} export requires pyarrow")
+    path = await run_in_threadpool(columnar.cached_export, table, fmt)
+    return FileResponse(path, media_type=columnar.MEDIA_TYPES[fmt], filename=filename)
 
 
 # ==================== Import ====================
 
 @router.post("/import/ganzhi")
-def import_ganzhi(data: List[dict], db: Session = Depends(get_db)):
+async def import_ganzhi(data: List[dict], db: AsyncSession = Depends(get_async_db)):
     """Import Ganzhi data (replace all)"""
-    # Clear existing
-    db.query(Ganzhi).delete()
-
-    # Insert new
-    for item in data:
-        g = Ganzhi(
+    rows = [
+        Ganzhi(
             tiangan=item.get("tiangan", ""),
             dizhi=item.get("dizhi", ""),
             ganzhi=item.get("ganzhi", ""),
@@ -326,19 +233,18 @@ def import_ganzhi(data: List[dict], db: Session = Depends(get_db)):
             dizhi_yuanshiming=item.get("dizhi_yuanshiming", ""),
             special_desc=item.get("special_desc", ""),
         )
-        db.add(g)
-
-    db.commit()
+        for item in data
+    ]
+    await run_write(db, _replace_table, Ganzhi, rows)
+    await knowledge_store.reload(db)
     return {"imported": len(data), "table": "ganzhi"}
 
 
 @router.post("/import/nayin")
-def import_nayin(data: List[dict], db: Session = Depends(get_db)):
+async def import_nayin(data: List[dict], db: AsyncSession = Depends(get_async_db)):
     """Import Nayin data (replace all)"""
-    db.query(Nayin).delete()
-
-    for item in data:
-        n = Nayin(
+    rows = [
+        Nayin(
             ganzhi_id=item.get("ganzhi_id", 1),
             nayin_name=item.get("nayin_name", ""),
             nayin_wuxing=item.get("nayin_wuxing", ""),
@@ -346,15 +252,57 @@ def import_nayin(data: List[dict], db: Session = Depends(get_db)):
             shengda_xiaoruo=item.get("shengda_xiaoruo", ""),
             zhuangtai_desc=item.get("zhuangtai_desc", ""),
         )
-        db.add(n)
-
-    db.commit()
+        for item in data
+    ]
+    await run_write(db, _replace_table, Nayin, rows)
+    await knowledge_store.reload(db)
     return {"imported": len(data), "table": "nayin"}
 
 
+# ==================== NDJSON ingest ====================
+
+@router.post("/ingest/{table}")
+async def ingest_table(
+    table: str,
+    request: Request,
+    mode: str = Query("replace", pattern="^(replace|append)$"),
+    batch_size: int = Query(ingest.INGEST_BATCH_SIZE, ge=1, le=50000),
+    on_error: str = Query("skip", pattern="^(skip|abort)$")
+):
+    """
+    Stream an NDJSON body (one row per line) into a table, replacing or
+    appending to it. Responds with NDJSON events: one per rejected line, one
+    per committed batch and a final "done" or "aborted".
+    """
+    model = export.EXPORT_TABLES.get(table)
+    if model is None:
+        raise HTTPException(status_code=404, detail="Table not found")
+    events = ingest.ingest_ndjson(model, request.stream(), _after_import, mode, batch_size, on_error)
+    return ingest.IngestResponse(events)
+
+
+# ==================== SQL Profiler ====================
+
+@router.get("/profiler")
+async def get_sql_profile():
+    """
+    Recent per-request SQL profiles (statements grouped by shape, N+1
+    candidates) and slow queries with their plans. Requires SQL_PROFILE=1.
+    """
+    return profiler.report()
+
+
+@router.delete("/profiler")
+async def clear_sql_profile():
+    """Forget the recorded profiles and slow queries"""
+    profiler.recent_profiles.clear()
+    profiler.slow_queries.clear()
+    return {"status": "cleared"}
+
+
 # ==================== Health Check ====================
 
 @router.get("/health")
-def admin_health_check():
+async def admin_health_check():
     """Admin API health check"""
     return {"status": "healthy", "service": "admin-api"}
@@ -0,0 +1,66 @@
+# Calendar API Router
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+import numpy as np
+
+from app import sexagenary
+from app.schemas.calendar import CalendarPillars, CalendarBulkRequest, CalendarBulkResponse
+
+router = APIRouter(prefix="/api/calendar", tags=["历法"])
+
+MAX_BULK_TIMESTAMPS = 100000
+
+
+def _convert(timestamps: np.ndarray, utc_offset: int) -> dict:
+    names = sexagenary.pillar_names(sexagenary.pillars(timestamps, utc_offset))
+    return {
+        "count": len(timestamps),
+        "datetimes": np.datetime_as_string(timestamps, unit="m").tolist(),
+        **{pillar: values.tolist() for pillar, values in names.items()},
+    }
+
+
+@router.get("/pillars", response_model=CalendarPillars)
+async def get_pillars(
+    at: datetime = Query(..., alias="datetime", description="Date and time, e.g. 2024-02-04T17:30"),
+    utc_offset: int = Query(480, ge=-720, le=840, description="Minutes east of UTC of a naive datetime"),
+):
+    """
+    Get the year, month, day and hour pillars of a date and time.
+    Year and month change at 立春 and the other 节 solar terms, the day at 23:00.
+    Example: /api/calendar/pillars?datetime=2008-08-08T20:00
+    """
+    result = _convert(sexagenary.local_timestamps([at], utc_offset), utc_offset)
+    return {
+        "datetime": result["datetimes"][0],
+        **{pillar: result[pillar][0] for pillar in ("year", "month", "day", "hour")},
+    }
+
+
+@router.post("/pillars/bulk", response_model=CalendarBulkResponse)
+async def get_pillars_bulk(request: CalendarBulkRequest):
+    """
+    Get the four pillars of many timestamps in one vectorized conversion.
+
+    Request body (either datetimes, or start and end):
+    - datetimes: List of dates and times
+    - start, end, step_minutes: every step_minutes from start up to end
+    - utc_offset: minutes east of UTC of naive datetimes (default 480)
+    """
+    if (request.datetimes is None) == (request.start is None or request.end is None):
+        raise HTTPException(status_code=400, detail="Give either datetimes or start and end")
+
+    if request.datetimes is not None:
+        if len(request.datetimes) > MAX_BULK_TIMESTAMPS:
+            raise HTTPException(status_code=400, detail=f"Maximum {MAX_BULK_TIMESTAMPS} timestamps per request")
+        timestamps = sexagenary.local_timestamps(request.datetimes, request.utc_offset)
+    else:
+        start, end = sexagenary.local_timestamps([request.start, request.end], request.utc_offset)
+        try:
+            timestamps = sexagenary.date_range(start, end, request.step_minutes, limit=MAX_BULK_TIMESTAMPS)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    return await run_in_threadpool(_convert, timestamps, request.utc_offset)
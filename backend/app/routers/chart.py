@@ -0,0 +1,55 @@
+# Chart Analysis API Router
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_read_db
+from app import crud
+from app.schemas.chart import (
+    ChartRequest,
+    ChartAnalysis,
+    ChartBulkRequest,
+    ChartBulkResponse
+)
+
+router = APIRouter(prefix="/api/chart", tags=["命盘"])
+
+MAX_BULK_CHARTS = 10000
+
+
+@router.post("/analyze", response_model=ChartAnalysis)
+async def analyze_chart(request: ChartRequest, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Analyse a four-pillar chart.
+
+    Returns each pillar's nayin and shensha, the relations between every two
+    pillars, and the xiji entries of each pillar that another pillar
+    satisfies (matched_by).
+
+    Request body:
+    - year, month, day, hour: Ganzhi of the four pillars
+    """
+    result = await crud.aio.chart.analyze_chart(db, [request.year, request.month, request.day, request.hour])
+    if result["unknown"]:
+        raise HTTPException(status_code=404, detail=f"Ganzhi not found: {', '.join(result['unknown'])}")
+    return result
+
+
+@router.post("/analyze/bulk", response_model=ChartBulkResponse)
+async def analyze_charts(request: ChartBulkRequest, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Analyse many charts in one call, in integer form.
+
+    Each item holds the sixty-cycle positions of the pillars, the relation
+    mask of each pillar pair and the xiji hits as [pillar, xiji id, matched by
+    pillar]; the legend maps those integers to names once per response.
+
+    Request body:
+    - charts: List of [year, month, day, hour] Ganzhi
+    """
+    if len(request.charts) > MAX_BULK_CHARTS:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_BULK_CHARTS} charts per request")
+
+    result = await crud.aio.chart.analyze_charts(db, request.charts)
+    if result["unknown"]:
+        raise HTTPException(status_code=404, detail=f"Ganzhi not found: {', '.join(result['unknown'])}")
+    return result
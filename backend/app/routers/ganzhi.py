@@ -1,58 +1,62 @@
 # Ganzhi API Router
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.database import get_db
+from app.database import get_async_read_db
 from app import crud
 from app.schemas.ganzhi import (
     GanzhiBasic,
     GanzhiWithDetails,
     SearchResponse,
     CompareRequest,
-    CompareResponse
+    CompareResponse,
+    BatchRequest,
+    BatchResponse
 )
 
 router = APIRouter(prefix="/api/ganzhi", tags=["干支"])
 
+MAX_BATCH_SIZE = 60
+
 
 @router.get("", response_model=List[GanzhiBasic])
-def get_ganzhi_list(
+async def get_ganzhi_list(
     skip: int = Query(0, ge=0, description="Offset for pagination"),
     limit: int = Query(60, ge=1, le=60, description="Limit number of results"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get list of all 60 Ganzhi.
     """
-    return crud.ganzhi.get_ganzhi_list(db, skip=skip, limit=limit)
+    return await crud.aio.ganzhi.get_ganzhi_list(db, skip=skip, limit=limit)
 
 
 @router.get("/search", response_model=SearchResponse)
-def search_ganzhi(
+async def search_ganzhi(
     q: str = Query(..., min_length=1, description="Search query"),
     skip: int = Query(0, ge=0, description="Offset for pagination"),
     limit: int = Query(20, ge=1, le=60, description="Limit number of results"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Search Ganzhi by query string.
     Supports fuzzy search by ganzhi name, tiangan, or dizhi.
     """
-    total, items = crud.ganzhi.search_ganzhi(db, query=q, skip=skip, limit=limit)
+    total, items = await crud.aio.ganzhi.search_ganzhi(db, query=q, skip=skip, limit=limit)
     return {"total": total, "items": items}
 
 
 @router.get("/names", response_model=List[str])
-def get_ganzhi_names(db: Session = Depends(get_db)):
+async def get_ganzhi_names(db: AsyncSession = Depends(get_async_read_db)):
     """
     Get all Ganzhi names (for autocomplete).
     """
-    return crud.ganzhi.get_all_ganzhi_names(db)
+    return await crud.aio.ganzhi.get_all_ganzhi_names(db)
 
 
 @router.get("/{ganzhi_name}", response_model=GanzhiWithDetails)
-def get_ganzhi_detail(ganzhi_name: str, db: Session = Depends(get_db)):
+async def get_ganzhi_detail(ganzhi_name: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Get detailed information for a specific Ganzhi.
 
@@ -64,14 +68,14 @@ def get_ganzhi_detail(ganzhi_name: str, db: Session = Depends(get_db)):
     - Xiji (喜忌) list
     - Guanxi (关系) list
     """
-    result = crud.ganzhi.get_ganzhi_with_details(db, ganzhi_name)
+    result = await crud.aio.ganzhi.get_ganzhi_with_details(db, ganzhi_name)
     if not result:
         raise HTTPException(status_code=404, detail=f"Ganzhi '{ganzhi_name}' not found")
     return result
 
 
 @router.post("/compare", response_model=CompareResponse)
-def compare_ganzhi(request: CompareRequest, db: Session = Depends(get_db)):
+async def compare_ganzhi(request: CompareRequest, db: AsyncSession = Depends(get_async_read_db)):
     """
     Compare multiple Ganzhi (2-4 items).
 
@@ -84,7 +88,7 @@ def compare_ganzhi(request: CompareRequest, db: Session = Depends(get_db)):
     if len(request.ganzhi_list) > 4:
         raise HTTPException(status_code=400, detail="Maximum 4 Ganzhi can be compared at once")
 
-    results = crud.ganzhi.compare_ganzhi(db, request.ganzhi_list)
+    results = await crud.aio.ganzhi.compare_ganzhi(db, request.ganzhi_list)
 
     if not results:
         raise HTTPException(status_code=404, detail="No valid Ganzhi found")
@@ -96,3 +100,26 @@ def compare_ganzhi(request: CompareRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail=f"Ganzhi not found: {', '.join(missing)}")
 
     return {"items": results}
+
+
+@router.post("/batch", response_model=BatchResponse, response_model_exclude_unset=True)
+async def get_ganzhi_batch(request: BatchRequest, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Get details for up to all 60 Ganzhi in one request.
+
+    Request body:
+    - names: Ganzhi names (1-60)
+    - include: sections to return, any of nayin, xiangyi, shensha, xiji,
+      guanxi (default: all)
+
+    Served from the snapshot, or with one query per included section.
+    """
+    if not request.names:
+        raise HTTPException(status_code=400, detail="At least 1 Ganzhi required")
+
+    if len(request.names) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_BATCH_SIZE} Ganzhi per batch")
+
+    items = await crud.aio.ganzhi.get_ganzhi_batch(db, request.names, request.include)
+    missing = [name for name in dict.fromkeys(request.names) if name not in items]
+    return {"items": items, "missing": missing}
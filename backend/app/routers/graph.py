@@ -0,0 +1,174 @@
+# Knowledge Graph API Router
+#
+# Traversals are streamed as NDJSON: one result per line as it is found, then
+# a last line {"count": n, "truncated": bool}.
+import json
+from typing import Iterable, Iterator, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_read_db
+from app import crud
+from app.export import MEDIA_TYPES
+from app.graph import KnowledgeGraph
+from app.schemas.graph import GraphSchema, GraphNodeDetail
+
+router = APIRouter(prefix="/api/graph", tags=["知识图谱"])
+
+MAX_DEPTH = 6
+MAX_RESULTS = 10000
+# Results per streamed chunk
+STREAM_BATCH_SIZE = 200
+
+DIRECTION = Query("both", pattern="^(out|in|both)$", description="Follow edges forward (out), backward (in) or both")
+TYPES = Query(None, description="Only follow these edge types (repeat the parameter for several)")
+LIMIT = Query(1000, ge=1, le=MAX_RESULTS, description="Maximum number of results")
+
+
+def _node(graph: KnowledgeGraph, ref: str) -> int:
+    """Node position of a node id or label; 404 when unknown, 400 when a label is ambiguous"""
+    found = graph.resolve(ref)
+    if not found:
+        raise HTTPException(status_code=404, detail=f"Node not found: {ref}")
+    if len(found) > 1:
+        ids = ", ".join(graph.nodes[v]["id"] for v in found)
+        raise HTTPException(status_code=400, detail=f"Ambiguous node {ref}, use one of the ids: {ids}")
+    return found[0]
+
+
+def _edge_types(graph: KnowledgeGraph, types: Optional[List[str]]) -> Optional[List[int]]:
+    unknown = [t for t in types or () if t not in graph.type_index]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown edge types: {', '.join(unknown)}")
+    return graph.edge_type_ids(types)
+
+
+def _ndjson(results: Iterable[dict], limit: int) -> Iterator[str]:
+    """Encode up to limit results one per line, STREAM_BATCH_SIZE lines per chunk"""
+    lines, count, truncated = [], 0, False
+    for result in results:
+        if count == limit:
+            truncated = True
+            break
+        lines.append(json.dumps(result, ensure_ascii=False))
+        count += 1
+        if len(lines) == STREAM_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    lines.append(json.dumps({"count": count, "truncated": truncated}))
+    yield "\n".join(lines) + "\n"
+
+
+def _stream(results: Iterable[dict], limit: int = MAX_RESULTS) -> StreamingResponse:
+    # A sync iterator: Starlette advances it in the threadpool, off the event loop
+    return StreamingResponse(_ndjson(results, limit), media_type=MEDIA_TYPES["ndjson"])
+
+
+@router.get("/schema", response_model=GraphSchema)
+async def get_graph_schema(db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Get the node and edge types of the knowledge graph with their counts.
+    skipped_edges counts KG_logic.json edges to undeclared nodes.
+    """
+    graph = await crud.aio.graph.get_graph(db)
+    return graph.schema()
+
+
+@router.get("/nodes/{ref}", response_model=GraphNodeDetail)
+async def get_graph_node(ref: str, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Get a node by id or label with its edge counts per edge type.
+    Example: /api/graph/nodes/甲子, /api/graph/nodes/五行:火
+    """
+    graph = await crud.aio.graph.get_graph(db)
+    return graph.describe(_node(graph, ref))
+
+
+@router.get("/neighbors/{ref}")
+async def get_graph_neighbors(
+    ref: str,
+    types: Optional[List[str]] = TYPES,
+    direction: str = DIRECTION,
+    limit: int = LIMIT,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Stream the edges of a node as NDJSON lines {"node", "edge"}.
+    Example: /api/graph/neighbors/甲子?types=六合&types=六冲
+    """
+    graph = await crud.aio.graph.get_graph(db)
+    v, edge_types = _node(graph, ref), _edge_types(graph, types)
+    return _stream(graph.neighbourhood(v, edge_types, direction), limit)
+
+
+@router.get("/bfs/{ref}")
+async def get_graph_bfs(
+    ref: str,
+    depth: int = Query(2, ge=1, le=MAX_DEPTH, description="Maximum number of hops (k)"),
+    types: Optional[List[str]] = TYPES,
+    direction: str = DIRECTION,
+    limit: int = LIMIT,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Stream the nodes within depth hops of a node in breadth-first order as
+    NDJSON lines {"node", "depth", "edge"}; edge is the one the node was first
+    reached by.
+    Example: /api/graph/bfs/甲子?depth=2&types=六合
+    """
+    graph = await crud.aio.graph.get_graph(db)
+    v, edge_types = _node(graph, ref), _edge_types(graph, types)
+    return _stream(graph.bfs(v, depth, edge_types, direction), limit)
+
+
+@router.get("/path")
+async def get_graph_path(
+    source: str = Query(..., description="Start node id or label"),
+    target: str = Query(..., description="End node id or label"),
+    max_depth: int = Query(MAX_DEPTH, ge=1, le=MAX_DEPTH, description="Maximum number of hops"),
+    types: Optional[List[str]] = TYPES,
+    direction: str = DIRECTION,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Stream a shortest path (fewest hops) as NDJSON lines {"step", "node",
+    "edge"}, from the source (step 0, no edge) to the target; 404 when there
+    is none within max_depth.
+    Example: /api/graph/path?source=甲子&target=南方
+    """
+    graph = await crud.aio.graph.get_graph(db)
+    start, end = _node(graph, source), _node(graph, target)
+    path = graph.shortest_path(start, end, max_depth, _edge_types(graph, types), direction)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No path from {source} to {target} within {max_depth} hops")
+    return _stream(
+        {"step": k, "node": graph.node(graph.node_index[node_id]), "edge": path["edges"][k - 1] if k else None}
+        for k, node_id in enumerate(path["nodes"])
+    )
+
+
+@router.get("/typed-paths/{ref}")
+async def get_graph_typed_paths(
+    ref: str,
+    pattern: List[str] = Query(..., description="Edge type of each hop, in order (repeat the parameter)"),
+    target: Optional[str] = Query(None, description="Only paths ending at this node id or label"),
+    direction: str = DIRECTION,
+    limit: int = LIMIT,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Stream the simple paths from a node whose hops follow the given edge
+    types in order, as NDJSON lines {"nodes", "edges"}.
+    Example: /api/graph/typed-paths/甲子?pattern=六合&pattern=六冲
+    (甲子 六合 X, then X 六冲 Y)
+    """
+    if len(pattern) > MAX_DEPTH:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_DEPTH} hops per pattern")
+    graph = await crud.aio.graph.get_graph(db)
+    v = _node(graph, ref)
+    _edge_types(graph, pattern)  # 400 for unknown types
+    end = _node(graph, target) if target is not None else None
+    hops = [graph.type_index[t] for t in pattern]
+    return _stream(graph.typed_paths(v, hops, end, direction), limit)
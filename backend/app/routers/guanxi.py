@@ -1,14 +1,16 @@
 # Guanxi API Router
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.database import get_db
+from app.database import get_async_read_db
 from app import crud
 from app.schemas.guanxi import (
     GuanxiResponse,
     GuanxiByGanzhiResponse,
     GuanxiBetweenResponse,
+    RelationMaskRequest,
+    RelationMaskResponse,
     RelationTypesResponse
 )
 
@@ -16,53 +18,71 @@ router = APIRouter(prefix="/api/guanxi", tags=["干支关系"])
 
 
 @router.get("", response_model=List[GuanxiResponse])
-def get_guanxi_list(
+async def get_guanxi_list(
     skip: int = Query(0, ge=0, description="Offset for pagination"),
     limit: int = Query(300, ge=1, le=500, description="Limit number of results"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """
     Get list of all Guanxi relationships.
     """
-    return crud.guanxi.get_all_guanxi(db, skip=skip, limit=limit)
+    return await crud.aio.guanxi.get_all_guanxi(db, skip=skip, limit=limit)
 
 
 @router.get("/types", response_model=RelationTypesResponse)
-def get_relation_types(db: Session = Depends(get_db)):
+async def get_relation_types(db: AsyncSession = Depends(get_async_read_db)):
     """
     Get all unique relation types.
     """
-    types = crud.guanxi.get_relation_types(db)
+    types = await crud.aio.guanxi.get_relation_types(db)
     return {"types": types}
 
 
 @router.get("/type/{relation_type}", response_model=List[GuanxiResponse])
-def get_guanxi_by_type(relation_type: str, db: Session = Depends(get_db)):
+async def get_guanxi_by_type(relation_type: str, db: AsyncSession = Depends(get_async_read_db)):
     """
-    Get all Guanxi relationships by relation type.
+    Get all Guanxi relationships by relation type, including rule-derived ones.
     Example: /api/guanxi/type/六合
     """
-    return crud.guanxi.get_guanxi_by_type(db, relation_type)
+    return await crud.aio.guanxi.get_guanxi_by_type(db, relation_type)
 
 
 @router.get("/ganzhi/{ganzhi_name}", response_model=List[GuanxiByGanzhiResponse])
-def get_guanxi_by_ganzhi(ganzhi_name: str, db: Session = Depends(get_db)):
+async def get_guanxi_by_ganzhi(ganzhi_name: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Get all Guanxi relationships for a specific Ganzhi.
     """
-    return crud.guanxi.get_guanxi_by_ganzhi(db, ganzhi_name)
+    return await crud.aio.guanxi.get_guanxi_by_ganzhi(db, ganzhi_name)
 
 
 @router.get("/between/{ganzhi1}/{ganzhi2}", response_model=GuanxiBetweenResponse)
-def get_guanxi_between(ganzhi1: str, ganzhi2: str, db: Session = Depends(get_db)):
+async def get_guanxi_between(ganzhi1: str, ganzhi2: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Get the Guanxi relationship between two specific Ganzhi.
     Example: /api/guanxi/between/甲子/乙丑
     """
-    result = crud.guanxi.get_guanxi_between(db, ganzhi1, ganzhi2)
+    result = await crud.aio.guanxi.get_guanxi_between(db, ganzhi1, ganzhi2)
     if not result:
         raise HTTPException(
             status_code=404,
             detail=f"No relationship found between {ganzhi1} and {ganzhi2}"
         )
     return result
+
+
+@router.post("/masks", response_model=RelationMaskResponse)
+async def get_relation_masks(request: RelationMaskRequest, db: AsyncSession = Depends(get_async_read_db)):
+    """
+    Get the relation bitmask for many Ganzhi pairs in one call.
+    relation_bits maps each relation type to its bit.
+
+    Request body:
+    - pairs: List of [ganzhi1, ganzhi2]
+    """
+    if len(request.pairs) > 10000:
+        raise HTTPException(status_code=400, detail="Maximum 10000 pairs per request")
+
+    result = await crud.aio.guanxi.get_relation_masks(db, request.pairs)
+    if result["unknown"]:
+        raise HTTPException(status_code=404, detail=f"Ganzhi not found: {', '.join(result['unknown'])}")
+    return result
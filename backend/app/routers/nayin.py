@@ -1,48 +1,50 @@
 # Nayin API Router
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
-from app.database import get_db
+from app.database import get_async_read_db
 from app import crud
 from app.schemas.nayin import (
     NayinByGanzhiResponse,
     NayinByNayinResponse,
     NayinStatusListResponse,
-    NayinCalcResponse
+    NayinCalcResponse,
+    NayinCalcBatchRequest,
+    NayinCalcBatchResponse
 )
 
 router = APIRouter(prefix="/api/nayin", tags=["纳音"])
 
 
 @router.get("/by-ganzhi/{ganzhi}", response_model=NayinByGanzhiResponse)
-def get_nayin_by_ganzhi(ganzhi: str, db: Session = Depends(get_db)):
+async def get_nayin_by_ganzhi(ganzhi: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Get Nayin info by Ganzhi name.
     Returns: nayin_name, nayin_wuxing, zhuangtai, shengda_xiaoruo, etc.
     """
-    result = crud.nayin.get_nayin_by_ganzhi(db, ganzhi)
+    result = await crud.aio.nayin.get_nayin_by_ganzhi(db, ganzhi)
     if not result:
         raise HTTPException(status_code=404, detail=f"Nayin for Ganzhi '{ganzhi}' not found")
     return result
 
 
 @router.get("/{nayin_name}/ganzhi", response_model=List[NayinByNayinResponse])
-def get_ganzhi_by_nayin(nayin_name: str, db: Session = Depends(get_db)):
+async def get_ganzhi_by_nayin(nayin_name: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Get all Ganzhi with a specific Nayin name.
     Example: /api/nayin/海中金/ganzhi returns [甲子, 乙丑]
     """
-    results = crud.nayin.get_ganzhi_by_nayin(db, nayin_name)
+    results = await crud.aio.nayin.get_ganzhi_by_nayin(db, nayin_name)
     if not results:
         raise HTTPException(status_code=404, detail=f"Nayin '{nayin_name}' not found")
     return results
 
 
 @router.get("", response_model=List[NayinByNayinResponse])
-def get_all_nayin(db: Session = Depends(get_db)):
+async def get_all_nayin(db: AsyncSession = Depends(get_async_read_db)):
     """Get all Nayin records with their Ganzhi."""
-    all_categories = crud.nayin.get_all_nayin_categories(db)
+    all_categories = await crud.aio.nayin.get_all_nayin_categories(db)
     results = []
     for nayin_name, data in all_categories.items():
         for gz in data.get("ganzhi_list", []):
@@ -59,26 +61,26 @@ def get_all_nayin(db: Session = Depends(get_db)):
 
 
 @router.get("/status", response_model=NayinStatusListResponse)
-def get_status_list(db: Session = Depends(get_db)):
+async def get_status_list(db: AsyncSession = Depends(get_async_read_db)):
     """Get all available status (十二长生) values."""
-    statuses = crud.nayin.get_status_list(db)
+    statuses = await crud.aio.nayin.get_status_list(db)
     return {"statuses": statuses}
 
 
 @router.get("/status/{status}", response_model=List[NayinByNayinResponse])
-def get_nayin_by_status(status: str, db: Session = Depends(get_db)):
+async def get_nayin_by_status(status: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Get all Ganzhi with a specific status.
     Example: /api/nayin/status/帝旺 returns all Ganzhi in 帝旺 state
     """
-    results = crud.nayin.get_nayin_by_status(db, status)
+    results = await crud.aio.nayin.get_nayin_by_status(db, status)
     if not results:
         raise HTTPException(status_code=404, detail=f"No Ganzhi found with status '{status}'")
     return results
 
 
 @router.get("/category/{category}", response_model=List[NayinByNayinResponse])
-def get_nayin_by_category(category: str, db: Session = Depends(get_db)):
+async def get_nayin_by_category(category: str, db: AsyncSession = Depends(get_async_read_db)):
     """
     Get Nayin by category: shengda (盛大) or xiaoruo (小弱).
     Example: /api/nayin/category/shengda
@@ -86,13 +88,13 @@ def get_nayin_by_category(category: str, db: Session = Depends(get_db)):
     if category not in ["shengda", "xiaoruo"]:
         raise HTTPException(status_code=400, detail="Category must be 'shengda' or 'xiaoruo'")
 
-    results = crud.nayin.get_nayin_by_category(db, category)
+    results = await crud.aio.nayin.get_nayin_by_category(db, category)
     # Return empty list if no results (e.g., xiaoruo has no data in current database)
     return results
 
 
 @router.get("/calc/{ganzhi}", response_model=NayinCalcResponse)
-def calc_nayin(ganzhi: str):
+async def calc_nayin(ganzhi: str):
     """
     Calculate Nayin using different methods.
     Returns step-by-step calculation for educational purposes.
@@ -101,3 +103,14 @@ def calc_nayin(ganzhi: str):
     if "error" in result:
         raise HTTPException(status_code=400, detail=result["error"])
     return result
+
+
+@router.post("/calc/batch", response_model=NayinCalcBatchResponse)
+async def calc_nayin_batch(request: NayinCalcBatchRequest):
+    """
+    Calculate Nayin for many Ganzhi in one call (up to 10000).
+    Invalid entries are reported in errors with their position in the request.
+    """
+    if len(request.ganzhi_list) > 10000:
+        raise HTTPException(status_code=400, detail="Maximum 10000 Ganzhi per request")
+    return crud.nayin.calc_nayin_batch(request.ganzhi_list)
@@ -0,0 +1,42 @@
+# Full-text Search API Router
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from app.database import get_async_read_db
+from app import crud
+from app.schemas.search import FullTextSearchResponse, Suggestion
+
+router = APIRouter(prefix="/api/search", tags=["搜索"])
+
+
+@router.get("", response_model=FullTextSearchResponse)
+async def search(
+    q: str = Query(..., min_length=1, description="Search text, e.g. 森林 or 法官"),
+    skip: int = Query(0, ge=0, description="Offset for pagination (in Ganzhi)"),
+    limit: int = Query(20, ge=1, le=60, description="Limit number of Ganzhi"),
+    hits: int = Query(5, ge=1, le=50, description="Maximum hits returned per Ganzhi"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Full-text search across Xiangyi content/description, Shensha and Guanxi remarks.
+    Results are grouped by Ganzhi, ranked by relevance, with highlighted snippets.
+    503 until the search index has been built (at startup or by an import).
+    """
+    result = await crud.aio.search.search_text(db, q, skip=skip, limit=limit, hits_per_ganzhi=hits)
+    if result is None:
+        raise HTTPException(status_code=503, detail="Search index is not built yet")
+    return result
+
+
+@router.get("/suggest", response_model=List[Suggestion])
+async def suggest(
+    q: str = Query(..., min_length=1, description="Prefix typed so far, Chinese or pinyin (e.g. 甲, jia, jia_z)"),
+    limit: int = Query(10, ge=1, le=20, description="Maximum suggestions"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    Autocomplete Ganzhi, Nayin and Shensha names by prefix.
+    Ganzhi are ranked first, then Nayin, then Shensha.
+    """
+    return await crud.aio.search.suggest(db, q, limit=limit)
@@ -0,0 +1,32 @@
+# Pydantic schemas for the calendar API
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+
+class CalendarPillars(BaseModel):
+    """Four pillars of one date and time"""
+    datetime: str
+    year: str
+    month: str
+    day: str
+    hour: str
+
+
+class CalendarBulkRequest(BaseModel):
+    """Timestamps to convert: a list, or a range from start (inclusive) to end (exclusive)"""
+    datetimes: Optional[List[datetime]] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    step_minutes: int = Field(60, ge=1)
+    utc_offset: int = Field(480, ge=-720, le=840)
+
+
+class CalendarBulkResponse(BaseModel):
+    """Four pillars per timestamp, as parallel columns"""
+    count: int
+    datetimes: List[str]
+    year: List[str]
+    month: List[str]
+    day: List[str]
+    hour: List[str]
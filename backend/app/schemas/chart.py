@@ -0,0 +1,77 @@
+# Pydantic schemas for the chart analysis API
+from pydantic import BaseModel
+from typing import Optional, List, Dict, Tuple
+
+from app.schemas.ganzhi import NayinBase, ShenshaBase, XijiBase
+
+
+class ChartRequest(BaseModel):
+    """The four pillars of a chart"""
+    year: str
+    month: str
+    day: str
+    hour: str
+
+
+class ChartPillar(BaseModel):
+    """Nayin and shensha of one pillar"""
+    pillar: str
+    ganzhi: str
+    nayin: Optional[NayinBase] = None
+    shensha: List[ShenshaBase] = []
+
+
+class ChartGuanxi(BaseModel):
+    """Relations between two pillars"""
+    pillars: List[str]
+    ganzhi1: str
+    ganzhi2: str
+    relation_types: List[str]
+    relation_mask: int
+
+
+class ChartXijiHit(XijiBase):
+    """A pillar's xiji entry whose target other pillars satisfy"""
+    pillar: str
+    ganzhi: str
+    matched_by: List[str]
+
+
+class ChartAnalysis(BaseModel):
+    """Analysis of one chart"""
+    pillars: List[ChartPillar]
+    guanxi: List[ChartGuanxi]
+    xiji: List[ChartXijiHit]
+
+
+class ChartBulkRequest(BaseModel):
+    """Charts as [year, month, day, hour] Ganzhi"""
+    charts: List[Tuple[str, str, str, str]]
+
+
+class ChartLegend(BaseModel):
+    """What the integers of the bulk items refer to"""
+    pillar_names: List[str]
+    pairs: List[Tuple[int, int]]
+    relation_bits: Dict[str, int]
+    ganzhi: List[str]
+    nayin: List[Optional[str]]
+    shensha: List[List[str]]
+    xiji: List[XijiBase]
+
+
+class ChartBulkItem(BaseModel):
+    """
+    One chart in integer form: pillars are sixty-cycle positions, guanxi the
+    relation mask of each pillar pair, xiji the hits as
+    [pillar, xiji id, matched by pillar]
+    """
+    pillars: List[int]
+    guanxi: List[int]
+    xiji: List[Tuple[int, int, int]]
+
+
+class ChartBulkResponse(BaseModel):
+    """Bulk chart analysis"""
+    legend: ChartLegend
+    items: List[ChartBulkItem]
@@ -1,6 +1,6 @@
 # Pydantic schemas for Ganzhi API
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, List, Literal, Optional
 
 
 # Ganzhi schemas
@@ -154,6 +154,25 @@ class CompareResponse(BaseModel):
     items: List[GanzhiWithDetails]
 
 
+# Batch request/response
+DetailSection = Literal["nayin", "xiangyi", "shensha", "xiji", "guanxi"]
+
+
+class BatchRequest(BaseModel):
+    """Request for the details of many Ganzhi"""
+    names: List[str]
+    include: List[DetailSection] = ["nayin", "xiangyi", "shensha", "xiji", "guanxi"]
+
+
+class BatchResponse(BaseModel):
+    """
+    Details keyed by name, in request order; sections not included are
+    omitted from each item. Unknown names are listed in missing.
+    """
+    items: Dict[str, GanzhiWithDetails]
+    missing: List[str] = []
+
+
 # Search response
 class SearchResponse(BaseModel):
     """Search results response"""
@@ -0,0 +1,31 @@
+# Pydantic schemas for the knowledge graph API
+from pydantic import BaseModel, Field
+from typing import List, Dict
+
+
+class GraphNode(BaseModel):
+    """A typed node; derived nodes without an id in KG_logic.json are named 类型:标签"""
+    id: str
+    label: str
+    type: str
+
+
+class GraphDegree(BaseModel):
+    """Edges of one type leaving / entering a node"""
+    out: int
+    in_: int = Field(alias="in")
+
+
+class GraphNodeDetail(GraphNode):
+    """A node with its edge counts per edge type"""
+    degree: Dict[str, GraphDegree]
+
+
+class GraphSchema(BaseModel):
+    """Node and edge types of the graph with their counts"""
+    node_count: int
+    edge_count: int
+    skipped_edges: int
+    node_types: Dict[str, int]
+    edge_types: Dict[str, int]
+    symmetric_types: List[str]
@@ -1,6 +1,6 @@
 # Pydantic schemas for Guanxi API
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 
 
 class GuanxiBase(BaseModel):
@@ -15,13 +15,13 @@ class GuanxiBase(BaseModel):
 
 
 class GuanxiResponse(GuanxiBase):
-    """Guanxi response"""
-    id: int
+    """Guanxi response (id is None for rule-derived relations)"""
+    id: Optional[int] = None
 
 
 class GuanxiByGanzhiResponse(BaseModel):
     """Guanxi relationship for a specific Ganzhi"""
-    id: int
+    id: Optional[int] = None
     ganzhi1: str
     ganzhi2: str
     relation_type: Optional[str] = None
@@ -31,11 +31,32 @@ class GuanxiByGanzhiResponse(BaseModel):
 
 class GuanxiBetweenResponse(BaseModel):
     """Guanxi between two Ganzhi"""
-    id: int
+    id: Optional[int] = None
     ganzhi1: str
     ganzhi2: str
     relation_type: Optional[str] = None
     remark: Optional[str] = None
+    relation_types: List[str] = []
+    relation_mask: int = 0
+
+
+class RelationMaskRequest(BaseModel):
+    """Ganzhi pairs to look up in the relation matrix"""
+    pairs: List[Tuple[str, str]]
+
+
+class RelationMaskItem(BaseModel):
+    """Relation bitmask for one Ganzhi pair"""
+    ganzhi1: str
+    ganzhi2: str
+    mask: int
+    relation_types: List[str]
+
+
+class RelationMaskResponse(BaseModel):
+    """Relation bitmasks for many Ganzhi pairs"""
+    relation_bits: Dict[str, int]
+    items: List[RelationMaskItem]
 
 
 class GuanxiListResponse(BaseModel):
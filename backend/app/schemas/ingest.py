@@ -0,0 +1,37 @@
+# Pydantic schemas for NDJSON ingest (one row per line)
+from functools import lru_cache
+from typing import Optional, Type
+
+from pydantic import BaseModel, ConfigDict, Field, create_model
+from sqlalchemy import Boolean, Float, Integer, String
+
+
+def _field(column):
+    """(annotation, default) of a table column"""
+    if isinstance(column.type, Boolean):
+        annotation = bool
+    elif isinstance(column.type, Integer):
+        annotation = int
+    elif isinstance(column.type, Float):
+        annotation = float
+    else:
+        annotation = str
+    length = column.type.length if isinstance(column.type, String) else None
+    if column.nullable is False and not column.primary_key:
+        return annotation, Field(..., max_length=length) if length else ...
+    return Optional[annotation], Field(None, max_length=length) if length else None
+
+
+@lru_cache(maxsize=None)
+def row_schema(model) -> Type[BaseModel]:
+    """
+    Validation schema for one row of a table, from its columns: NOT NULL
+    columns are required, string lengths enforced, unknown fields rejected.
+    id is optional (a new id is assigned when omitted).
+    """
+    fields = {column.name: _field(column) for column in model.__table__.columns}
+    return create_model(
+        f"{model.__name__}Row",
+        __config__=ConfigDict(extra="forbid", strict=False),
+        **fields
+    )
@@ -46,3 +46,21 @@ class NayinCalcResponse(BaseModel):
     tiangan_wuxing: str
     dizhi_wuxing: str
     methods: List[NayinCalcMethod]
+
+
+class NayinCalcBatchRequest(BaseModel):
+    """Ganzhi names to calculate"""
+    ganzhi_list: List[str]
+
+
+class NayinCalcError(BaseModel):
+    """Input that could not be calculated"""
+    index: int
+    ganzhi: str
+    error: str
+
+
+class NayinCalcBatchResponse(BaseModel):
+    """Response for batch Nayin calculation"""
+    items: List[NayinCalcResponse]
+    errors: List[NayinCalcError] = []
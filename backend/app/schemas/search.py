@@ -0,0 +1,33 @@
+# Pydantic schemas for full-text search API
+from pydantic import BaseModel
+from typing import List
+
+
+class SearchHit(BaseModel):
+    """A single matching document"""
+    source: str  # xiangyi / shensha / guanxi
+    ref_id: int
+    content: str
+    snippet: str
+    score: float
+
+
+class SearchGroup(BaseModel):
+    """Matches for one Ganzhi"""
+    ganzhi: str
+    score: float
+    hit_count: int
+    hits: List[SearchHit]
+
+
+class FullTextSearchResponse(BaseModel):
+    """Ranked search results grouped by Ganzhi"""
+    total: int
+    items: List[SearchGroup]
+
+
+class Suggestion(BaseModel):
+    """Autocomplete suggestion"""
+    text: str
+    kind: str  # ganzhi / nayin / shensha
+    matched: str  # key that matched the prefix (name or pinyin)
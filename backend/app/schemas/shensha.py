@@ -58,6 +58,20 @@ class ShenshaByGanzhiResponse(BaseModel):
         from_attributes = True
 
 
+class GanzhiRef(BaseModel):
+    """Ganzhi name with its tiangan and dizhi"""
+    ganzhi: str
+    tiangan: str
+    dizhi: str
+
+
+class ShenshaIntersectionResponse(BaseModel):
+    """Ganzhi carrying every requested Shensha"""
+    shensha: List[str]
+    total: int
+    items: List[GanzhiRef]
+
+
 class ZixingListResponse(BaseModel):
     """Zixing (自星) Shensha list"""
     items: List[ShenshaResponse]
@@ -0,0 +1,147 @@
+# Static API snapshot serving
+#
+# app/build_static.py renders every read endpoint to disk as identity, gzip
+# and (with the optional brotli package) brotli files plus a manifest.json.
+# When STATIC_API_DIR points at such a directory, StaticSnapshotMiddleware
+# answers those paths with a file response in the best encoding the client
+# accepts. Requests with a query string, paths not in the manifest or not on
+# disk and a manifest built for another data version fall through to the app.
+import json
+import os
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import FileResponse, Response
+
+from app.caching import CACHE_CONTROL, current_data_version, etag_matches
+
+
+MANIFEST_NAME = "manifest.json"
+
+# Encodings in order of preference, with their file suffixes
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz", "identity": ""}
+
+
+def static_etag(etag: str, encoding: str) -> str:
+    """Per-encoding strong ETag: the identity ETag with the coding appended"""
+    if encoding == "identity":
+        return etag
+    return etag[:-1] + f"-{encoding}" + '"'
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}"""
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(header: Optional[str], available) -> Optional[str]:
+    """
+    Best available encoding for an Accept-Encoding header, or None when the
+    client refuses all of them (identity is acceptable unless excluded).
+    """
+    accepted = parse_accept_encoding(header)
+    wildcard = accepted.get("*")
+    for encoding in ENCODING_SUFFIXES:
+        if encoding not in available:
+            continue
+        q = accepted.get(encoding, wildcard)
+        if q is None and encoding == "identity":
+            q = 1.0
+        if q:
+            return encoding
+    return None
+
+
+def load_manifest(directory: str) -> Optional[dict]:
+    """The snapshot manifest in a directory, or None if there is none"""
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.isfile(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StaticSnapshotMiddleware:
+    """
+    ASGI middleware serving pre-rendered read responses from disk. The
+    manifest is re-read whenever the file changes (a rebuild swapped in a new
+    directory), so a fresh build is picked up without a restart.
+    """
+
+    def __init__(self, app, directory: str):
+        self.app = app
+        self.directory = directory
+        self.manifest: Optional[dict] = None
+        self._manifest_stat = None
+
+    async def _current_manifest(self) -> Optional[dict]:
+        """The manifest on disk, re-read in the threadpool when its file changed"""
+        try:
+            stat = os.stat(os.path.join(self.directory, MANIFEST_NAME))
+        except OSError:
+            self.manifest, self._manifest_stat = None, None
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key != self._manifest_stat or self.manifest is None:
+            try:
+                self.manifest = await run_in_threadpool(load_manifest, self.directory)
+            except (OSError, ValueError):  # replaced or half-written meanwhile
+                self.manifest = None
+            self._manifest_stat = key if self.manifest is not None else None
+        return self.manifest
+
+    async def _route(self, scope) -> Optional[dict]:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or scope["query_string"]:
+            return None
+        manifest = await self._current_manifest()
+        if manifest is None or manifest["data_version"] != current_data_version():
+            return None
+        return manifest["routes"].get(scope["path"])
+
+    async def __call__(self, scope, receive, send):
+        route = await self._route(scope)
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        encoding = choose_encoding(
+            request_headers.get(b"accept-encoding", b"").decode("latin-1"),
+            route["sizes"]
+        )
+        if encoding is None:
+            await Response(status_code=406)(scope, receive, send)
+            return
+
+        # A file removed by a rebuild in progress: let the app answer instead
+        path = os.path.join(self.directory, route["file"] + ENCODING_SUFFIXES[encoding])
+        try:
+            stat = os.stat(path)
+        except OSError:
+            await self.app(scope, receive, send)
+            return
+
+        etag = static_etag(route["etag"], encoding)
+        headers = {"etag": etag, "cache-control": CACHE_CONTROL, "vary": "Accept-Encoding"}
+        if etag_matches(request_headers.get(b"if-none-match", b"").decode("latin-1"), etag):
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+        response = FileResponse(path, media_type="application/json", headers=headers, stat_result=stat)
+        await response(scope, receive, send)
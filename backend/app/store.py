@@ -0,0 +1,269 @@
+# In-memory knowledge snapshot
+#
+# The dataset (60 Ganzhi plus a few thousand related rows) only changes when an
+# admin import runs, so every table is loaded once into an immutable, pre-indexed
+# snapshot. Read paths in app.crud are served from it; imports build a new
+# snapshot and swap it in atomically.
+import threading
+from types import MappingProxyType
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import Ganzhi, Nayin, Xiangyi, Shensha, GanzhiShensha, Xiji, Guanxi
+from app.autocomplete import build_autocomplete
+from app.data_version import get_data_version
+from app.relations import RelationMatrix
+from app.chart import ChartTables
+from app.graph import build_graph, load_kg_data
+
+
+def _load_rows(db: Session, model) -> tuple:
+    """Load every row of a table as plain dicts, ordered by id"""
+    table = model.__table__
+    rows = db.execute(select(table).order_by(table.c.id)).mappings().all()
+    return tuple(dict(row) for row in rows)
+
+
+def _group(rows, key) -> MappingProxyType:
+    """Group rows into a read-only {key: tuple(rows)} index"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[key], []).append(row)
+    return MappingProxyType({k: tuple(v) for k, v in groups.items()})
+
+
+def _unique(values) -> tuple:
+    """Distinct non-empty values in first-seen order"""
+    return tuple(dict.fromkeys(v for v in values if v))
+
+
+def group_nayin_rows(rows) -> dict:
+    """
+    Group joined Nayin/Ganzhi listing rows into the 30 Nayin categories:
+    {nayin_name: {nayin_name, nayin_wuxing, shengda_xiaoruo, ganzhi_list}}
+    """
+    groups = {}
+    for row in rows:
+        group = groups.get(row["nayin_name"])
+        if group is None:
+            group = groups[row["nayin_name"]] = {
+                "nayin_name": row["nayin_name"],
+                "nayin_wuxing": row["nayin_wuxing"],
+                "shengda_xiaoruo": row["shengda_xiaoruo"],
+                "ganzhi_list": []
+            }
+        group["ganzhi_list"].append({
+            "ganzhi": row["ganzhi"],
+            "tiangan": row["tiangan"],
+            "dizhi": row["dizhi"],
+            "zhuangtai": row["zhuangtai"]
+        })
+    return groups
+
+
+class ShenshaIncidence:
+    """
+    Ganzhi × Shensha incidence index built from ganzhi_shensha.
+    Answers both directions and the zixing filter by dict lookup, and
+    multi-Shensha intersections by AND-ing per-Shensha Ganzhi bitmasks.
+    """
+
+    def __init__(self, links, ganzhi_ids):
+        # Bit position of each Ganzhi, in cycle (id) order
+        self.ganzhi_ids = tuple(ganzhi_ids)
+        position = {gid: i for i, gid in enumerate(self.ganzhi_ids)}
+
+        by_ganzhi, by_shensha, masks = {}, {}, {}
+        zixing = {}
+        for link in links:
+            gid, sid = link["ganzhi_id"], link["shensha_id"]
+            by_ganzhi.setdefault(gid, []).append((sid, link["is_zixing"]))
+            by_shensha.setdefault(sid, []).append((gid, link["is_zixing"]))
+            if gid in position:
+                masks[sid] = masks.get(sid, 0) | (1 << position[gid])
+            if link["is_zixing"]:
+                zixing[sid] = None
+
+        self.by_ganzhi = MappingProxyType({k: tuple(v) for k, v in by_ganzhi.items()})
+        self.by_shensha = MappingProxyType({k: tuple(v) for k, v in by_shensha.items()})
+        self.mask_by_shensha = MappingProxyType(masks)
+        self.zixing_shensha_ids = tuple(sorted(zixing))
+
+    def ganzhi_with_all(self, shensha_ids) -> list:
+        """Ganzhi ids (cycle order) linked to every given Shensha"""
+        if not shensha_ids:
+            return []
+        mask = -1
+        for sid in shensha_ids:
+            mask &= self.mask_by_shensha.get(sid, 0)
+        return [gid for i, gid in enumerate(self.ganzhi_ids) if mask >> i & 1]
+
+
+class KnowledgeSnapshot:
+    """Immutable copy of every table with the indexes the read API needs"""
+
+    def __init__(self, ganzhi, nayin, xiangyi, shensha, ganzhi_shensha, xiji, guanxi, data_version=0, kg_data=None):
+        # Data version the tables were read at (ETags are derived from it)
+        self.data_version = data_version
+
+        # Raw tables
+        self.ganzhi = ganzhi
+        self.nayin = nayin
+        self.xiangyi = xiangyi
+        self.shensha = shensha
+        self.ganzhi_shensha = ganzhi_shensha
+        self.xiji = xiji
+        self.guanxi = guanxi
+
+        # Ganzhi by id / name
+        self.ganzhi_by_id = MappingProxyType({g["id"]: g for g in ganzhi})
+        self.ganzhi_by_name = MappingProxyType({g["ganzhi"]: g for g in ganzhi})
+        self.ganzhi_names = tuple(g["ganzhi"] for g in ganzhi)
+
+        # Nayin joined to its Ganzhi (listing shape), by status and by category
+        self.nayin_by_ganzhi_id = MappingProxyType({n["ganzhi_id"]: n for n in nayin})
+        self.nayin_rows = tuple(
+            {
+                "ganzhi": self.ganzhi_by_id[n["ganzhi_id"]]["ganzhi"],
+                "tiangan": self.ganzhi_by_id[n["ganzhi_id"]]["tiangan"],
+                "dizhi": self.ganzhi_by_id[n["ganzhi_id"]]["dizhi"],
+                "nayin_name": n["nayin_name"],
+                "nayin_wuxing": n["nayin_wuxing"],
+                "zhuangtai": n["zhuangtai"],
+                "shengda_xiaoruo": n["shengda_xiaoruo"]
+            }
+            for n in nayin if n["ganzhi_id"] in self.ganzhi_by_id
+        )
+        self.nayin_rows_by_status = _group(self.nayin_rows, "zhuangtai")
+        self.nayin_groups = MappingProxyType(group_nayin_rows(self.nayin_rows))
+        self.status_list = _unique(n["zhuangtai"] for n in nayin)
+
+        # Per-ganzhi related rows
+        self.xiangyi_by_ganzhi_id = _group(xiangyi, "ganzhi_id")
+        self.xiji_by_ganzhi_id = _group(xiji, "ganzhi_id")
+
+        # Shensha by id / name / type, and links in both directions
+        self.shensha_by_id = MappingProxyType({s["id"]: s for s in shensha})
+        self.shensha_by_name = MappingProxyType({s["name"]: s for s in shensha})
+        self.shensha_by_type = _group(shensha, "type")
+        self.shensha_types = _unique(s["type"] for s in shensha)
+        self.shensha_incidence = ShenshaIncidence(ganzhi_shensha, (g["id"] for g in ganzhi))
+
+        # Guanxi by id / either side, and the 60×60 relation matrix
+        self.guanxi_by_id = MappingProxyType({g["id"]: g for g in guanxi})
+        self.relation_matrix = RelationMatrix(guanxi)
+        by_ganzhi = {}
+        for rel in guanxi:
+            by_ganzhi.setdefault(rel["ganzhi1"], []).append(rel)
+            if rel["ganzhi2"] != rel["ganzhi1"]:
+                by_ganzhi.setdefault(rel["ganzhi2"], []).append(rel)
+        self.guanxi_by_ganzhi = MappingProxyType({k: tuple(v) for k, v in by_ganzhi.items()})
+
+        # Lookup tables for four-pillar chart analysis
+        self.chart_tables = ChartTables(ganzhi, nayin, shensha, ganzhi_shensha, xiji, self.relation_matrix)
+
+        # Knowledge graph (the tables plus KG_logic.json) for multi-hop queries
+        self.graph = build_graph(ganzhi, nayin, xiangyi, shensha, ganzhi_shensha, xiji, self.relation_matrix, kg_data or {})
+
+        # Autocomplete over Ganzhi (incl. pinyin), Nayin and Shensha names
+        self.autocomplete = build_autocomplete(
+            self.ganzhi_names,
+            _unique(n["nayin_name"] for n in nayin),
+            tuple(s["name"] for s in shensha),
+        )
+
+        # Fully assembled detail payloads (the most-hit endpoint)
+        self.details_by_name = MappingProxyType({g["ganzhi"]: self._build_details(g) for g in ganzhi})
+
+    def _build_details(self, g: dict) -> dict:
+        shensha_ids = {sid for sid, _ in self.shensha_incidence.by_ganzhi.get(g["id"], ())}
+        shensha = [self.shensha_by_id[sid] for sid in sorted(shensha_ids) if sid in self.shensha_by_id]
+        return {
+            **g,
+            "nayin": self.nayin_by_ganzhi_id.get(g["id"]),
+            "xiangyi": list(self.xiangyi_by_ganzhi_id.get(g["id"], ())),
+            "shensha": shensha,
+            "xiji": list(self.xiji_by_ganzhi_id.get(g["id"], ())),
+            "guanxi": list(self.guanxi_by_ganzhi.get(g["ganzhi"], ())),
+        }
+
+    @staticmethod
+    def read_tables(db: Session) -> dict:
+        """Load every table (one query each) and KG_logic.json, as constructor arguments"""
+        return {
+            "ganzhi": _load_rows(db, Ganzhi),
+            "nayin": _load_rows(db, Nayin),
+            "xiangyi": _load_rows(db, Xiangyi),
+            "shensha": _load_rows(db, Shensha),
+            "ganzhi_shensha": _load_rows(db, GanzhiShensha),
+            "xiji": _load_rows(db, Xiji),
+            "guanxi": _load_rows(db, Guanxi),
+            "data_version": get_data_version(db),
+            "kg_data": load_kg_data(),
+        }
+
+    @classmethod
+    def from_session(cls, db: Session) -> "KnowledgeSnapshot":
+        """Load every table and build the indexes"""
+        return cls(**cls.read_tables(db))
+
+
+class KnowledgeStore:
+    """Holder for the current snapshot; reloads swap the reference atomically"""
+
+    def __init__(self):
+        self._snapshot: Optional[KnowledgeSnapshot] = None
+        self._data_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> Optional[KnowledgeSnapshot]:
+        """Current snapshot, or None when not loaded (crud falls back to the DB)"""
+        return self._snapshot
+
+    @property
+    def data_version(self) -> Optional[int]:
+        """Last known data version (kept when the snapshot is cleared), or None"""
+        return self._data_version
+
+    def set_data_version(self, version: int):
+        """Record the data version when serving without a snapshot"""
+        self._data_version = version
+
+    def swap(self, snapshot: KnowledgeSnapshot) -> KnowledgeSnapshot:
+        """Swap a snapshot in, unless it is older (by data version) than the current one"""
+        with self._lock:
+            if self._snapshot is None or snapshot.data_version >= self._snapshot.data_version:
+                self._snapshot = snapshot
+                self._data_version = snapshot.data_version
+        return snapshot
+
+    def load(self, db: Session) -> KnowledgeSnapshot:
+        """
+        Build a new snapshot from the database and swap it in.
+        The build runs outside the lock: under AsyncSession.run_sync it yields to
+        the event loop, and a thread lock held across that would deadlock a
+        concurrent load on the same thread.
+        """
+        return self.swap(KnowledgeSnapshot.from_session(db))
+
+    async def reload(self, db: AsyncSession) -> KnowledgeSnapshot:
+        """
+        load() for async callers: the tables are read through run_sync and the
+        indexes (tens of milliseconds of CPU) are built in the threadpool, so
+        the event loop keeps serving requests meanwhile.
+        """
+        tables = await db.run_sync(KnowledgeSnapshot.read_tables)
+        return self.swap(await run_in_threadpool(KnowledgeSnapshot, **tables))
+
+    def clear(self):
+        """Drop the snapshot so reads go to the database (the data version is kept)"""
+        with self._lock:
+            self._snapshot = None
+
+
+knowledge_store = KnowledgeStore()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Autocomplete benchmark.
+
+Measures PrefixTrie.suggest latency for Chinese and pinyin prefixes, and the
+end-to-end GET /api/search/suggest round trip.
+
+Usage: python benchmarks/autocomplete.py [--rounds 20000] [--limit 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.store import knowledge_store
+
+PREFIXES = ["甲", "甲子", "j", "jia", "jia_z", "ji", "海中", "天", "x", "wu"]
+
+
+def bench_trie(trie, rounds, limit):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for prefix in PREFIXES:
+            trie.suggest(prefix, limit)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(PREFIXES))
+
+
+def bench_endpoint(client, rounds, limit):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for prefix in PREFIXES:
+            r = client.get("/api/search/suggest", params={"q": prefix, "limit": limit})
+            assert r.status_code == 200
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(PREFIXES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("Autocomplete benchmark")
+    print("=" * 50)
+    with TestClient(app) as client:
+        trie = knowledge_store.snapshot.autocomplete
+        print(f"Entries: {len(trie.entries)}")
+        print(f"PrefixTrie.suggest: {bench_trie(trie, args.rounds, args.limit) * 1e6:.2f} us/lookup")
+        per_request = bench_endpoint(client, max(1, args.rounds // 100), args.limit)
+        print(f"GET /api/search/suggest: {per_request * 1000:.2f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Bulk import benchmark.
+
+Runs the full import pipeline (app.import_data.run_import) on a fresh
+temporary database, for the real xiangyi.json / KG_logic.json and for a
+synthetic corpus scaled up by --factor (every list in the sources repeated
+with distinct values, so nothing is de-duplicated away). Then times
+differential reimports (app.import_diff.run_reimport) of the scaled corpus:
+unchanged, and with one 60-jiazi entry edited.
+
+Usage: python benchmarks/bulk_import.py [--factor 100]
+"""
+import argparse
+import copy
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_tmp_dir = tempfile.mkdtemp(prefix="liushijiazi-import-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'liushijiazi.db')}"
+sys.path.insert(0, BACKEND_DIR)
+
+from app.database import SessionLocal, engine, init_db
+from app.import_data import StageTimer, load_sources, run_import
+from app.import_diff import record_hashes, run_reimport
+
+
+def _scaled(values, factor):
+    """A list repeated factor times; copies after the first get a suffix"""
+    return [value if k == 0 else f"{value}·{k}" for k in range(factor) for value in values]
+
+
+def _scale_entry(entry, factor):
+    scaled = dict(entry)
+    for key in ("核心象意", "神煞", "喜", "忌"):
+        if key in entry:
+            scaled[key] = _scaled(entry[key], factor)
+    if "细分象意" in entry:
+        scaled["细分象意"] = {category: _scaled(values, factor) for category, values in entry["细分象意"].items()}
+    return scaled
+
+
+def scale_corpus(xiangyi_data, kg_data, factor):
+    """A corpus factor times larger than the sources"""
+    xiangyi = dict(xiangyi_data)
+    for section in ("shi_tian_gan", "shi_er_di_zhi", "liu_shi_jia_zi_na_yin"):
+        xiangyi[section] = {key: _scale_entry(entry, factor) for key, entry in xiangyi_data.get(section, {}).items()}
+
+    graph = kg_data.get("knowledge_graph", {})
+    nodes = [
+        {**node, "label": label}
+        for node in graph.get("nodes", [])
+        for label in (_scaled([node.get("label")], factor) if node.get("type") == "神煞" else [node.get("label")])
+    ]
+    edges = [
+        {**edge, "relation": relation}
+        for edge in graph.get("edges", [])
+        for relation in _scaled([edge.get("relation", "")], factor)
+    ]
+    return xiangyi, {**kg_data, "knowledge_graph": {**graph, "nodes": nodes, "edges": edges}}
+
+
+def run(label, xiangyi_data, kg_data):
+    print(f"\n--- {label} ---")
+    timer = StageTimer()
+    db = SessionLocal()
+    try:
+        counts = run_import(db, xiangyi_data, kg_data, timer, record_hashes(xiangyi_data, kg_data))
+    finally:
+        db.close()
+    timer.report()
+    rows = sum(v for k, v in counts.items() if k != "search_index")
+    print(f"  {rows} rows, {counts['search_index']} search documents: "
+          f"{rows / timer.total:,.0f} rows/s")
+
+
+def run_diff(label, xiangyi_data, kg_data):
+    print(f"\n--- {label} ---")
+    timer = StageTimer()
+    db = SessionLocal()
+    try:
+        plan = run_reimport(db, xiangyi_data, kg_data, timer=timer)
+    finally:
+        db.close()
+    timer.report()
+    print("  " + ", ".join(f"{name} {diff.summary()}" for name, diff in plan.tables.items()))
+
+
+def edit_one_entry(xiangyi_data):
+    """A copy with the remark and the first 喜 of one 60-jiazi entry changed"""
+    edited = copy.deepcopy(xiangyi_data)
+    entry = next(iter(edited["liu_shi_jia_zi_na_yin"].values()))
+    entry["备注"] = entry.get("备注", "") + "（修订）"
+    entry["喜"] = ["新喜"] + entry.get("喜", [])[1:]
+    return edited
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=100)
+    args = parser.parse_args()
+
+    init_db()
+    xiangyi_data, kg_data = load_sources(os.path.dirname(BACKEND_DIR))
+    try:
+        run("sources", xiangyi_data, kg_data)
+        scaled = scale_corpus(xiangyi_data, kg_data, args.factor)
+        run(f"{args.factor}x corpus", *scaled)
+        run_diff(f"{args.factor}x corpus, differential, unchanged", *scaled)
+        run_diff(f"{args.factor}x corpus, differential, one entry edited", edit_one_entry(scaled[0]), scaled[1])
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
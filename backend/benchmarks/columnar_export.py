@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Columnar export benchmark.
+
+Imports a corpus scaled up by --factor (see bulk_import.py) into a temporary
+database, starts a server on it and, for the xiangyi table, compares the JSON
+export with the columnar downloads: size, first (generating) and cached
+request time, and the client-side time to load the body into columns
+(json.loads for JSON; pyarrow readers, when installed, for the others).
+
+Usage: python benchmarks/columnar_export.py [--factor 100]
+"""
+import argparse
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import httpx
+
+from bulk_import import BACKEND_DIR, scale_corpus
+from concurrency import free_port, start_server
+
+from app.database import SessionLocal, engine, init_db
+from app.import_data import load_sources, run_import
+
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+def load_json(body):
+    rows = json.loads(body)
+    return {name: [row[name] for row in rows] for name in rows[0]}
+
+
+def load_csv_gz(body):
+    if pyarrow is None:
+        import csv
+        lines = list(csv.reader(io.StringIO(gzip.decompress(body).decode("utf-8"))))
+        return dict(zip(lines[0], zip(*lines[1:])))
+    return pyarrow.csv.read_csv(pyarrow.CompressedInputStream(pyarrow.BufferReader(body), "gzip"))
+
+
+LOADERS = {
+    "export/xiangyi (JSON)": ("/api/admin/export/xiangyi", load_json),
+    "columnar/xiangyi.csv.gz": ("/api/admin/columnar/xiangyi.csv.gz", load_csv_gz),
+}
+if pyarrow is not None:
+    LOADERS["columnar/xiangyi.arrow"] = (
+        "/api/admin/columnar/xiangyi.arrow", lambda body: pyarrow.ipc.open_file(pyarrow.BufferReader(body)).read_all())
+    LOADERS["columnar/xiangyi.parquet"] = (
+        "/api/admin/columnar/xiangyi.parquet", lambda body: pyarrow.parquet.read_table(pyarrow.BufferReader(body)))
+
+
+def timed_get(http, path):
+    start = time.perf_counter()
+    r = http.get(path, headers={"Accept-Encoding": "identity"})
+    r.raise_for_status()
+    return r.content, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=100)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        counts = run_import(db, *scale_corpus(*load_sources(os.path.dirname(BACKEND_DIR)), args.factor))
+    finally:
+        db.close()
+        engine.dispose()
+
+    cache_dir = tempfile.mkdtemp(prefix="liushijiazi-columnar-")
+    port = free_port()
+    process = start_server(BACKEND_DIR, port, os.environ["DATABASE_URL"], env={"COLUMNAR_CACHE_DIR": cache_dir})
+    try:
+        print("=" * 84)
+        print(f"Columnar export: {args.factor}x corpus ({counts['xiangyi']} xiangyi rows)"
+              + ("" if pyarrow else ", pyarrow not installed"))
+        print("=" * 84)
+        print(f"{'download':<28} {'MiB':>6} {'first ms':>9} {'cached ms':>10} {'load ms':>8}")
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=300) as http:
+            for label, (path, loader) in LOADERS.items():
+                _, first = timed_get(http, path)
+                body, cached = timed_get(http, path)
+                start = time.perf_counter()
+                loader(body)
+                load = (time.perf_counter() - start) * 1000
+                print(f"{label:<28} {len(body) / 2 ** 20:>6.2f} {first:>9.1f} {cached:>10.1f} {load:>8.1f}")
+    finally:
+        process.terminate()
+        process.wait()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
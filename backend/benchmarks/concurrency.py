@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark.
+
+Starts a single-worker uvicorn server on a copy of the database and drives it
+with N concurrent keep-alive clients for a fixed duration per level, reporting
+throughput, latency percentiles and errors. Point --app-dir at another
+checkout (e.g. a git worktree of an older commit) to compare before/after.
+
+Usage: python benchmarks/concurrency.py [--levels 50 200 1000] [--duration 10] [--app-dir .]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Request mix: snapshot-served reads, FTS and autocomplete
+PATHS = [
+    "/api/ganzhi/甲子",
+    "/api/ganzhi/癸亥",
+    "/api/nayin",
+    "/api/nayin/by-ganzhi/丙寅",
+    "/api/shensha/ganzhi/甲子",
+    "/api/guanxi/between/甲子/庚午",
+    "/api/guanxi/ganzhi/乙丑",
+    "/api/search?q=森林",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app_dir: str, port: int, db_url: str, env=None, stderr=None) -> subprocess.Popen:
+    env = {**os.environ, **(env or {}), "DATABASE_URL": db_url}
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=app_dir, env=env, stderr=stderr
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/api/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("server did not start")
+
+
+async def run_level(base_url: str, clients: int, duration: float) -> dict:
+    latencies = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        async def client(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    r = await http.get(PATHS[i % len(PATHS)])
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+                i += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client(n) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": pct(0.50),
+        "p99": pct(0.99),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--app-dir", default=BACKEND_DIR, help="backend directory to serve")
+    parser.add_argument("--url", help="Benchmark an already running server instead")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="liushijiazi-bench-")
+    process = None
+    try:
+        base_url = args.url
+        if base_url is None:
+            db_path = os.path.join(tmp_dir, "liushijiazi.db")
+            shutil.copy(os.path.join(args.app_dir, "data", "liushijiazi.db"), db_path)
+            port = free_port()
+            process = start_server(args.app_dir, port, f"sqlite:///{db_path}")
+            base_url = f"http://127.0.0.1:{port}"
+
+        # Warm up: one sequential pass (also builds lazily created indexes)
+        for path in PATHS:
+            httpx.get(base_url + path, timeout=60)
+
+        print("=" * 60)
+        print(f"Concurrency benchmark: {base_url} ({args.duration:.0f}s per level)")
+        print("=" * 60)
+        print(f"{'clients':>8} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for level in args.levels:
+            result = asyncio.run(run_level(base_url, level, args.duration))
+            print(f"{result['clients']:>8} {result['requests']:>9} {result['rps']:>9.0f} "
+                  f"{result['p50']:>9.1f} {result['p99']:>9.1f} {result['errors']:>7}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
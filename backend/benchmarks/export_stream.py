@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Export streaming benchmark.
+
+Imports a corpus scaled up by --factor (see bulk_import.py) into a temporary
+database, then for each export variant starts a fresh server on it and
+downloads the export once, reporting time to first byte, total time, size and
+the server's peak RSS (VmHWM) growth over its idle footprint. Point --app-dir
+at another checkout to compare before/after.
+
+Usage: python benchmarks/export_stream.py [--factor 100] [--app-dir .]
+"""
+import argparse
+import os
+import time
+
+import httpx
+
+from bulk_import import BACKEND_DIR, scale_corpus
+from concurrency import free_port, start_server
+
+from app.database import SessionLocal, engine, init_db
+from app.import_data import load_sources, run_import
+
+VARIANTS = [
+    "/api/admin/export/xiangyi",
+    "/api/admin/export/xiangyi?format=ndjson",
+    "/api/admin/export/xiangyi?gzip=true",
+    "/api/admin/export/all",
+]
+
+
+def memory_kib(pid, field):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(app_dir, db_url, path):
+    port = free_port()
+    process = start_server(app_dir, port, db_url)
+    try:
+        idle = memory_kib(process.pid, "VmRSS")
+        start = time.perf_counter()
+        first = None
+        size = 0
+        with httpx.stream("GET", f"http://127.0.0.1:{port}{path}", timeout=300,
+                          headers={"Accept-Encoding": "identity"}) as r:
+            if r.status_code != 200:
+                return None
+            for chunk in r.iter_raw():
+                if first is None:
+                    first = time.perf_counter() - start
+                size += len(chunk)
+        total = time.perf_counter() - start
+        peak = memory_kib(process.pid, "VmHWM")
+    finally:
+        process.terminate()
+        process.wait()
+    return {"ttfb": first * 1000, "total": total * 1000, "size": size, "rss": (peak - idle) / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--factor", type=int, default=100)
+    parser.add_argument("--app-dir", default=BACKEND_DIR, help="backend directory to serve")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        counts = run_import(db, *scale_corpus(*load_sources(os.path.dirname(BACKEND_DIR)), args.factor))
+    finally:
+        db.close()
+        engine.dispose()
+    db_url = os.environ["DATABASE_URL"]
+
+    print("=" * 72)
+    print(f"Export streaming: {args.factor}x corpus ({counts['xiangyi']} xiangyi rows), app {args.app_dir}")
+    print("=" * 72)
+    print(f"{'export':<44} {'TTFB ms':>8} {'total ms':>9} {'MiB':>6} {'+RSS MiB':>9}")
+    for path in VARIANTS:
+        result = measure(args.app_dir, db_url, path)
+        label = path.replace("/api/admin/export/", "")
+        if result is None:
+            print(f"{label:<44} {'unsupported':>8}")
+            continue
+        print(f"{label:<44} {result['ttfb']:>8.1f} {result['total']:>9.1f} "
+              f"{result['size'] / 2 ** 20:>6.1f} {result['rss']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Knowledge graph benchmark.
+
+Multi-hop exploration over the relation types stored in the guanxi table
+(同天干, 同地支, 同位, 隔八生子), from each of the 60 Ganzhi, done two ways:
+- chained SQL: one query per hop on the guanxi table, the frontier passed as
+  an IN list (what exploring with the existing tables costs)
+- the in-memory graph (app/graph.py): BFS and typed-path traversals over the
+  CSR adjacency of the snapshot
+Reports queries/s for k-hop neighbourhoods (k = 1..--depth) and for the typed
+path 同天干 then 同地支, checks that both ways find the same nodes and paths,
+and times compiling the graph.
+
+Usage: python benchmarks/graph.py [--depth 3] [--rounds 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import or_, select
+
+from app.database import SessionLocal
+from app.graph import build_graph, load_kg_data
+from app.models import Guanxi
+from app.relations import CYCLE
+from app.store import KnowledgeSnapshot
+
+
+STORED_TYPES = ["同天干", "同地支", "同位", "隔八生子"]
+TYPED_PATH = ["同天干", "同地支"]
+
+
+def best_of(rounds, fn):
+    times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def sql_neighbours(db, frontier, types):
+    """{ganzhi: set(neighbours)} of a frontier, one query"""
+    table = Guanxi.__table__
+    rows = db.execute(
+        select(table.c.ganzhi1, table.c.ganzhi2).where(
+            table.c.relation_type.in_(types),
+            or_(table.c.ganzhi1.in_(frontier), table.c.ganzhi2.in_(frontier)),
+        )
+    ).all()
+    found = {}
+    for g1, g2 in rows:
+        if g1 in frontier:
+            found.setdefault(g1, set()).add(g2)
+        if g2 in frontier:
+            found.setdefault(g2, set()).add(g1)
+    return found
+
+
+def sql_khop(db, source, depth):
+    seen, frontier = {source}, {source}
+    for _ in range(depth):
+        following = set().union(*sql_neighbours(db, frontier, STORED_TYPES).values()) - seen
+        if not following:
+            break
+        seen |= following
+        frontier = following
+    return seen
+
+
+def sql_typed_paths(db, source, pattern):
+    paths = [(source,)]
+    for relation in pattern:
+        found = sql_neighbours(db, {p[-1] for p in paths}, [relation])
+        paths = [(*p, w) for p in paths for w in sorted(found.get(p[-1], ())) if w not in p]
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        snapshot = KnowledgeSnapshot.from_session(db)
+        kg_data = load_kg_data()
+        build, graph = best_of(args.rounds, lambda: build_graph(
+            snapshot.ganzhi, snapshot.nayin, snapshot.xiangyi, snapshot.shensha, snapshot.ganzhi_shensha,
+            snapshot.xiji, snapshot.relation_matrix, kg_data))
+        sources = [graph.resolve(name)[0] for name in CYCLE]
+        stored = graph.edge_type_ids(STORED_TYPES)
+        label = {v: n["label"] for v, n in enumerate(graph.nodes)}
+
+        print("=" * 78)
+        print(f"Knowledge graph: {len(graph.nodes)} nodes, {graph.edge_count} edges, "
+              f"compiled in {build * 1000:.1f} ms")
+        print("=" * 78)
+        print(f"{'query (x60 sources)':<24} {'chained SQL q/s':>16} {'graph q/s':>12} {'speedup':>9} {'agree':>7}")
+
+        for depth in range(1, args.depth + 1):
+            sql, by_sql = best_of(args.rounds, lambda: [sql_khop(db, name, depth) for name in CYCLE])
+            mem, by_graph = best_of(args.rounds, lambda: [
+                {label[graph.node_index[r["node"]["id"]]] for r in graph.bfs(v, depth, stored)} for v in sources])
+            print(f"{f'{depth}-hop neighbourhood':<24} {60 / sql:>16,.0f} {60 / mem:>12,.0f} "
+                  f"{sql / mem:>8.0f}x {str(by_sql == by_graph):>7}")
+
+        pattern = [graph.type_index[t] for t in TYPED_PATH]
+        sql, by_sql = best_of(args.rounds, lambda: [sql_typed_paths(db, name, TYPED_PATH) for name in CYCLE])
+        mem, by_graph = best_of(args.rounds, lambda: [
+            sorted(tuple(label[graph.node_index[i]] for i in p["nodes"]) for p in graph.typed_paths(v, pattern))
+            for v in sources])
+        agree = [sorted(paths) for paths in by_sql] == by_graph
+        print(f"{f'typed path ({len(TYPED_PATH)} hops)':<24} {60 / sql:>16,.0f} {60 / mem:>12,.0f} "
+              f"{sql / mem:>8.0f}x {str(agree):>7}")
+        print(f"\nk-hop over {', '.join(STORED_TYPES)}; typed path {' then '.join(TYPED_PATH)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Nayin calculation benchmark and consistency report.
+
+Measures calc_nayin throughput (single lookups and the batch endpoint) and
+checks every calculation method against the stored Nayin.nayin_name.
+
+Usage: python benchmarks/nayin_calc.py [--batch-size 5000] [--rounds 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.crud.nayin import calc_nayin, check_calc_consistency
+from app.database import SessionLocal
+from app.main import app
+from app.relations import CYCLE
+
+
+def bench_lookup(rounds):
+    names = list(CYCLE) * 1000
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name in names:
+            calc_nayin(name)
+    elapsed = time.perf_counter() - start
+    return len(names) * rounds / elapsed
+
+
+def bench_batch_endpoint(client, batch_size, rounds):
+    payload = {"ganzhi_list": [CYCLE[i % 60] for i in range(batch_size)]}
+    client.post("/api/nayin/calc/batch", json=payload)  # warm up
+    start = time.perf_counter()
+    for _ in range(rounds):
+        r = client.post("/api/nayin/calc/batch", json=payload)
+        assert r.status_code == 200
+    elapsed = time.perf_counter() - start
+    return batch_size * rounds / elapsed, elapsed / rounds
+
+
+def print_consistency():
+    db = SessionLocal()
+    try:
+        report = check_calc_consistency(db)
+    finally:
+        db.close()
+
+    print(f"\nConsistency against stored nayin_name ({report['total']} ganzhi):")
+    for name, result in report["methods"].items():
+        print(f"  {name}: {result['matched']}/{report['total']} match")
+        for miss in result["mismatches"][:5]:
+            print(f"    {miss['ganzhi']}: stored {miss['stored']}, calculated {miss['calculated']}")
+        if len(result["mismatches"]) > 5:
+            print(f"    ... {len(result['mismatches']) - 5} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    print("=" * 50)
+    print("Nayin calculation benchmark")
+    print("=" * 50)
+    print(f"calc_nayin lookup: {bench_lookup(args.rounds):,.0f} calls/s")
+
+    with TestClient(app) as client:
+        throughput, per_request = bench_batch_endpoint(client, args.batch_size, args.rounds)
+    print(f"POST /api/nayin/calc/batch ({args.batch_size} items): "
+          f"{throughput:,.0f} items/s, {per_request * 1000:.1f} ms/request")
+
+    print_consistency()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+NDJSON ingest benchmark.
+
+Starts a server on a copy of the database and streams --rows synthetic
+xiangyi rows (one invalid line every 1000) to POST /api/admin/ingest/xiangyi
+as a chunked upload generated on the fly, reporting throughput, the number of
+progress/error events and the server's peak RSS (VmHWM) growth over its idle
+footprint while staging and after the swap (which reloads the knowledge
+snapshot and search index for the new table), for each --batch-sizes value.
+
+Usage: python benchmarks/ndjson_ingest.py [--rows 200000] [--batch-sizes 100 1000 10000]
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import httpx
+
+from concurrency import BACKEND_DIR, free_port, start_server
+from export_stream import memory_kib
+
+
+def body(rows, chunk_rows=500):
+    """NDJSON upload, generated chunk by chunk"""
+    lines = []
+    for i in range(rows):
+        if i % 1000 == 999:
+            lines.append('{"ganzhi_id": "invalid"}')
+        else:
+            lines.append(json.dumps({
+                "ganzhi_id": i % 60 + 1, "type": "细分", "category": "基准",
+                "content": f"象意{i}", "description": "批量导入基准测试行" * 4, "source": "推理", "confidence": 0.5,
+            }, ensure_ascii=False))
+        if len(lines) == chunk_rows:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def run(port, pid, rows, batch_size):
+    idle = memory_kib(pid, "VmRSS")
+    counts = {"progress": 0, "error": 0}
+    staging_peak = idle
+    final = None
+    start = time.perf_counter()
+    with httpx.Client(timeout=600) as http:
+        with http.stream("POST", f"http://127.0.0.1:{port}/api/admin/ingest/xiangyi?batch_size={batch_size}",
+                         content=body(rows), headers={"Content-Type": "application/x-ndjson"}) as r:
+            for line in r.iter_lines():
+                event = json.loads(line)
+                counts[event["event"]] = counts.get(event["event"], 0) + 1
+                if event["event"] == "progress":
+                    staging_peak = memory_kib(pid, "VmHWM")
+                final = event
+    elapsed = time.perf_counter() - start
+    peak = memory_kib(pid, "VmHWM")
+    print(f"{batch_size:>8} {final['event']:>8} {final.get('staged', 0):>9} {counts['error']:>7} "
+          f"{counts['progress']:>9} {final.get('staged', 0) / elapsed:>9,.0f} {(staging_peak - idle) / 1024:>11.1f} {(peak - idle) / 1024:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print(f"NDJSON ingest: {args.rows} xiangyi rows per upload")
+    print("=" * 72)
+    print(f"{'batch':>8} {'result':>8} {'rows':>9} {'errors':>7} {'progress':>9} {'rows/s':>9} {'+RSS stage':>11} {'+RSS swap':>10}")
+    for batch_size in args.batch_sizes:
+        tmp_dir = tempfile.mkdtemp(prefix="liushijiazi-ingest-")
+        db_path = os.path.join(tmp_dir, "liushijiazi.db")
+        shutil.copy(os.path.join(BACKEND_DIR, "data", "liushijiazi.db"), db_path)
+        port = free_port()
+        process = start_server(BACKEND_DIR, port, f"sqlite:///{db_path}")
+        try:
+            run(port, process.pid, args.rows, batch_size)
+        finally:
+            process.terminate()
+            process.wait()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
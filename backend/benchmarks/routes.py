@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Route benchmark suite.
+
+Drives every route of app.main in process (httpx over the ASGI app, with the
+app's lifespan, on a copy of the bundled database) and reports per route:
+ops/sec and p50/p95/p99 latency over --rounds of --iterations requests, the
+peak memory allocated while serving one request (tracemalloc) and the SQL
+statements per request. Routes that write (imports, ingest) are listed in
+SKIPPED; a route with neither a sample request nor a skip reason is an error,
+so new routes must be added here.
+
+Results are compared with a JSON baseline (benchmarks/baselines/routes.json,
+or routes-db.json with --no-snapshot). Baseline latencies are first scaled by
+how much slower or faster the machine is than when the baseline was taken:
+the median of every route's p50 ratio, which a regression in a few routes
+does not move. A route regresses when its p50 exceeds the scaled baseline by
+more than --threshold (and by more than --min-delta-ms), when its allocation
+peak grows by more than --threshold (and 128 KiB), or when it issues more SQL
+statements. A regressed route is measured once more and keeps its better
+result; a regression that reproduces exits with status 1. --save writes the
+current results as the new baseline.
+
+Usage: python benchmarks/routes.py [--iterations 100] [--rounds 5] [--threshold 0.5] [--no-snapshot]
+                                   [--route SUBSTRING] [--save]
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_DIR = os.path.join(BACKEND_DIR, "benchmarks", "baselines")
+_tmp_dir = tempfile.mkdtemp(prefix="liushijiazi-routes-")
+shutil.copy(os.path.join(BACKEND_DIR, "data", "liushijiazi.db"), os.path.join(_tmp_dir, "liushijiazi.db"))
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'liushijiazi.db')}"
+os.environ["COLUMNAR_CACHE_DIR"] = os.path.join(_tmp_dir, "columnar")
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+from sqlalchemy import event
+
+from app.database import async_engine, async_read_engine, engine
+from app.main import app
+from app.store import knowledge_store
+
+
+SIXTY_GANZHI = ["甲乙丙丁戊己庚辛壬癸"[i % 10] + "子丑寅卯辰巳午未申酉戌亥"[i % 12] for i in range(60)]
+SAMPLE_CHARTS = [[SIXTY_GANZHI[(k * 7 + pillar * 13) % 60] for pillar in range(4)] for k in range(1000)]
+
+# "METHOD /template" -> (path, JSON body or None)
+ROUTES = {
+    "GET /": ("/", None),
+    "GET /api/health": ("/api/health", None),
+    "GET /api/metrics": ("/api/metrics", None),
+    "GET /api/ganzhi": ("/api/ganzhi", None),
+    "GET /api/ganzhi/search": ("/api/ganzhi/search?q=甲", None),
+    "GET /api/ganzhi/names": ("/api/ganzhi/names", None),
+    "GET /api/ganzhi/{ganzhi_name}": ("/api/ganzhi/甲子", None),
+    "POST /api/ganzhi/compare": ("/api/ganzhi/compare", {"ganzhi_list": ["甲子", "乙丑", "丙寅", "丁卯"]}),
+    "POST /api/ganzhi/batch": ("/api/ganzhi/batch", {"names": SIXTY_GANZHI}),
+    "GET /api/nayin/by-ganzhi/{ganzhi}": ("/api/nayin/by-ganzhi/甲子", None),
+    "GET /api/nayin/{nayin_name}/ganzhi": ("/api/nayin/海中金/ganzhi", None),
+    "GET /api/nayin": ("/api/nayin", None),
+    "GET /api/nayin/status": ("/api/nayin/status", None),
+    "GET /api/nayin/status/{status}": ("/api/nayin/status/旺", None),
+    "GET /api/nayin/category/{category}": ("/api/nayin/category/shengda", None),
+    "GET /api/nayin/calc/{ganzhi}": ("/api/nayin/calc/甲子", None),
+    "POST /api/nayin/calc/batch": ("/api/nayin/calc/batch", {"ganzhi_list": ["甲子", "乙丑", "丙寅", "丁卯"]}),
+    "GET /api/shensha": ("/api/shensha", None),
+    "GET /api/shensha/types": ("/api/shensha/types", None),
+    "GET /api/shensha/type/{shensha_type}": ("/api/shensha/type/组合神煞", None),
+    "GET /api/shensha/zixing": ("/api/shensha/zixing", None),
+    "GET /api/shensha/intersect": ("/api/shensha/intersect?names=天乙&names=贵人", None),
+    "GET /api/shensha/ganzhi/{ganzhi_name}": ("/api/shensha/ganzhi/甲子", None),
+    "GET /api/shensha/{shensha_name}": ("/api/shensha/天乙", None),
+    "GET /api/shensha/{shensha_name}/ganzhi": ("/api/shensha/天乙/ganzhi", None),
+    "GET /api/guanxi": ("/api/guanxi", None),
+    "GET /api/guanxi/types": ("/api/guanxi/types", None),
+    "GET /api/guanxi/type/{relation_type}": ("/api/guanxi/type/六合", None),
+    "GET /api/guanxi/ganzhi/{ganzhi_name}": ("/api/guanxi/ganzhi/甲子", None),
+    "GET /api/guanxi/between/{ganzhi1}/{ganzhi2}": ("/api/guanxi/between/甲子/乙丑", None),
+    "POST /api/guanxi/masks": ("/api/guanxi/masks", {"pairs": [["甲子", "乙丑"], ["甲子", "庚午"], ["丙寅", "壬申"]]}),
+    "GET /api/search": ("/api/search?q=金", None),
+    "GET /api/search/suggest": ("/api/search/suggest?q=甲", None),
+    "POST /api/chart/analyze": ("/api/chart/analyze", {"year": "甲子", "month": "丙寅", "day": "庚午", "hour": "丙子"}),
+    "POST /api/chart/analyze/bulk": ("/api/chart/analyze/bulk", {"charts": SAMPLE_CHARTS}),
+    "GET /api/calendar/pillars": ("/api/calendar/pillars?datetime=2008-08-08T20:00", None),
+    "POST /api/calendar/pillars/bulk": (
+        "/api/calendar/pillars/bulk", {"start": "2024-01-01T00:00", "end": "2025-01-01T00:00", "step_minutes": 60}),
+    "GET /api/graph/schema": ("/api/graph/schema", None),
+    "GET /api/graph/nodes/{ref}": ("/api/graph/nodes/甲子", None),
+    "GET /api/graph/neighbors/{ref}": ("/api/graph/neighbors/甲子", None),
+    "GET /api/graph/bfs/{ref}": ("/api/graph/bfs/甲子?depth=3&limit=10000", None),
+    "GET /api/graph/path": ("/api/graph/path?source=甲子&target=南方", None),
+    "GET /api/graph/typed-paths/{ref}": ("/api/graph/typed-paths/甲子?pattern=六合&pattern=六冲&pattern=六害", None),
+    "GET /api/admin/stats": ("/api/admin/stats", None),
+    "GET /api/admin/ganzhi": ("/api/admin/ganzhi", None),
+    "GET /api/admin/ganzhi/{ganzhi_name}": ("/api/admin/ganzhi/甲子", None),
+    "GET /api/admin/nayin": ("/api/admin/nayin", None),
+    "GET /api/admin/xiangyi": ("/api/admin/xiangyi", None),
+    "GET /api/admin/shensha": ("/api/admin/shensha", None),
+    "GET /api/admin/ganzhi-shensha": ("/api/admin/ganzhi-shensha", None),
+    "GET /api/admin/xiji": ("/api/admin/xiji", None),
+    "GET /api/admin/guanxi": ("/api/admin/guanxi", None),
+    "GET /api/admin/export/all": ("/api/admin/export/all", None),
+    "GET /api/admin/export/{table}": ("/api/admin/export/xiangyi", None),
+    "GET /api/admin/columnar": ("/api/admin/columnar", None),
+    "GET /api/admin/columnar/{filename}": ("/api/admin/columnar/xiangyi.csv.gz", None),
+    "GET /api/admin/profiler": ("/api/admin/profiler", None),
+    "GET /api/admin/health": ("/api/admin/health", None),
+}
+
+# Minimum number of routes with a baseline for the machine speed ratio to be
+# estimated (fewer: assume the baseline machine speed)
+MIN_ROUTES_FOR_SPEED = 5
+# Allocation changes below this are noise (buffers, GC timing)
+MIN_ALLOC_DELTA_KIB = 128
+
+SKIPPED = {
+    "POST /api/admin/import/ganzhi": "replaces a table",
+    "POST /api/admin/import/nayin": "replaces a table",
+    "POST /api/admin/ingest/{table}": "replaces a table (benchmarks/ndjson_ingest.py)",
+    "DELETE /api/admin/profiler": "clears state",
+}
+
+
+def app_routes() -> list:
+    """"METHOD /template" of every route in the OpenAPI schema"""
+    return [f"{method.upper()} {path}" for path, operations in app.openapi()["paths"].items() for method in operations]
+
+
+class SQLCounter:
+    """Counts statements on the writer, async writer and reader engines"""
+
+    def __init__(self):
+        self.count = 0
+        for target in {engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+            event.listen(target, "before_cursor_execute", self._record)
+
+    def _record(self, *args):
+        self.count += 1
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def measure(client, sql, method, path, body, iterations, rounds, alloc_iterations):
+    """
+    Latency percentiles, ops/sec, allocation peak and SQL per request of one
+    route. p50 and ops/sec are the best of the rounds (like timeit), which
+    damps interference from the rest of the machine; p95/p99 pool every round.
+    """
+    async def request():
+        r = await client.request(method, path, json=body)
+        r.raise_for_status()
+
+    for _ in range(max(3, iterations // 10)):
+        await request()
+
+    latencies = []
+    round_p50s = []
+    round_ops = []
+    sql.count = 0
+    # Cyclic GC off while timing, as timeit does: when a collection lands
+    # depends on everything allocated before, not on the route
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            round_latencies = []
+            started = time.perf_counter()
+            for _ in range(iterations):
+                t0 = time.perf_counter()
+                await request()
+                round_latencies.append(time.perf_counter() - t0)
+            round_ops.append(iterations / (time.perf_counter() - started))
+            round_p50s.append(statistics.median(round_latencies))
+            latencies += round_latencies
+    finally:
+        gc.enable()
+    statements = sql.count / (iterations * rounds)
+
+    # Smallest peak: the others include garbage left over from earlier requests
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(alloc_iterations):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            await request()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "ops": round(max(round_ops), 1),
+        "p50_ms": round(min(round_p50s) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "alloc_kib": round(min(peaks) / 1024, 1),
+        "sql": round(statements, 2),
+    }
+
+
+def regressions(label, result, baseline, speed, threshold, min_delta_ms):
+    """Reasons a route regressed against its baseline (p50 scaled by the machine speed ratio)"""
+    if baseline is None:
+        return []
+    reasons = []
+    expected = baseline["p50_ms"] * speed
+    if result["p50_ms"] > expected * (1 + threshold) and result["p50_ms"] - expected > min_delta_ms:
+        reasons.append(f"p50 {baseline['p50_ms']} -> {result['p50_ms']} ms (expected {expected:.3f} at this speed)")
+    if result["alloc_kib"] > baseline["alloc_kib"] * (1 + threshold) and \
+            result["alloc_kib"] - baseline["alloc_kib"] > MIN_ALLOC_DELTA_KIB:
+        reasons.append(f"alloc {baseline['alloc_kib']} -> {result['alloc_kib']} KiB")
+    if result["sql"] > baseline["sql"]:
+        reasons.append(f"sql {baseline['sql']} -> {result['sql']}")
+    return [f"{label}: {reason}" for reason in reasons]
+
+
+async def run(args):
+    missing = [route for route in app_routes() if route not in ROUTES and route not in SKIPPED]
+    if missing:
+        sys.exit(f"no sample request for: {', '.join(missing)}")
+
+    baseline_path = args.baseline or os.path.join(
+        BASELINE_DIR, "routes-db.json" if args.no_snapshot else "routes.json")
+    baseline = {}
+    if os.path.exists(baseline_path) and not args.save:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)["routes"]
+
+    sql = SQLCounter()
+    results = {}
+    failures = []
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        if args.no_snapshot:
+            knowledge_store.clear()
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"Measuring {args.rounds} x {args.iterations} requests per route...")
+            for label, (path, body) in ROUTES.items():
+                if args.route and args.route not in label:
+                    continue
+                method = label.split(" ", 1)[0]
+                results[label] = await measure(
+                    client, sql, method, path, body, args.iterations, args.rounds, args.alloc_iterations)
+
+            ratios = [result["p50_ms"] / baseline[label]["p50_ms"] for label, result in results.items() if label in baseline]
+            speed = statistics.median(ratios) if len(ratios) >= MIN_ROUTES_FOR_SPEED else 1.0
+            # A real regression reproduces; a burst of load on the machine does not
+            for label, result in results.items():
+                if regressions(label, result, baseline.get(label), speed, args.threshold, args.min_delta_ms):
+                    path, body = ROUTES[label]
+                    retry = await measure(client, sql, label.split(" ", 1)[0], path, body,
+                                          args.iterations, args.rounds, args.alloc_iterations)
+                    results[label] = {
+                        key: min(result[key], retry[key]) if key != "ops" else max(result[key], retry[key])
+                        for key in result
+                    }
+
+    print("=" * 110)
+    print(f"Routes: {args.rounds} x {args.iterations} requests each, "
+          f"{'database path' if args.no_snapshot else 'snapshot loaded'}, baseline {os.path.relpath(baseline_path)}"
+          + ("" if baseline else " (none)"))
+    print("=" * 110)
+    print(f"{'route':<46} {'ops/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KiB':>8} {'SQL':>5} {'p50 vs base':>12}")
+    for label, result in results.items():
+        base = baseline.get(label)
+        change = f"{(result['p50_ms'] / (base['p50_ms'] * speed) - 1) * 100:+.0f}%" if base else ""
+        print(f"{label:<46} {result['ops']:>8,.0f} {result['p50_ms']:>8.3f} {result['p95_ms']:>8.3f} "
+              f"{result['p99_ms']:>8.3f} {result['alloc_kib']:>8.1f} {result['sql']:>5g} {change:>12}")
+        failures += regressions(label, result, base, speed, args.threshold, args.min_delta_ms)
+    if baseline:
+        print(f"\nMachine speed: median route latency {speed:.2f}x the baseline (applied to every baseline)")
+
+    if args.save:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        if args.route and os.path.exists(baseline_path):
+            with open(baseline_path, encoding="utf-8") as f:
+                results = {**json.load(f)["routes"], **results}
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({"iterations": args.iterations, "rounds": args.rounds, "routes": results}, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {os.path.relpath(baseline_path)}")
+
+    print(f"\nSkipped: {', '.join(f'{route} ({reason})' for route, reason in SKIPPED.items())}")
+    if failures:
+        print(f"\n{len(failures)} regressions (threshold {args.threshold:.0%}):")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100, help="requests per round")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--alloc-iterations", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed relative p50 / allocation growth")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="ignore p50 changes smaller than this (sub-millisecond routes jitter by ~0.3 ms)")
+    parser.add_argument("--no-snapshot", action="store_true", help="serve reads from the database")
+    parser.add_argument("--route", help="only routes whose label contains this")
+    parser.add_argument("--baseline", help="baseline JSON path")
+    parser.add_argument("--save", action="store_true", help="write the results as the baseline")
+    args = parser.parse_args()
+    try:
+        status = asyncio.run(run(args))
+    finally:
+        engine.dispose()
+        shutil.rmtree(_tmp_dir, ignore_errors=True)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Calendar (Gregorian -> four pillars) benchmark.
+
+Converts minute-spaced timestamp arrays of growing size with
+app.sexagenary.pillars and reports timestamps/s for:
+- pillars(): the 节 boundary instants solved once per year in range and every
+  timestamp placed among them by binary search
+- per-timestamp trigonometry: the sun's longitude evaluated for every
+  timestamp (what pillars() avoids), as a reference up to 1,000,000
+  timestamps (the VSOP87 series cost microseconds each); its month index
+  must agree with pillars() everywhere
+- a Python loop calling pillars() once per timestamp (only the smallest size)
+and the latency of POST /api/calendar/pillars/bulk for an hourly range of
+--bulk-days days.
+
+Usage: python benchmarks/sexagenary.py [--sizes 10000 100000 1000000 10000000] [--rounds 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from app import sexagenary
+from app.main import app
+
+
+START = np.datetime64("1900-01-01T00:00")
+LOOP_SIZE = 2000
+TRIG_MAX_SIZE = 1000000
+
+
+def best_of(rounds, fn):
+    times = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def timestamps(size):
+    """size timestamps spaced so they cover 1900-2100"""
+    step = max(1, (200 * 365 * 1440) // size)
+    return START + np.arange(size, dtype=np.int64) * np.timedelta64(step, "m")
+
+
+def month_by_longitude(values):
+    """Month since 立春 (0-11) from the sun's longitude at every timestamp"""
+    ut = values - np.timedelta64(sexagenary.DEFAULT_UTC_OFFSET, "m")
+    return ((sexagenary.solar_longitude(ut) - sexagenary.LICHUN_LONGITUDE) % 360.0 // 30.0).astype(np.int64)
+
+
+def bench_bulk_endpoint(days, rounds):
+    client = TestClient(app)
+    payload = {"start": "2024-01-01T00:00", "end": str(np.datetime64("2024-01-01") + np.timedelta64(days, "D")),
+               "step_minutes": 60}
+    client.post("/api/calendar/pillars/bulk", json=payload)  # warm up
+    elapsed, r = best_of(rounds, lambda: client.post("/api/calendar/pillars/bulk", json=payload))
+    r.raise_for_status()
+    return r.json()["count"], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000, 10000000])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--bulk-days", type=int, default=4000, help="days of hourly timestamps per bulk request")
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("Calendar conversion: timestamps/s (best of rounds), 1900-2100")
+    print("=" * 78)
+    print(f"{'timestamps':>12} {'pillars()':>14} {'trig per ts':>14} {'python loop':>14} {'months agree':>13}")
+    for size in args.sizes:
+        values = timestamps(size)
+        fast, result = best_of(args.rounds, lambda: sexagenary.pillars(values))
+        trig_rate = agree = ""
+        if size <= TRIG_MAX_SIZE:
+            trig, months = best_of(args.rounds, lambda: month_by_longitude(values))
+            trig_rate = f"{size / trig:,.0f}"
+            agree = str(np.array_equal((result["month"] - 2 - 12 * result["year"]) % 12, months))
+        loop = ""
+        if size == min(args.sizes):
+            sample = values[:LOOP_SIZE]
+            elapsed, _ = best_of(1, lambda: [sexagenary.pillars(sample[i:i + 1]) for i in range(len(sample))])
+            loop = f"{len(sample) / elapsed:,.0f}"
+        print(f"{size:>12,} {size / fast:>14,.0f} {trig_rate:>14} {loop:>14} {agree:>13}")
+
+    count, elapsed = bench_bulk_endpoint(args.bulk_days, args.rounds)
+    print(f"\nPOST /api/calendar/pillars/bulk ({count:,} hourly timestamps): "
+          f"{elapsed * 1000:.0f} ms/request, {count / elapsed:,.0f} timestamps/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+SQLite read/write stress test.
+
+For each engine profile (SQLITE_PROFILE), starts a server on a fresh copy of
+the database and, for a fixed duration, runs concurrently:
+- readers hitting database-backed GET routes (full-text search),
+- admin writers replacing the nayin table through /api/admin/import/nayin,
+- an out-of-process writer holding short write transactions on the file
+  (like import_data.py running next to the server).
+Reports request counts, errors, "database is locked" occurrences in the
+server log and latency percentiles.
+
+Usage: python benchmarks/sqlite_stress.py [--profiles basic production] [--duration 10] [--readers 50] [--writers 2]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import httpx
+
+from concurrency import BACKEND_DIR, free_port, start_server
+
+READ_PATHS = [
+    "/api/search?q=森林",
+    "/api/search?q=法官",
+    "/api/search?q=水",
+    "/api/search?q=贵人",
+]
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    if not latencies:
+        return 0.0, 0.0, 0.0
+    pick = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    return pick(0.50), pick(0.95), pick(0.99)
+
+
+def external_writer(db_path, stop, stats):
+    """Short write transactions from another connection, like a concurrent import script"""
+    conn = sqlite3.connect(db_path, timeout=1.0, isolation_level=None)
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("UPDATE xiji SET remark = remark")
+            time.sleep(0.02)
+            conn.execute("COMMIT")
+            stats["latencies"].append(time.perf_counter() - start)
+        except sqlite3.OperationalError as exc:
+            stats["errors"] += 1
+            if "locked" in str(exc) or "busy" in str(exc):
+                stats["locked"] += 1
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+        time.sleep(0.05)
+    conn.close()
+
+
+async def run_clients(base_url, readers, writers, duration):
+    stop_at = time.perf_counter() + duration
+    reads = {"latencies": [], "errors": 0}
+    writes = {"latencies": [], "errors": 0}
+    limits = httpx.Limits(max_connections=readers + writers)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as http:
+        nayin = (await http.get("/api/admin/export/nayin")).json()
+
+        async def reader(offset):
+            i = offset
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    r = await http.get(READ_PATHS[i % len(READ_PATHS)])
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                reads["latencies"].append(time.perf_counter() - start)
+                reads["errors"] += not ok
+                i += 1
+
+        async def writer():
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                try:
+                    r = await http.post("/api/admin/import/nayin", json=nayin)
+                    ok = r.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                writes["latencies"].append(time.perf_counter() - start)
+                writes["errors"] += not ok
+
+        await asyncio.gather(*(reader(n) for n in range(readers)), *(writer() for _ in range(writers)))
+    return reads, writes
+
+
+def run_profile(profile, args):
+    tmp_dir = tempfile.mkdtemp(prefix="liushijiazi-stress-")
+    db_path = os.path.join(tmp_dir, "liushijiazi.db")
+    shutil.copy(os.path.join(BACKEND_DIR, "data", "liushijiazi.db"), db_path)
+    log_path = os.path.join(tmp_dir, "server.log")
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    with open(log_path, "w") as log:
+        process = start_server(BACKEND_DIR, port, f"sqlite:///{db_path}", env={"SQLITE_PROFILE": profile}, stderr=log)
+    try:
+        for path in READ_PATHS:
+            httpx.get(base_url + path, timeout=60)
+
+        stop = threading.Event()
+        external = {"latencies": [], "errors": 0, "locked": 0}
+        thread = threading.Thread(target=external_writer, args=(db_path, stop, external))
+        thread.start()
+        try:
+            reads, writes = asyncio.run(run_clients(base_url, args.readers, args.writers, args.duration))
+        finally:
+            stop.set()
+            thread.join()
+    finally:
+        process.terminate()
+        process.wait()
+
+    with open(log_path, "r", errors="replace") as f:
+        server_locked = f.read().count("database is locked")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print(f"\nprofile: {profile}")
+    print(f"  {'':<16} {'ops':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, stats in (("reads", reads), ("admin imports", writes), ("external writes", external)):
+        p50, p95, p99 = percentiles(stats["latencies"])
+        print(f"  {label:<16} {len(stats['latencies']):>7} {stats['errors']:>7} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f}")
+    print(f"  'database is locked' in server log: {server_locked}, "
+          f"in external writer: {external['locked']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["basic", "production"])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=50)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"SQLite stress: {args.readers} readers, {args.writers} admin writers, "
+          f"1 external writer, {args.duration:.0f}s per profile")
+    print("=" * 60)
+    for profile in args.profiles:
+        run_profile(profile, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Shared pytest fixtures
+#
+# Tests run against a throwaway copy of the bundled SQLite database so imports
+# and migrations never touch backend/data/liushijiazi.db.
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+_tmp_dir = tempfile.mkdtemp(prefix="liushijiazi-test-")
+_tmp_db = os.path.join(_tmp_dir, "liushijiazi.db")
+shutil.copy(os.path.join(BACKEND_DIR, "data", "liushijiazi.db"), _tmp_db)
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmp_db}"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.data_version import get_data_version
+from app.database import SessionLocal, async_engine, async_read_engine, engine
+from app.main import app
+from app.store import knowledge_store
+
+
+class QueryCounter:
+    """Records every SQL statement executed on the sync, async and read-only engines"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @contextmanager
+    def __call__(self):
+        self.statements = []
+        engines = {engine, async_engine.sync_engine, async_read_engine.sync_engine}
+        for target in engines:
+            event.listen(target, "before_cursor_execute", self._record)
+        try:
+            yield self
+        finally:
+            for target in engines:
+                event.remove(target, "before_cursor_execute", self._record)
+
+
+@pytest.fixture
+def count_queries():
+    """Context manager counting the SQL statements issued inside it"""
+    return QueryCounter()
+
+
+@pytest.fixture
+def client():
+    """Client with the knowledge snapshot loaded (app lifespan)"""
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def db_client():
+    """Client with no snapshot, so every read goes to the database"""
+    knowledge_store.clear()
+    with SessionLocal() as db:  # as the lifespan would; the ETag middleware reads it from memory
+        knowledge_store.set_data_version(get_data_version(db))
+    yield TestClient(app)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    engine.dispose()
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
@@ -0,0 +1,114 @@
+# Async CRUD tests
+import asyncio
+import threading
+
+from app import crud
+from app.database import AsyncReadSessionLocal, AsyncSessionLocal, SessionLocal
+from app.store import knowledge_store
+
+
+def _run_async(fn, *args):
+    async def run():
+        async with AsyncSessionLocal() as db:
+            return await fn(db, *args)
+    return asyncio.run(run())
+
+
+def test_async_crud_matches_sync_on_database_path():
+    knowledge_store.clear()
+    db = SessionLocal()
+    try:
+        details = _run_async(crud.aio.ganzhi.get_ganzhi_with_details, "甲子")
+        expected = crud.ganzhi.get_ganzhi_with_details(db, "甲子")
+        assert details["ganzhi"] == expected["ganzhi"]
+        assert [s.id for s in details["shensha"]] == [s.id for s in expected["shensha"]]
+        assert _run_async(crud.aio.shensha.get_ganzhi_with_all_shensha, ["福星"]) == \
+            crud.shensha.get_ganzhi_with_all_shensha(db, ["福星"])
+        assert _run_async(crud.aio.guanxi.get_relation_types) == crud.guanxi.get_relation_types(db)
+    finally:
+        db.close()
+
+
+def test_async_crud_keeps_metadata():
+    assert crud.aio.nayin.get_nayin_by_ganzhi.__doc__ == crud.nayin.get_nayin_by_ganzhi.__doc__
+    assert asyncio.iscoroutinefunction(crud.aio.search.search_text)
+
+
+def test_concurrent_snapshot_loads_do_not_deadlock():
+    async def load():
+        async with AsyncReadSessionLocal() as db:
+            return await db.run_sync(knowledge_store.load)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(load(), load()), timeout=30)
+
+    first, second = asyncio.run(run())
+    assert knowledge_store.snapshot in (first, second)
+
+
+def test_rebuilds_run_off_the_event_loop(monkeypatch):
+    from app.crud import graph as graph_crud
+    from app.store import KnowledgeSnapshot
+
+    threads = []
+    snapshot_init, build_graph_tables = KnowledgeSnapshot.__init__, graph_crud.build_graph_tables
+
+    def record_snapshot(self, *args, **kwargs):
+        threads.append(threading.get_ident())
+        snapshot_init(self, *args, **kwargs)
+
+    def record_graph(*args):
+        threads.append(threading.get_ident())
+        return build_graph_tables(*args)
+
+    monkeypatch.setattr(KnowledgeSnapshot, "__init__", record_snapshot)
+    monkeypatch.setattr(graph_crud, "build_graph_tables", record_graph)
+
+    async def run():
+        async with AsyncReadSessionLocal() as db:
+            snapshot = await knowledge_store.reload(db)
+            knowledge_store.clear()
+            graph = await crud.aio.graph.get_graph(db)
+            knowledge_store.swap(snapshot)
+            return snapshot, graph
+
+    snapshot, graph = asyncio.run(run())
+    assert knowledge_store.snapshot is snapshot
+    assert graph.schema() == snapshot.graph.schema()
+    assert len(threads) == 2 and threading.get_ident() not in threads
+
+
+def test_bulk_chart_analysis_runs_in_threadpool(monkeypatch):
+    from app.chart import ChartTables
+
+    threads = []
+    evaluate = ChartTables.evaluate
+
+    def record(self, positions):
+        threads.append(threading.get_ident())
+        return evaluate(self, positions)
+
+    monkeypatch.setattr(ChartTables, "evaluate", record)
+    result = _run_async(crud.aio.chart.analyze_charts, [["甲子", "丙寅", "庚午", "丙子"]] * 3)
+    assert len(result["items"]) == 3 and not result["unknown"]
+    assert len(threads) == 3 and threading.get_ident() not in threads
+
+
+def test_relation_matrix_fallback_builds_in_threadpool(monkeypatch):
+    from app.crud.aio import guanxi as aio_guanxi
+
+    threads = []
+
+    class Recording(aio_guanxi.RelationMatrix):
+        def __init__(self, rows):
+            threads.append(threading.get_ident())
+            super().__init__(rows)
+
+    monkeypatch.setattr(aio_guanxi, "RelationMatrix", Recording)
+    knowledge_store.clear()
+    db = SessionLocal()
+    try:
+        assert _run_async(crud.aio.guanxi.get_guanxi_by_ganzhi, "甲子") == crud.guanxi.get_guanxi_by_ganzhi(db, "甲子")
+    finally:
+        db.close()
+    assert len(threads) == 1 and threading.get_ident() not in threads
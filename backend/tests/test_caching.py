@@ -0,0 +1,65 @@
+# ETag / conditional GET tests
+from app.caching import etag_matches, is_cacheable
+from app.data_version import bump_data_version, get_data_version
+from app.database import SessionLocal
+from app.store import knowledge_store
+
+
+def test_etag_matches_lists_and_weak_tags():
+    assert etag_matches('"a", W/"v1-x"', '"v1-x"')
+    assert etag_matches("*", '"v1-x"')
+    assert not etag_matches('"v0-x"', '"v1-x"')
+    assert not etag_matches(None, '"v1-x"')
+
+
+def test_cacheable_paths():
+    assert is_cacheable("/api/ganzhi") and is_cacheable("/api/ganzhi/甲子")
+    assert not is_cacheable("/api/ganzhixyz") and not is_cacheable("/api/calendar")
+
+
+def test_read_routes_send_etag_and_cache_control(client):
+    r = client.get("/api/ganzhi/甲子")
+    assert r.status_code == 200
+    assert r.headers["etag"].startswith('"v')
+    assert "max-age" in r.headers["cache-control"]
+    assert client.get("/api/ganzhi/乙丑").headers["etag"] != r.headers["etag"]
+    assert "etag" not in client.get("/api/health").headers
+    # Prefixes match whole path segments only
+    assert client.get("/api/ganzhixyz", headers={"If-None-Match": "*"}).status_code == 404
+    assert client.get("/api/ganzhi").headers["etag"].startswith('"v')
+
+
+def test_middleware_never_queries_for_the_version(client, count_queries, monkeypatch):
+    monkeypatch.setattr(knowledge_store, "_data_version", None)
+    with count_queries() as counter:
+        r = client.get("/api/nayin/status")
+    assert r.status_code == 200
+    assert "etag" not in r.headers
+    assert counter.count == 0
+
+
+def test_if_none_match_returns_304_without_queries(client, count_queries):
+    etag = client.get("/api/nayin/status").headers["etag"]
+    with count_queries() as counter:
+        r = client.get("/api/nayin/status", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == etag
+    assert counter.count == 0
+
+
+def test_data_version_bump_changes_etag(client):
+    etag = client.get("/api/guanxi/types").headers["etag"]
+    db = SessionLocal()
+    try:
+        version = get_data_version(db)
+        assert bump_data_version(db) == version + 1
+        db.commit()
+        knowledge_store.load(db)
+    finally:
+        db.close()
+
+    r = client.get("/api/guanxi/types", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert r.headers["etag"].startswith(f'"v{version + 1}-')
@@ -0,0 +1,89 @@
+# Calendar (four pillars) tests
+import numpy as np
+
+from app import sexagenary, solar
+
+
+def names(*timestamps, utc_offset=480):
+    result = sexagenary.pillar_names(sexagenary.pillars(list(timestamps), utc_offset))
+    return [tuple(result[p][i] for p in ("year", "month", "day", "hour")) for i in range(len(timestamps))]
+
+
+def test_known_charts():
+    assert names("2008-08-08T20:00", "2000-01-01T12:00", "1984-02-05T12:00") == [
+        ("戊子", "庚申", "庚辰", "丙戌"),
+        ("己卯", "丙子", "戊午", "戊午"),
+        ("甲子", "丙寅", "己巳", "庚午"),
+    ]
+
+
+def test_year_and_month_change_at_lichun():
+    # 立春 2024 is 2024-02-04 16:27 China Standard Time
+    before, after = names("2024-02-04T15:30", "2024-02-04T17:30")
+    assert before[:2] == ("癸卯", "乙丑")
+    assert after[:2] == ("甲辰", "丙寅")
+    # The same instant eight hours west in local time
+    assert names("2024-02-04T09:30", utc_offset=0)[0][:2] == ("甲辰", "丙寅")
+
+
+def test_day_changes_at_23():
+    evening, late = names("2024-01-01T22:59", "2024-01-01T23:00")
+    assert evening[2:] == ("甲子", "乙亥")
+    assert late[2:] == ("乙丑", "丙子")
+
+
+def test_boundaries_match_the_solar_longitude():
+    # Each boundary is the first whole minute at or past its term
+    boundaries = sexagenary.jie_instants(1900, 2100)
+    targets = np.tile((sexagenary.LICHUN_LONGITUDE + 30.0 * np.arange(12)) % 360, 201)
+    for instants, sign in ((boundaries, 1), (boundaries - np.timedelta64(1, "m"), -1)):
+        past = (sexagenary.solar_longitude(instants) - targets + 180) % 360 - 180
+        assert np.all(sign * past >= 0)
+
+
+# 节 in China Standard Time, to the minute, as published
+PUBLISHED_JIE = [
+    "2020-02-04T17:03", "2021-02-03T22:59", "2022-02-04T04:51", "2023-02-04T10:42", "2024-02-04T16:27",
+    "2025-02-03T22:10", "2023-03-06T04:36", "2024-03-05T10:23", "2024-08-07T08:09", "2024-12-06T23:17",
+]
+
+
+def test_months_change_at_published_terms():
+    published = np.array(PUBLISHED_JIE, dtype="datetime64[m]")
+    minute = np.timedelta64(1, "m")
+    before, after = sexagenary.pillars(published - minute), sexagenary.pillars(published + minute)
+    assert np.array_equal((after["month"] - before["month"]) % 60, np.ones(len(published)))
+    lichun = np.array([t.endswith(("02-03", "02-04")) for t in (p[:10] for p in PUBLISHED_JIE)])
+    assert np.array_equal((after["year"] - before["year"]) % 60, lichun.astype(np.int64))
+
+    # 立春 2023 is 10:42 CST (02:42 UT)
+    assert [chart[:2] for chart in names("2023-02-04T10:35", "2023-02-04T10:45")] == [
+        ("壬寅", "癸丑"), ("癸卯", "甲寅"),
+    ]
+
+
+def test_solar_position():
+    # Meeus, Astronomical Algorithms, example 25.b: 1992 October 13.0 TD
+    assert abs(solar.apparent_longitude(np.array([-2636.5]))[0] - (199 + 54 / 60 + 21.818 / 3600)) < 1e-6
+    assert np.allclose(solar.delta_t(np.array([1900.0, 2000.0, 2020.0])), [-2.79, 63.86, 71.6], atol=0.01)
+
+
+def test_pillars_endpoint(client):
+    r = client.get("/api/calendar/pillars", params={"datetime": "2008-08-08T12:00Z"})
+    assert r.status_code == 200
+    assert r.json() == {"datetime": "2008-08-08T20:00", "year": "戊子", "month": "庚申", "day": "庚辰", "hour": "丙戌"}
+
+
+def test_bulk_endpoint(client):
+    r = client.post("/api/calendar/pillars/bulk", json={"start": "2024-01-01T21:00", "end": "2024-01-02T01:00"})
+    body = r.json()
+    assert body["count"] == 4
+    assert body["datetimes"][0] == "2024-01-01T21:00"
+    assert body["day"] == ["甲子", "甲子", "乙丑", "乙丑"]
+    assert body["hour"] == ["乙亥", "乙亥", "丙子", "丙子"]
+
+    r = client.post("/api/calendar/pillars/bulk", json={"datetimes": ["2024-02-04T15:30", "2024-02-04T17:30"]})
+    assert r.json()["year"] == ["癸卯", "甲辰"]
+
+    assert client.post("/api/calendar/pillars/bulk", json={}).status_code == 400
+    assert client.post("/api/calendar/pillars/bulk", json={"start": "1900-01-01", "end": "2100-01-01"}).status_code == 400
@@ -0,0 +1,68 @@
+# Chart analysis tests
+from app.chart import PILLAR_PAIRS, PILLARS, target_tags
+from app.relations import CYCLE
+from app.store import knowledge_store
+
+
+CHART = {"year": "甲子", "month": "丙寅", "day": "庚午", "hour": "丙子"}
+DIRECTIONS = ("北", "东北", "东", "东南", "南", "西南", "西", "西北")
+
+
+def test_target_tags():
+    assert target_tags("甲寅", DIRECTIONS) == {("ganzhi", "甲寅")}
+    assert target_tags("南方", DIRECTIONS) == {("fangwei", "南")}
+    assert target_tags("巽地", DIRECTIONS) == {("fangwei", "东南")}
+    assert target_tags("丙丁火", DIRECTIONS) == {("tiangan", "丙"), ("tiangan", "丁"), ("wuxing", "火")}
+    assert target_tags("金旺", DIRECTIONS) == {("wuxing", "金")}
+    assert target_tags("秋冬", DIRECTIONS) == {("season", "秋"), ("season", "冬")}
+    assert target_tags("夜", DIRECTIONS) == frozenset()
+
+
+def test_analyze_chart(client, count_queries):
+    with count_queries() as counter:
+        r = client.post("/api/chart/analyze", json=CHART)
+    assert r.status_code == 200
+    assert counter.count == 0
+    body = r.json()
+
+    assert [p["ganzhi"] for p in body["pillars"]] == list(CHART.values())
+    assert body["pillars"][0]["nayin"]["nayin_name"] == "海中金"
+    assert body["pillars"][0]["shensha"]
+
+    guanxi = {tuple(g["pillars"]): g["relation_types"] for g in body["guanxi"]}
+    assert "六冲" in guanxi[("year", "day")]
+    assert "同天干" in guanxi[("month", "hour")]
+    assert ("year", "month") not in guanxi
+
+    # 甲子 likes 金旺: the 庚午 day pillar (庚 = 金) satisfies it
+    hit = next(x for x in body["xiji"] if x["pillar"] == "year" and x["target_value"] == "金旺")
+    assert hit["matched_by"] == ["day"]
+
+
+def test_bulk_matches_single_analysis(client):
+    charts = [list(CHART.values()), ["甲子", "甲子", "戊午", "壬申"], [CYCLE[59], CYCLE[0], CYCLE[30], CYCLE[15]]]
+    r = client.post("/api/chart/analyze/bulk", json={"charts": charts})
+    assert r.status_code == 200
+    body = r.json()
+    legend = body["legend"]
+    xiji = {x["id"]: x for x in legend["xiji"]}
+
+    for chart, item in zip(charts, body["items"]):
+        single = client.post("/api/chart/analyze", json=dict(zip(PILLARS, chart))).json()
+        assert [legend["ganzhi"][i] for i in item["pillars"]] == chart
+        assert [legend["nayin"][i] for i in item["pillars"]] == [p["nayin"]["nayin_name"] for p in single["pillars"]]
+        masks = {tuple(PILLARS[k] for k in pair): mask for pair, mask in zip(legend["pairs"], item["guanxi"]) if mask}
+        assert masks == {tuple(g["pillars"]): g["relation_mask"] for g in single["guanxi"]}
+        hits = {(PILLARS[a], xiji[xid]["target_value"], PILLARS[b]) for a, xid, b in item["xiji"]}
+        assert hits == {(x["pillar"], x["target_value"], by) for x in single["xiji"] for by in x["matched_by"]}
+
+    assert len(legend["pairs"]) == len(PILLAR_PAIRS)
+    knowledge_store.clear()
+    assert client.post("/api/chart/analyze/bulk", json={"charts": charts}).json() == body
+
+
+def test_unknown_ganzhi_and_limits(client):
+    assert client.post("/api/chart/analyze", json={**CHART, "day": "X"}).status_code == 404
+    assert client.post("/api/chart/analyze/bulk", json={"charts": [["甲子", "乙丑", "丙寅", "Y"]]}).status_code == 404
+    assert client.post("/api/chart/analyze/bulk", json={"charts": [["甲子", "乙丑"]]}).status_code == 422
+    assert client.post("/api/chart/analyze/bulk", json={"charts": [list(CHART.values())] * 10001}).status_code == 400
@@ -0,0 +1,80 @@
+# Columnar export tests
+import csv
+import gzip
+import io
+import os
+
+import pytest
+from sqlalchemy import select
+
+from app import columnar
+from app.database import SessionLocal
+from app.models import Xiangyi
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, "COLUMNAR_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def xiangyi_rows():
+    db = SessionLocal()
+    try:
+        return db.execute(select(Xiangyi.__table__).order_by(Xiangyi.id)).all()
+    finally:
+        db.close()
+
+
+def test_parse_filename():
+    assert columnar.parse_filename("xiangyi.csv.gz") == ("xiangyi", "csv.gz")
+    assert columnar.parse_filename("ganzhi_shensha.parquet") == ("ganzhi_shensha", "parquet")
+    assert columnar.parse_filename("xiangyi.csv") is None
+
+
+def test_csv_gz_export(client):
+    r = client.get("/api/admin/columnar/xiangyi.csv.gz")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/gzip"
+    lines = list(csv.reader(io.StringIO(gzip.decompress(r.content).decode("utf-8"))))
+    assert lines[0] == [c.name for c in Xiangyi.__table__.columns]
+    rows = xiangyi_rows()
+    assert len(lines) == len(rows) + 1
+    assert lines[1][:5] == [str(v) for v in rows[0][:5]]
+
+
+def test_export_is_cached_per_data_version(client, cache_dir, monkeypatch):
+    first = client.get("/api/admin/columnar/nayin.csv.gz").content
+    files = os.listdir(cache_dir)
+    assert len(files) == 1
+    mtime = os.path.getmtime(cache_dir / files[0])
+    assert client.get("/api/admin/columnar/nayin.csv.gz").content == first
+    assert os.path.getmtime(cache_dir / files[0]) == mtime
+
+    version = int(files[0].split("-v")[1].split(".")[0])
+    monkeypatch.setattr(columnar, "get_data_version", lambda db: version + 1)
+    assert client.get("/api/admin/columnar/nayin.csv.gz").content == first
+    assert os.listdir(cache_dir) == [f"nayin-v{version + 1}.csv.gz"]
+
+
+def test_unknown_columnar_export(client):
+    assert client.get("/api/admin/columnar/meta.csv.gz").status_code == 404
+    assert client.get("/api/admin/columnar/xiangyi.xlsx").status_code == 404
+    assert "csv.gz" in client.get("/api/admin/columnar").json()["formats"]
+
+
+def test_arrow_and_parquet_exports(client):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    rows = xiangyi_rows()
+    r = client.get("/api/admin/columnar/xiangyi.arrow")
+    table = pyarrow.ipc.open_file(pyarrow.BufferReader(r.content)).read_all()
+    assert table.num_rows == len(rows)
+    assert table.column("content").to_pylist() == [row.content for row in rows]
+
+    r = client.get("/api/admin/columnar/xiangyi.parquet")
+    table = pyarrow.parquet.read_table(pyarrow.BufferReader(r.content))
+    assert table.schema.field("confidence").type == pyarrow.float64()
+    assert table.column("id").to_pylist() == [row.id for row in rows]
@@ -0,0 +1,57 @@
+# SQLite engine profile tests
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import AsyncReadSessionLocal, SessionLocal, retry_on_locked
+
+
+def _read(sql):
+    async def run():
+        async with AsyncReadSessionLocal() as db:
+            return (await db.execute(text(sql))).scalar()
+    return asyncio.run(run())
+
+
+def test_writer_uses_wal_and_pragmas():
+    db = SessionLocal()
+    try:
+        assert db.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert db.execute(text("PRAGMA busy_timeout")).scalar() > 0
+        assert db.execute(text("PRAGMA mmap_size")).scalar() > 0
+    finally:
+        db.close()
+
+
+def test_reader_pool_is_read_only():
+    assert _read("SELECT COUNT(*) FROM ganzhi") == 60
+    assert _read("PRAGMA query_only") == 1
+    with pytest.raises(OperationalError):
+        _read("DELETE FROM ganzhi")
+
+
+def test_retry_on_locked_retries_lock_errors_only():
+    calls = []
+
+    class FakeSession:
+        def rollback(self):
+            calls.append("rollback")
+
+    @retry_on_locked
+    def write(db):
+        calls.append("write")
+        if calls.count("write") < 3:
+            raise OperationalError("UPDATE", {}, Exception("database is locked"))
+        return "done"
+
+    assert write(FakeSession()) == "done"
+    assert calls == ["write", "rollback", "write", "rollback", "write"]
+
+    @retry_on_locked
+    def broken(db):
+        raise OperationalError("UPDATE", {}, Exception("no such table: x"))
+
+    with pytest.raises(OperationalError):
+        broken(FakeSession())
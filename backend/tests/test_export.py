@@ -0,0 +1,82 @@
+# Streaming export tests
+import asyncio
+import gzip
+import json
+
+import pytest
+from sqlalchemy import select
+
+from app.database import SessionLocal
+from app.export import EXPORT_TABLES, json_array_chunks, json_object_chunks, table_columns
+
+
+def table_rows(name, columns=None):
+    table = EXPORT_TABLES[name].__table__
+    columns = columns or table_columns(EXPORT_TABLES[name])
+    db = SessionLocal()
+    try:
+        rows = db.execute(select(*(table.c[c] for c in columns)).order_by(table.c.id)).all()
+    finally:
+        db.close()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+async def batches(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+async def collect(chunks):
+    return "".join([chunk async for chunk in chunks])
+
+
+def test_json_encoders_match_json_dumps():
+    rows = [{"id": i, "name": f"名{i}", "nested": {"a": [1, 2]}} for i in range(7)]
+    for data in (rows, []):
+        assert asyncio.run(collect(json_array_chunks(batches(data, 3)))) == json.dumps(data, ensure_ascii=False, indent=2)
+    sections = {"a": batches(rows, 2), "b": batches([], 2)}
+    expected = json.dumps({"a": rows, "b": []}, ensure_ascii=False, indent=2)
+    assert asyncio.run(collect(json_object_chunks(sections))) == expected
+
+
+@pytest.mark.parametrize("name", sorted(EXPORT_TABLES))
+def test_export_table_json(client, name):
+    r = client.get(f"/api/admin/export/{name}")
+    assert r.status_code == 200
+    assert r.headers["content-disposition"] == f"attachment; filename={name}.json"
+    assert r.text == json.dumps(table_rows(name), ensure_ascii=False, indent=2)
+
+
+def test_export_ndjson(client):
+    r = client.get("/api/admin/export/xiangyi?format=ndjson")
+    assert r.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in r.text.splitlines()] == table_rows("xiangyi")
+
+
+def test_export_gzip(client):
+    expected = client.get("/api/admin/export/guanxi").content
+
+    r = client.get("/api/admin/export/guanxi?gzip=true", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.content == expected  # decoded by the client
+
+    r = client.get("/api/admin/export/guanxi?gzip=true", headers={"Accept-Encoding": "identity"})
+    assert r.headers["content-type"] == "application/gzip"
+    assert r.headers["content-disposition"] == "attachment; filename=guanxi.json.gz"
+    assert gzip.decompress(r.content) == expected
+
+
+def test_export_all(client):
+    data = client.get("/api/admin/export/all").json()
+    assert list(data) == ["ganzhi", "nayin", "xiangyi", "shensha", "ganzhi_shensha", "xiji", "guanxi"]
+    assert data["shensha"] == table_rows("shensha", ("id", "name", "type", "jixiong"))
+    assert len(data["xiji"]) == len(table_rows("xiji"))
+
+    lines = client.get("/api/admin/export/all?format=ndjson").text.splitlines()
+    assert sum(len(rows) for rows in data.values()) == len(lines)
+    assert json.loads(lines[0]) == {"table": "ganzhi", "row": data["ganzhi"][0]}
+
+
+def test_export_unknown_table(client):
+    assert client.get("/api/admin/export/meta").status_code == 404
+    assert client.get("/api/admin/export/ganzhi?format=xml").status_code == 422
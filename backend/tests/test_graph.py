@@ -0,0 +1,127 @@
+# Knowledge graph tests
+import json
+
+from app.graph import load_kg_data
+from app.relations import CYCLE
+from app.store import knowledge_store
+
+
+def _lines(r):
+    """Results of an NDJSON response and its trailing {"count", "truncated"} line"""
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    return lines[:-1], lines[-1]
+
+
+def test_graph_covers_kg_logic(client):
+    graph = knowledge_store.snapshot.graph
+    kg = load_kg_data()["knowledge_graph"]
+    for n in kg["nodes"]:
+        assert graph.nodes[graph.node_index[n["id"]]]["label"] == n["label"]
+
+    out = graph.adjacency["out"]
+    skipped = 0
+    for e in kg["edges"]:
+        if e["from"] not in graph.node_index or e["to"] not in graph.node_index:
+            skipped += 1  # xiang_yi_hei_an is never declared
+            continue
+        source, target = graph.node_index[e["from"]], graph.node_index[e["to"]]
+        assert (graph.type_index[e["relation"]], target, False) in out.edges(source)
+    assert graph.skipped_edges == skipped == 1
+
+    # Directed edges are only walked backwards with direction=in; symmetric ones both ways
+    jia_zi, ren_shen, yi_chou = (graph.node_index[k] for k in ("jia_zi", "ren_shen", "yi_chou"))
+    gebasheng, tongwei = graph.type_index["隔八生子"], graph.type_index["同位"]
+    assert [w for _, w, _ in out.edges(ren_shen, [gebasheng])] == []
+    assert [w for _, w, _ in graph.adjacency["in"].edges(ren_shen, [gebasheng])] == [jia_zi]
+    assert [w for _, w, _ in out.edges(yi_chou, [tongwei])] == [jia_zi]
+
+
+def test_relation_edges_match_matrix(client):
+    snapshot = knowledge_store.snapshot
+    graph, matrix = snapshot.graph, snapshot.relation_matrix
+    out = graph.adjacency["out"]
+    for relation in ("六合", "六冲", "三刑", "同天干"):
+        t = graph.type_index[relation]
+        for name in CYCLE:
+            neighbours = {graph.nodes[w]["label"] for _, w, _ in out.edges(graph.resolve(name)[0], [t])}
+            expected = {other for other in CYCLE if other != name and relation in matrix.decode(matrix.mask(name, other))}
+            assert neighbours == expected, (relation, name)
+
+
+def test_bfs_and_shortest_path_agree(client):
+    graph = knowledge_store.snapshot.graph
+    source = graph.resolve("甲子")[0]
+    types = graph.edge_type_ids(["六合", "六冲", "有神煞"])
+    reached = list(graph.bfs(source, 3, types))
+    assert reached[0]["depth"] == 0 and reached[0]["edge"] is None
+    assert [r["depth"] for r in reached] == sorted(r["depth"] for r in reached)
+    assert len({r["node"]["id"] for r in reached}) == len(reached)
+    for r in reached[1::7]:
+        path = graph.shortest_path(source, graph.node_index[r["node"]["id"]], 3, types)
+        assert len(path["edges"]) == r["depth"]
+        assert path["nodes"][0] == "jia_zi" and path["nodes"][-1] == r["node"]["id"]
+    assert graph.shortest_path(source, graph.resolve("南方")[0], 1) is None
+
+
+def test_typed_paths_match_matrix(client):
+    matrix = knowledge_store.snapshot.relation_matrix
+
+    def related(a, relation):
+        return [b for b in CYCLE if b != a and relation in matrix.decode(matrix.mask(a, b))]
+
+    expected = sorted(
+        ("甲子", b, c) for b in related("甲子", "六合") for c in related(b, "六冲") if c != "甲子"
+    )
+    r = client.get("/api/graph/typed-paths/甲子?pattern=六合&pattern=六冲")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/x-ndjson"
+    paths, summary = _lines(r)
+    graph = knowledge_store.snapshot.graph
+    labels = [tuple(graph.nodes[graph.node_index[i]]["label"] for i in p["nodes"]) for p in paths]
+    assert sorted(labels) == expected
+    assert summary == {"count": len(expected), "truncated": False}
+    assert [e["relation"] for e in paths[0]["edges"]] == ["六合", "六冲"]
+
+    r = client.get("/api/graph/typed-paths/甲子?pattern=六合&pattern=六冲&target=辛未&limit=2")
+    paths, summary = _lines(r)
+    assert summary == {"count": 2, "truncated": True}
+    assert all(p["nodes"][-1] == "xin_wei" for p in paths)
+
+
+def test_graph_endpoints(client):
+    r = client.get("/api/graph/schema")
+    assert r.status_code == 200
+    schema = r.json()
+    assert schema["node_types"]["六十甲子"] == 60 and schema["edge_types"]["纳音为"] == 60
+
+    node = client.get("/api/graph/nodes/甲子").json()
+    assert node["id"] == "jia_zi" and node["degree"]["六合"] == {"out": 5, "in": 5}
+    assert client.get("/api/graph/nodes/火").status_code == 400  # 五行 and 喜忌对象
+    assert client.get("/api/graph/nodes/五行:火").json()["type"] == "五行"
+    assert client.get("/api/graph/nodes/不存在").status_code == 404
+
+    neighbours, summary = _lines(client.get("/api/graph/neighbors/甲子?types=纳音为"))
+    assert [n["node"]["label"] for n in neighbours] == ["海中金"]
+    assert summary == {"count": 1, "truncated": False}
+
+    reached, summary = _lines(client.get("/api/graph/bfs/甲子?depth=2&limit=5"))
+    assert len(reached) == 5 and summary["truncated"]
+
+    steps, _ = _lines(client.get("/api/graph/path?source=甲子&target=南方"))
+    assert [s["step"] for s in steps] == list(range(len(steps)))
+    assert steps[-1]["node"]["id"] == "xi_ji_nan_fang"
+    assert client.get("/api/graph/path?source=甲子&target=南方&max_depth=1").status_code == 404
+
+    assert client.get("/api/graph/bfs/甲子?types=不存在").status_code == 400
+    assert client.get("/api/graph/bfs/甲子?direction=up").status_code == 422
+    assert client.get("/api/graph/typed-paths/甲子?" + "&".join(["pattern=六合"] * 7)).status_code == 400
+
+
+def test_graph_from_database_matches_snapshot(client, count_queries):
+    paths = ["/api/graph/schema", "/api/graph/bfs/甲子?depth=2", "/api/graph/typed-paths/甲子?pattern=六合&pattern=六冲"]
+    with count_queries() as counter:
+        from_snapshot = [client.get(path).text for path in paths]
+    assert counter.count == 0
+
+    knowledge_store.clear()
+    assert [client.get(path).text for path in paths] == from_snapshot
@@ -0,0 +1,141 @@
+import copy
+import os
+
+import pytest
+from sqlalchemy import func, select
+
+from app.data_version import get_data_version
+from app.database import SessionLocal
+from app.import_data import load_sources, run_import
+from app.import_diff import edge_key, file_hashes, load_source_hashes, record_hashes, run_reimport
+from app.models import Ganzhi, GanzhiShensha, Guanxi, Nayin, Shensha, Xiangyi, Xiji
+
+from conftest import BACKEND_DIR
+
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)
+
+TABLES = {
+    "ganzhi": Ganzhi,
+    "nayin": Nayin,
+    "xiangyi": Xiangyi,
+    "shensha": Shensha,
+    "ganzhi_shensha": GanzhiShensha,
+    "xiji": Xiji,
+    "guanxi": Guanxi,
+}
+
+
+@pytest.fixture(scope="module")
+def sources():
+    return load_sources(PROJECT_ROOT)
+
+
+def table_counts(db):
+    return {name: db.scalar(select(func.count()).select_from(model)) for name, model in TABLES.items()}
+
+
+def test_reimport_reproduces_the_bundled_database(sources):
+    db = SessionLocal()
+    try:
+        before = table_counts(db)
+        counts = run_import(db, *sources)
+        assert table_counts(db) == before
+        assert {name: counts[name] for name in TABLES} == before
+        # Shensha ids follow first appearance, so they are stable across runs
+        names = db.scalars(select(Shensha.name).order_by(Shensha.id)).all()
+        run_import(db, *sources)
+        assert db.scalars(select(Shensha.name).order_by(Shensha.id)).all() == names
+    finally:
+        db.close()
+
+
+def test_duplicate_edges_are_imported_once(sources):
+    xiangyi_data, kg_data = sources
+    doubled = copy.deepcopy(kg_data)
+    doubled["knowledge_graph"]["edges"] *= 2
+    db = SessionLocal()
+    try:
+        counts = run_import(db, xiangyi_data, doubled)
+        assert counts["guanxi"] == run_import(db, xiangyi_data, kg_data)["guanxi"]
+    finally:
+        db.close()
+
+
+def test_failed_import_rolls_back(sources):
+    xiangyi_data, kg_data = sources
+    broken = {**kg_data, "knowledge_graph": {"edges": [None]}}
+    db = SessionLocal()
+    try:
+        before = table_counts(db)
+        with pytest.raises(AttributeError):
+            run_import(db, xiangyi_data, broken)
+        assert table_counts(db) == before
+    finally:
+        db.close()
+
+
+def test_reimport_without_changes_writes_nothing(sources):
+    db = SessionLocal()
+    try:
+        run_import(db, *sources, hashes={**file_hashes(PROJECT_ROOT), **record_hashes(*sources)})
+        version = get_data_version(db)
+        plan = run_reimport(db, *sources, files=file_hashes(PROJECT_ROOT))
+        assert not plan.records and not plan.changed
+        assert get_data_version(db) == version
+    finally:
+        db.close()
+
+
+def test_reimport_applies_only_changed_records(sources):
+    xiangyi_data, kg_data = sources
+    db = SessionLocal()
+    try:
+        run_import(db, xiangyi_data, kg_data, hashes=record_hashes(xiangyi_data, kg_data))
+        ids_before = {name: db.scalars(select(model.id).order_by(model.id)).all() for name, model in TABLES.items()}
+
+        edited = copy.deepcopy(xiangyi_data)
+        entry = edited["liu_shi_jia_zi_na_yin"]["jia_zi"]
+        entry["备注"] = "改"
+        entry["喜"] = entry["喜"][1:] + ["新喜"]
+        edited_kg = copy.deepcopy(kg_data)
+        edited_kg["knowledge_graph"]["edges"] = [
+            edge for edge in kg_data["knowledge_graph"]["edges"] if edge_key(edge) != "jia_zi|ren_shen|隔八生子"
+        ]
+
+        plan = run_reimport(db, edited, edited_kg, dry_run=True)
+        assert plan.records["jiazi"]["changed"] == ["jia_zi"]
+        assert plan.records["edge"]["removed"] == ["jia_zi|ren_shen|隔八生子"]
+        assert db.scalar(select(Nayin.zhuangtai_desc).where(Nayin.ganzhi_id == 1)) != "改"
+
+        plan = run_reimport(db, edited, edited_kg)
+        assert plan.tables["nayin"].summary() == "+0 ~1 -0"
+        assert plan.tables["xiji"].summary() == "+1 ~0 -1"
+        assert plan.tables["guanxi"].summary() == "+0 ~0 -1"
+        assert not plan.tables["ganzhi"] and not plan.tables["shensha"]
+        assert db.scalar(select(Nayin.zhuangtai_desc).where(Nayin.ganzhi_id == 1)) == "改"
+
+        # Untouched rows keep their ids
+        ids_after = {name: db.scalars(select(model.id).order_by(model.id)).all() for name, model in TABLES.items()}
+        for name in ("ganzhi", "nayin", "shensha", "ganzhi_shensha"):
+            assert ids_after[name] == ids_before[name]
+        assert set(ids_before["xiji"]) - set(ids_after["xiji"]) == set(plan.tables["xiji"].deletes)
+
+        # Back to the sources
+        plan = run_reimport(db, xiangyi_data, kg_data)
+        assert plan.tables["guanxi"].summary() == "+1 ~0 -0"
+        assert run_reimport(db, xiangyi_data, kg_data).records == {}
+    finally:
+        db.close()
+
+
+def test_full_import_without_hashes_forces_a_full_diff(sources):
+    db = SessionLocal()
+    try:
+        run_import(db, *sources, hashes=record_hashes(*sources))
+        run_import(db, *sources)
+        assert load_source_hashes(db) == {}
+        plan = run_reimport(db, *sources, dry_run=True)
+        assert set(plan.records) == {"tiangan", "dizhi", "jiazi", "shensha", "edge"}
+        assert not plan.changed
+    finally:
+        db.close()
@@ -0,0 +1,79 @@
+# Query plan regression tests
+#
+# Every statement the crud modules emit on the database path is explained;
+# apart from the documented whole-table reads (ALLOWED_SCANS) none may fall
+# back to a full table scan, however small the bundled tables are today.
+import os
+import shutil
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, init_db
+from app.index_advisor import advise, explain, full_scans, suggest_indexes, unexpected_scans
+from app.migrations import SCHEMA_VERSION, migrate, schema_version
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+XIANGYI_BY_GANZHI = (
+    "SELECT xiangyi.id, xiangyi.content FROM xiangyi WHERE xiangyi.ganzhi_id IN (?, ?)"
+)
+
+
+@pytest.fixture
+def unmigrated_engine(tmp_path):
+    """Engine on a copy of the bundled database, as shipped (schema version 0)"""
+    path = tmp_path / "liushijiazi.db"
+    shutil.copy(os.path.join(BACKEND_DIR, "data", "liushijiazi.db"), path)
+    bind = create_engine(f"sqlite:///{path}")
+    yield bind
+    bind.dispose()
+
+
+def test_hot_paths_do_not_scan():
+    init_db()
+    db = SessionLocal()
+    try:
+        plans = advise(db)
+    finally:
+        db.close()
+    assert plans
+    flagged = [(plan.label, plan.plan) for plan in unexpected_scans(plans)]
+    assert flagged == []
+
+
+def test_migration_adds_indexes(unmigrated_engine):
+    with unmigrated_engine.connect() as conn:
+        assert schema_version(conn) == 0
+
+    assert migrate(unmigrated_engine) == [SCHEMA_VERSION]
+    assert migrate(unmigrated_engine) == []
+
+    inspector = inspect(unmigrated_engine)
+    indexes = {
+        table: {index["name"]: index["column_names"] for index in inspector.get_indexes(table)}
+        for table in ("xiangyi", "xiji", "ganzhi_shensha", "guanxi")
+    }
+    assert indexes["xiangyi"]["ix_xiangyi_ganzhi_id"] == ["ganzhi_id"]
+    assert indexes["xiji"]["ix_xiji_ganzhi_id"] == ["ganzhi_id"]
+    assert indexes["ganzhi_shensha"]["ix_ganzhi_shensha_shensha_id"] == ["shensha_id"]
+    assert indexes["guanxi"]["ix_guanxi_pair_type"] == ["ganzhi1", "ganzhi2", "relation_type"]
+    assert "ix_guanxi_ganzhi1" not in indexes["guanxi"]
+    with unmigrated_engine.connect() as conn:
+        assert schema_version(conn) == SCHEMA_VERSION
+
+
+def test_advisor_flags_scan_and_suggests_index(unmigrated_engine):
+    with Session(unmigrated_engine) as db:
+        plan = explain(db, XIANGYI_BY_GANZHI, (1, 2))
+        assert full_scans(plan) == ["xiangyi"]
+        assert suggest_indexes(db, XIANGYI_BY_GANZHI, "xiangyi") == [
+            "CREATE INDEX ix_xiangyi_ganzhi_id ON xiangyi (ganzhi_id)"
+        ]
+
+    migrate(unmigrated_engine)
+    with Session(unmigrated_engine) as db:
+        plan = explain(db, XIANGYI_BY_GANZHI, (1, 2))
+        assert full_scans(plan) == []
+        assert suggest_indexes(db, XIANGYI_BY_GANZHI, "xiangyi") == []
@@ -0,0 +1,93 @@
+# Streaming NDJSON ingest tests
+import json
+
+import pytest
+from sqlalchemy import inspect
+
+from app.database import engine, init_db
+from app.export import EXPORT_TABLES
+from app.ingest import staging_table
+from app.models import Xiji
+
+
+def events(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def export_ndjson(client, table):
+    return client.get(f"/api/admin/export/{table}?format=ndjson").text
+
+
+def staging_tables():
+    return [name for name in inspect(engine).get_table_names() if name.startswith("_ingest_")]
+
+
+@pytest.mark.parametrize("table", sorted(EXPORT_TABLES))
+def test_ingest_round_trip(client, table):
+    body = export_ndjson(client, table)
+    r = client.post(f"/api/admin/ingest/{table}", content=body.encode("utf-8"))
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/x-ndjson"
+    done = events(r)[-1]
+    assert done["event"] == "done" and done["imported"] == len(body.splitlines()) and done["errors"] == 0
+    assert export_ndjson(client, table) == body
+    assert staging_tables() == []
+
+
+def test_ingest_reports_invalid_lines_and_progress(client):
+    rows = [json.loads(line) for line in export_ndjson(client, "xiji").splitlines()]
+    lines = [json.dumps(row, ensure_ascii=False) for row in rows[:5]]
+    lines.insert(1, '{"ganzhi_id": "x"}')
+    lines.insert(3, "not json")
+    lines.insert(4, json.dumps({**rows[5], "unknown": 1}))
+    lines.append("")
+    r = client.post("/api/admin/ingest/xiji?batch_size=2", content="\n".join(lines).encode("utf-8"))
+    result = events(r)
+
+    errors = [e for e in result if e["event"] == "error"]
+    assert [e["line"] for e in errors] == [2, 4, 5]
+    assert "ganzhi_id" in errors[0]["message"] and "unknown" in errors[2]["message"]
+    assert [e["staged"] for e in result if e["event"] == "progress"] == [2, 4, 5]
+    assert result[-1] == {"event": "done", "table": "xiji", "mode": "replace", "imported": 5,
+                          "lines": 8, "staged": 5, "errors": 3}
+    assert client.get("/api/admin/stats").json()["xiji_count"] == 5
+
+    client.post("/api/admin/ingest/xiji", content="\n".join(json.dumps(row, ensure_ascii=False) for row in rows))
+
+
+def test_ingest_abort_leaves_table_unchanged(client):
+    before = export_ndjson(client, "nayin")
+    body = before.splitlines()
+    body.insert(10, '{"nayin_name": 1}')
+    r = client.post("/api/admin/ingest/nayin?on_error=abort", content="\n".join(body).encode("utf-8"))
+    assert events(r)[-1]["event"] == "aborted"
+    assert export_ndjson(client, "nayin") == before
+    assert staging_tables() == []
+
+
+def test_ingest_append_and_conflicts(client):
+    before = export_ndjson(client, "guanxi")
+    first = json.loads(before.splitlines()[0])
+
+    r = client.post("/api/admin/ingest/guanxi?mode=append", content=json.dumps(first, ensure_ascii=False).encode("utf-8"))
+    result = events(r)[-1]
+    assert result["event"] == "aborted" and "constraint" in result["reason"]
+    assert export_ndjson(client, "guanxi") == before
+
+    new = {k: v for k, v in first.items() if k != "id"}
+    r = client.post("/api/admin/ingest/guanxi?mode=append", content=json.dumps(new, ensure_ascii=False).encode("utf-8"))
+    assert events(r)[-1]["event"] == "done"
+    assert len(export_ndjson(client, "guanxi").splitlines()) == len(before.splitlines()) + 1
+    client.post("/api/admin/ingest/guanxi", content=before.encode("utf-8"))
+
+
+def test_ingest_unknown_table(client):
+    assert client.post("/api/admin/ingest/meta", content=b"{}").status_code == 404
+    assert client.post("/api/admin/ingest/xiji?mode=merge", content=b"{}").status_code == 422
+
+
+def test_init_db_drops_leftover_staging_tables():
+    staging_table(Xiji).create(bind=engine)
+    assert len(staging_tables()) == 1
+    init_db()
+    assert staging_tables() == []
@@ -0,0 +1,102 @@
+# /api/metrics tests
+#
+# The instruments are process-wide, so assertions compare samples before and
+# after the requests under test.
+import re
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import metrics
+from app.database import engine
+
+
+def sample(text, name, **labels):
+    """Value of one sample in the exposition text (0 if absent)"""
+    for line in text.splitlines():
+        match = re.fullmatch(rf"{re.escape(name)}(?:\{{(.*)\}})? (\S+)", line)
+        if match and dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(1) or "")) == labels:
+            return float(match.group(2))
+    return 0.0
+
+
+def scrape(client):
+    r = client.get("/api/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return r.text
+
+
+def test_requests_are_counted_per_route_template(client):
+    route = {"method": "GET", "route": "/api/ganzhi/{ganzhi_name}"}
+    before = scrape(client)
+    assert client.get("/api/ganzhi/甲子").status_code == 200
+    etag = client.get("/api/ganzhi/乙丑").headers["etag"]
+    assert client.get("/api/ganzhi/乙丑", headers={"If-None-Match": etag}).status_code == 304
+    after = scrape(client)
+
+    assert sample(after, "http_requests_total", **route, status="200") - \
+        sample(before, "http_requests_total", **route, status="200") == 2
+    # Answered by the ETag middleware before routing, still labelled by template
+    assert sample(after, "http_requests_total", **route, status="304") - \
+        sample(before, "http_requests_total", **route, status="304") == 1
+    assert sample(after, "http_request_duration_seconds_count", **route) - \
+        sample(before, "http_request_duration_seconds_count", **route) == 3
+    assert sample(after, "http_response_size_bytes_sum", **route) > sample(before, "http_response_size_bytes_sum", **route)
+    assert sample(after, "http_requests_in_progress", method="GET") == 1  # the scrape itself
+
+
+def test_unknown_paths_share_one_label(client):
+    client.get("/api/no-such-endpoint/1")
+    client.get("/api/no-such-endpoint/2")
+    text = scrape(client)
+    assert sample(text, "http_requests_total", method="GET", route="unmatched", status="404") >= 2
+    assert "no-such-endpoint" not in text
+
+
+def test_sql_statements_are_attributed_to_the_request(db_client):
+    route = {"method": "GET", "route": "/api/ganzhi/{ganzhi_name}"}
+    before = scrape(db_client)
+    assert db_client.get("/api/ganzhi/丙寅").status_code == 200
+    after = scrape(db_client)
+    assert sample(after, "http_request_sql_statements_sum", **route) - \
+        sample(before, "http_request_sql_statements_sum", **route) == 5
+    assert sample(after, "http_request_sql_seconds_sum", **route) > sample(before, "http_request_sql_seconds_sum", **route)
+
+
+def test_failed_statements_leave_no_timing_state():
+    metrics.instrument_engines()
+    totals = [0, 0.0]
+    token = metrics._request_sql.set(totals)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql("SELECT * FROM no_such_table")
+            conn.exec_driver_sql("SELECT 1")
+            assert not [key for key in conn.info if key.endswith("query_start")]
+    finally:
+        metrics._request_sql.reset(token)
+    assert totals[0] == 1
+
+
+def test_table_counts_are_cached(client, count_queries):
+    text = scrape(client)
+    assert sample(text, "db_table_rows", table="ganzhi") == 60
+    with count_queries() as counter:
+        scrape(client)
+        stats = client.get("/api/admin/stats").json()
+    assert counter.count == 0
+    assert stats["ganzhi_count"] == 60
+    assert set(stats) == {f"{model.__tablename__}_count" for model in metrics.COUNTED_TABLES}
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe("/x", value=value)
+    lines = {f"{name}{labels}": value for name, labels, value in histogram.samples()}
+    assert lines['test_seconds_bucket{route="/x",le="0.1"}'] == 2
+    assert lines['test_seconds_bucket{route="/x",le="1.0"}'] == 3
+    assert lines['test_seconds_bucket{route="/x",le="+Inf"}'] == 4
+    assert lines['test_seconds_count{route="/x"}'] == 4
+    assert lines['test_seconds_sum{route="/x"}'] == 2.65
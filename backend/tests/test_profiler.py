@@ -0,0 +1,88 @@
+# SQL profiler tests
+#
+# The app is wrapped in the profiler middleware here, as main.py does when
+# SQL_PROFILE is set. Reads go to the database (no snapshot).
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from app import profiler
+from app.data_version import get_data_version
+from app.database import SessionLocal, engine
+from app.main import app
+from app.store import knowledge_store
+
+
+@pytest.fixture
+def profiled_client():
+    profiler.instrument_engines()
+    profiler.recent_profiles.clear()
+    profiler.slow_queries.clear()
+    knowledge_store.clear()
+    with SessionLocal() as db:  # as the lifespan would; the ETag middleware reads it from memory
+        knowledge_store.set_data_version(get_data_version(db))
+    yield TestClient(profiler.SQLProfilerMiddleware(app))
+    profiler.recent_profiles.clear()
+    profiler.slow_queries.clear()
+
+
+def test_normalize_sql():
+    assert profiler.normalize_sql(
+        "SELECT xiangyi.id FROM xiangyi\n  WHERE xiangyi.ganzhi_id IN (?, ?, ?) AND type = '核心' LIMIT 10"
+    ) == "SELECT xiangyi.id FROM xiangyi WHERE xiangyi.ganzhi_id IN (...) AND type = ? LIMIT ?"
+    assert profiler.normalize_sql("SELECT * FROM t WHERE id IN (?)") == "SELECT * FROM t WHERE id IN (...)"
+
+
+def test_repeated_shapes_are_flagged_as_n_plus_one():
+    profile = profiler.RequestProfile("GET", "/api/x")
+    for ganzhi_id in range(profiler.N_PLUS_ONE_THRESHOLD):
+        profile.record(f"SELECT * FROM nayin WHERE ganzhi_id = {ganzhi_id}", 0.001)
+    profile.record("SELECT * FROM ganzhi", 0.001)
+    assert profile.n_plus_one == ["SELECT * FROM nayin WHERE ganzhi_id = ?"]
+    assert profile.header().endswith("n_plus_one=1")
+    assert profile.summary()["groups"][0]["count"] == profiler.N_PLUS_ONE_THRESHOLD
+
+
+def test_request_summary_header_and_report(profiled_client):
+    r = profiled_client.get("/api/ganzhi/甲子")
+    assert r.status_code == 200
+    assert r.headers[profiler.HEADER].startswith("statements=5; distinct=5;")
+    assert r.headers[profiler.HEADER].endswith("n_plus_one=0")
+
+    report = profiled_client.get("/api/admin/profiler").json()
+    request = next(p for p in report["requests"] if p["path"] == "/api/ganzhi/甲子")
+    assert request["statements"] == 5
+    assert request["n_plus_one"] == []
+    assert any("FROM xiangyi WHERE xiangyi.ganzhi_id IN (...)" in group["sql"] for group in request["groups"])
+
+    assert profiled_client.delete("/api/admin/profiler").status_code == 200
+    assert profiler.recent_profiles.maxlen and not profiler.recent_profiles
+
+
+def test_slow_queries_are_logged_with_plan(profiled_client, monkeypatch, caplog):
+    monkeypatch.setattr(profiler, "SLOW_QUERY_MS", 0)
+    with caplog.at_level("WARNING", logger="app.profiler"):
+        assert profiled_client.get("/api/nayin/by-ganzhi/甲子").status_code == 200
+    slow = [q for q in profiler.slow_queries if q["path"] == "/api/nayin/by-ganzhi/甲子"]
+    assert slow
+    assert any(line.startswith("SEARCH ganzhi") for line in slow[0]["plan"])
+    assert "slow query" in caplog.text
+
+
+def test_requests_outside_the_middleware_are_not_profiled(profiled_client):
+    TestClient(app).get("/api/ganzhi/乙丑")
+    assert not profiler.recent_profiles
+
+
+def test_failed_statements_are_not_timed(profiled_client):
+    profile = profiler.RequestProfile("GET", "/api/x")
+    token = profiler._current.set(profile)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql("SELECT * FROM no_such_table")
+            conn.exec_driver_sql("SELECT 1")
+            assert not [key for key in conn.info if key.endswith("query_start")]
+    finally:
+        profiler._current.reset(token)
+    assert profile.summary()["statements"] == 1
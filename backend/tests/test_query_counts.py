@@ -0,0 +1,177 @@
+# Query-count regression tests
+#
+# Each read endpoint must cost a fixed number of SQL statements, independent of
+# how many rows it returns. These run without the knowledge snapshot so the
+# database path itself is measured.
+import pytest
+
+from app import crud
+from app.database import SessionLocal
+from app.store import knowledge_store
+
+
+ALL_GANZHI = ["甲子", "乙丑", "丙寅", "丁卯", "戊辰", "己巳", "庚午", "辛未", "壬申", "癸酉"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 4, 10])
+def test_detail_bulk_is_constant(db_client, count_queries, size):
+    db = SessionLocal()
+    try:
+        with count_queries() as counter:
+            details = crud.ganzhi.get_ganzhi_details_bulk(db, ALL_GANZHI[:size])
+    finally:
+        db.close()
+    assert len(details) == size
+    # ganzhi+nayin, xiangyi, xiji, shensha links+shensha, guanxi
+    assert counter.count == 5
+
+
+def test_detail_endpoint_query_count(db_client, count_queries):
+    with count_queries() as counter:
+        r = db_client.get("/api/ganzhi/甲子")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["nayin"]["nayin_name"] == "海中金"
+    assert body["xiangyi"] and body["shensha"] and body["guanxi"]
+    assert counter.count == 5
+
+
+def test_compare_query_count_independent_of_size(db_client, count_queries):
+    counts = []
+    for names in (["甲子", "乙丑"], ["甲子", "乙丑", "丙寅", "丁卯"]):
+        with count_queries() as counter:
+            r = db_client.post("/api/ganzhi/compare", json={"ganzhi_list": names})
+        assert r.status_code == 200
+        assert [item["ganzhi"] for item in r.json()["items"]] == names
+        counts.append(counter.count)
+    assert counts[0] == counts[1] == 5
+
+
+def test_snapshot_serves_details_without_queries(client, count_queries):
+    with count_queries() as counter:
+        r = client.post("/api/ganzhi/compare", json={"ganzhi_list": ["甲子", "乙丑", "丙寅", "丁卯"]})
+    assert r.status_code == 200
+    assert counter.count == 0
+
+
+# (include, queries on the database path): ganzhi (+nayin joined), then one per other section
+BATCH_INCLUDES = [
+    (["nayin", "xiangyi", "shensha", "xiji", "guanxi"], 5),
+    ([], 1),
+    (["nayin"], 1),
+    (["guanxi"], 2),
+    (["xiangyi", "xiji"], 3),
+]
+
+
+@pytest.mark.parametrize("include,expected", BATCH_INCLUDES)
+def test_batch_query_count_independent_of_size(db_client, count_queries, include, expected):
+    names = db_client.get("/api/ganzhi/names").json()
+    with count_queries() as counter:
+        r = db_client.post("/api/ganzhi/batch", json={"names": names, "include": include})
+    assert r.status_code == 200
+    items = r.json()["items"]
+    assert list(items) == names
+    assert set(items["甲子"]) & {"nayin", "xiangyi", "shensha", "xiji", "guanxi"} == set(include)
+    assert counter.count == expected, counter.statements
+
+
+def test_batch_matches_detail_endpoint(client, count_queries):
+    body = {"names": ["丙寅", "甲子", "不存在", "甲子"]}
+    with count_queries() as counter:
+        from_snapshot = client.post("/api/ganzhi/batch", json=body).json()
+    assert counter.count == 0
+    assert list(from_snapshot["items"]) == ["丙寅", "甲子"]
+    assert from_snapshot["missing"] == ["不存在"]
+    assert from_snapshot["items"]["甲子"] == client.get("/api/ganzhi/甲子").json()
+
+    knowledge_store.clear()
+    assert client.post("/api/ganzhi/batch", json=body).json() == from_snapshot
+
+
+def test_batch_validation(client):
+    assert client.post("/api/ganzhi/batch", json={"names": []}).status_code == 400
+    assert client.post("/api/ganzhi/batch", json={"names": ["甲子"] * 61}).status_code == 400
+    assert client.post("/api/ganzhi/batch", json={"names": ["甲子"], "include": ["wuxing"]}).status_code == 422
+
+
+# (endpoint, queries on the database path)
+NAYIN_ENDPOINTS = [
+    ("/api/nayin", 1),
+    ("/api/nayin/by-ganzhi/甲子", 1),
+    ("/api/nayin/海中金/ganzhi", 1),
+    ("/api/nayin/status", 1),
+    ("/api/nayin/status/旺", 1),
+    ("/api/nayin/category/shengda", 1),
+]
+
+
+@pytest.mark.parametrize("path,expected", NAYIN_ENDPOINTS)
+def test_nayin_endpoint_query_count(db_client, count_queries, path, expected):
+    with count_queries() as counter:
+        r = db_client.get(path)
+    assert r.status_code == 200
+    assert counter.count == expected, counter.statements
+
+
+@pytest.mark.parametrize("path,expected", NAYIN_ENDPOINTS)
+def test_nayin_endpoint_from_snapshot(client, count_queries, path, expected):
+    with count_queries() as counter:
+        r = client.get(path)
+    assert r.status_code == 200
+    assert counter.count == 0
+
+
+def test_nayin_groups_cover_all_ganzhi(client):
+    groups = crud.nayin.get_all_nayin_categories(None)
+    assert len(groups) == 30
+    assert sum(len(g["ganzhi_list"]) for g in groups.values()) == 60
+
+
+SHENSHA_ENDPOINTS = [
+    ("/api/shensha/ganzhi/甲子", 1),
+    ("/api/shensha/福星/ganzhi", 1),
+    ("/api/shensha/zixing", 1),
+    ("/api/shensha/intersect?names=福星&names=平头", 2),
+]
+
+
+@pytest.mark.parametrize("path,expected", SHENSHA_ENDPOINTS)
+def test_shensha_endpoint_query_count(db_client, count_queries, path, expected):
+    with count_queries() as counter:
+        r = db_client.get(path)
+    assert r.status_code == 200
+    assert counter.count == expected, counter.statements
+
+
+def test_shensha_intersection_matches_database(client):
+    path = "/api/shensha/intersect?names=福星&names=平头"
+    from_snapshot = client.get(path).json()
+    knowledge_store.clear()
+    from_db = client.get(path).json()
+    assert from_snapshot == from_db
+    assert "甲子" in [item["ganzhi"] for item in from_snapshot["items"]]
+
+
+def test_shensha_intersection_reports_unknown_names(client):
+    path = "/api/shensha/intersect?names=福星&names=无此&names=也无"
+    r = client.get(path)
+    assert r.status_code == 404
+    assert r.json()["detail"] == "Shensha not found: 无此, 也无"
+    knowledge_store.clear()
+    assert client.get(path).json() == r.json()
+
+
+GUANXI_PAIRS = [("甲子", "乙丑"), ("壬申", "甲子"), ("甲子", "甲子"), ("甲子", "丁卯"), ("甲子", "乙亥"), ("甲子", "无此")]
+
+
+def test_guanxi_between_matches_snapshot(client, count_queries):
+    from_snapshot = [client.get(f"/api/guanxi/between/{a}/{b}") for a, b in GUANXI_PAIRS]
+    knowledge_store.clear()
+    for (a, b), expected in zip(GUANXI_PAIRS, from_snapshot):
+        with count_queries() as counter:
+            r = client.get(f"/api/guanxi/between/{a}/{b}")
+        assert (r.status_code, r.json()) == (expected.status_code, expected.json())
+        # Only the pair's own rows are read; unknown names need no query
+        assert counter.count == (0 if b == "无此" else 1), counter.statements
+        assert all("WHERE" in statement for statement in counter.statements)
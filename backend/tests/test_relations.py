@@ -0,0 +1,39 @@
+# Relation matrix tests
+from app.relations import CYCLE, RelationMatrix, derive_relations
+
+
+def test_cycle_order():
+    assert CYCLE[0] == "甲子" and CYCLE[8] == "壬申" and CYCLE[59] == "癸亥"
+    assert len(set(CYCLE)) == 60
+
+
+def test_rule_derived_relations():
+    index = {name: i for i, name in enumerate(CYCLE)}
+    assert "六冲" in derive_relations(index["甲子"], index["庚午"])
+    assert "六合" in derive_relations(index["甲子"], index["乙丑"])
+    assert "六害" in derive_relations(index["甲子"], index["辛未"])
+    assert "半合" in derive_relations(index["甲子"], index["壬辰"])
+    assert "三刑" in derive_relations(index["丙寅"], index["己巳"])
+    assert {"同地支", "自刑"} <= set(derive_relations(index["戊午"], index["庚午"]))
+    assert derive_relations(index["甲子"], index["丁卯"]) == ["三刑"]
+
+
+def test_matrix_merges_stored_rows():
+    rows = [{"id": 7, "ganzhi1": "甲子", "ganzhi2": "壬申", "relation_type": "隔八生子", "remark": "甲子隔八生壬申"}]
+    matrix = RelationMatrix(rows)
+    mask = matrix.mask("壬申", "甲子")
+    assert matrix.decode(mask) == ["半合", "隔八生子"]
+    assert matrix.mask("甲子", "壬申") == mask
+    assert matrix.relations("壬申", "甲子")[0]["id"] == 7
+    assert matrix.mask("甲子", "不存在") is None
+    # Each Ganzhi has five 六合 partners (its dizhi partner under five tiangan)
+    assert len([r for r in matrix.by_ganzhi["甲子"] if r["relation_type"] == "六合"]) == 5
+
+
+def test_masks_endpoint(client):
+    r = client.post("/api/guanxi/masks", json={"pairs": [["甲子", "庚午"], ["甲子", "甲午"]]})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["items"][0]["relation_types"] == ["六冲"]
+    assert body["items"][1]["mask"] == body["relation_bits"]["同天干"] | body["relation_bits"]["六冲"]
+    assert client.post("/api/guanxi/masks", json={"pairs": [["甲子", "X"]]}).status_code == 404
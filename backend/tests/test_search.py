@@ -0,0 +1,87 @@
+# Full-text search tests
+from app.crud.search import SEARCH_TABLE, ensure_search_index, highlight, segment
+from app.database import SessionLocal, engine
+from app.store import knowledge_store
+
+
+def test_segment_produces_unigrams_and_bigrams():
+    assert segment("森林 ok") == ["森", "林", "森林", "ok"]
+
+
+def test_highlight_marks_match():
+    assert highlight("甲为第一，子为第一", "第一") == "甲为<mark>第一</mark>，子为<mark>第一</mark>"
+
+
+def test_highlight_escapes_content():
+    # The excerpt window cuts the tag; what is left is still plain text
+    assert highlight("<img src=x onerror=alert(1)>金", "金") == "…=x onerror=alert(1)&gt;<mark>金</mark>"
+    assert highlight("A&B <b>", "a&b") == "<mark>A</mark>&amp;<mark>B</mark> &lt;<mark>b</mark>&gt;"
+    assert highlight("<i>无</i>", "金") == "&lt;i&gt;无&lt;/i&gt;"
+
+
+def test_search_groups_by_ganzhi(client):
+    r = client.get("/api/search", params={"q": "第一"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["total"] >= 1
+    top = body["items"][0]
+    assert top["ganzhi"] == "甲子"
+    assert all("<mark>" in hit["snippet"] for hit in top["hits"])
+    scores = [item["score"] for item in body["items"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_total_independent_of_page(client):
+    full = client.get("/api/search", params={"q": "水"}).json()
+    page = client.get("/api/search", params={"q": "水", "skip": 1, "limit": 1}).json()
+    assert page["total"] == full["total"]
+    assert page["items"][0]["ganzhi"] == full["items"][1]["ganzhi"]
+
+
+def test_search_never_builds_the_index(client, count_queries):
+    with count_queries() as counter:
+        assert client.get("/api/search?q=金").status_code == 200
+    assert not [s for s in counter.statements if "sqlite_master" in s]
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"DROP TABLE {SEARCH_TABLE}")
+    try:
+        with count_queries() as counter:
+            r = client.get("/api/search?q=金")
+        assert r.status_code == 503
+        assert not [s for s in counter.statements if s.lstrip().upper().startswith(("CREATE", "INSERT"))]
+    finally:
+        db = SessionLocal()
+        try:
+            assert ensure_search_index(db)
+        finally:
+            db.close()
+    assert client.get("/api/search?q=金").status_code == 200
+
+
+def test_search_no_match(client):
+    r = client.get("/api/search", params={"q": "不存在的词语"})
+    assert r.json() == {"total": 0, "items": []}
+
+
+def test_suggest_pinyin_and_chinese_prefixes(client):
+    r = client.get("/api/search/suggest", params={"q": "jia"})
+    assert r.status_code == 200
+    first = r.json()[0]
+    assert (first["text"], first["kind"], first["matched"]) == ("甲子", "ganzhi", "jia_zi")
+
+    assert [s["text"] for s in client.get("/api/search/suggest", params={"q": "JiaZ"}).json()] == ["甲子"]
+    names = [s["text"] for s in client.get("/api/search/suggest", params={"q": "甲", "limit": 20}).json()]
+    assert len(names) == 6 and all(n.startswith("甲") for n in names)
+
+
+def test_suggest_covers_nayin_and_shensha(client):
+    assert client.get("/api/search/suggest", params={"q": "海中"}).json()[0]["kind"] == "nayin"
+    assert client.get("/api/search/suggest", params={"q": "福星"}).json()[0]["kind"] == "shensha"
+    assert client.get("/api/search/suggest", params={"q": "zzz"}).json() == []
+
+
+def test_suggest_db_fallback_matches_snapshot(client):
+    expected = client.get("/api/search/suggest", params={"q": "ji", "limit": 20}).json()
+    knowledge_store.clear()
+    assert client.get("/api/search/suggest", params={"q": "ji", "limit": 20}).json() == expected
@@ -0,0 +1,112 @@
+# Static API snapshot tests
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.build_static import build_static, iter_read_paths, swap_directory
+from app.main import app
+from app.static_api import StaticSnapshotMiddleware, choose_encoding
+from app.store import knowledge_store
+
+
+def test_choose_encoding():
+    available = {"identity": 1, "gzip": 1, "br": 1}
+    assert choose_encoding("gzip, deflate, br", available) == "br"
+    assert choose_encoding("gzip, br;q=0", available) == "gzip"
+    assert choose_encoding("", available) == "identity"
+    assert choose_encoding("br", {"identity": 1, "gzip": 1}) == "identity"
+    assert choose_encoding("identity;q=0, *;q=0", available) is None
+
+
+@pytest.fixture
+def static_client(client, tmp_path):
+    paths = ["/api/ganzhi/甲子", "/api/nayin/status", "/api/guanxi/between/甲子/乙丑"]
+    manifest = build_static(str(tmp_path), client, paths)
+    with TestClient(StaticSnapshotMiddleware(app, str(tmp_path))) as c:
+        yield c, manifest
+
+
+def test_read_paths_cover_details(client):
+    paths = list(iter_read_paths(knowledge_store.snapshot, include_between=False))
+    assert "/api/ganzhi/癸亥" in paths and "/api/nayin/海中金/ganzhi" in paths
+    assert len(paths) == len(set(paths))
+
+
+def test_static_serves_precompressed_file(client, static_client):
+    static, manifest = static_client
+    expected = client.get("/api/ganzhi/甲子").json()
+
+    r = static.get("/api/ganzhi/甲子", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert int(r.headers["content-length"]) == manifest["routes"]["/api/ganzhi/甲子"]["sizes"]["gzip"]
+    assert r.json() == expected
+
+    plain = static.get("/api/ganzhi/甲子", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert json.loads(plain.content) == expected
+    assert plain.headers["etag"] != r.headers["etag"]
+
+
+def test_static_conditional_and_fallthrough(static_client):
+    static, manifest = static_client
+    etag = static.get("/api/nayin/status", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    r = static.get("/api/nayin/status", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert r.status_code == 304
+
+    # Not pre-rendered, or with a query string: answered by the app
+    assert static.get("/api/ganzhi/乙丑").status_code == 200
+    assert static.get("/api/ganzhi/甲子", params={"x": 1}).headers.get("content-encoding") is None
+
+
+def test_static_gzip_file_is_valid(static_client, tmp_path):
+    _, manifest = static_client
+    route = manifest["routes"]["/api/guanxi/between/甲子/乙丑"]
+    with open(tmp_path / (route["file"] + ".gz"), "rb") as f:
+        body = gzip.decompress(f.read())
+    with open(tmp_path / route["file"], "rb") as f:
+        assert f.read() == body
+
+
+def test_swap_directory_replaces_old_build(tmp_path):
+    target, new = tmp_path / "static", tmp_path / "static.building"
+    target.mkdir()
+    (target / "old.json").write_text("old")
+    new.mkdir()
+    (new / "new.json").write_text("new")
+    swap_directory(str(new), str(target))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["static"]
+    assert [p.name for p in target.iterdir()] == ["new.json"]
+
+    # First build: nothing to move aside
+    new.mkdir()
+    swap_directory(str(new), str(tmp_path / "fresh"))
+    assert (tmp_path / "fresh").is_dir() and not new.exists()
+
+
+def test_static_picks_up_a_rebuild(client, tmp_path):
+    target = tmp_path / "static"
+    target.mkdir()
+    with TestClient(StaticSnapshotMiddleware(app, str(target))) as static:
+        # No manifest yet: answered by the app
+        assert "content-encoding" not in static.get("/api/ganzhi/甲子", headers={"Accept-Encoding": "gzip"}).headers
+
+        building = tmp_path / "static.building"
+        building.mkdir()
+        manifest = build_static(str(building), client, ["/api/ganzhi/甲子"])
+        swap_directory(str(building), str(target))
+        r = static.get("/api/ganzhi/甲子", headers={"Accept-Encoding": "gzip"})
+        assert r.headers["content-encoding"] == "gzip"
+
+        # A file missing mid-rebuild falls through instead of failing
+        (target / (manifest["routes"]["/api/ganzhi/甲子"]["file"] + ".gz")).unlink()
+        r = static.get("/api/ganzhi/甲子", headers={"Accept-Encoding": "gzip"})
+        assert r.status_code == 200 and "content-encoding" not in r.headers
+
+        # A manifest for another data version is ignored
+        manifest["data_version"] += 1
+        (target / "manifest.json").write_text(json.dumps(manifest))
+        r = static.get("/api/ganzhi/甲子", headers={"Accept-Encoding": "identity"})
+        assert r.status_code == 200 and r.headers["vary"] != "Accept-Encoding"